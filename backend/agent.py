@@ -470,6 +470,23 @@ def prepare_prompt(text, system_prompt=None, history=None, model_path=None, cust
     
     return "".join(prompt_parts)
 
+def _finalize_output(prompt, generated_text):
+    """Общая постобработка ответа для обычной и потоковой генерации"""
+    generated_text = generated_text.strip()
+    
+    # Обрабатываем случай пустого вывода
+    if not generated_text:
+        # Более безопасные параметры для повторной попытки
+        output = llm(
+            prompt.strip(),  # Более простой формат
+            max_tokens=256,  # Уменьшенное число токенов
+            temperature=0.5, # Более низкая температура
+            echo=False
+        )
+        generated_text = output["choices"][0]["text"].strip()
+    
+    return generated_text
+
 def ask_agent(prompt, history=None, max_tokens=None, streaming=False, stream_callback=None, model_path=None, custom_prompt_id=None):
     if llm is None:
         raise ValueError("Модель не загружена. Пожалуйста, убедитесь, что модель инициализирована.")
@@ -521,7 +538,12 @@ def ask_agent(prompt, history=None, max_tokens=None, streaming=False, stream_cal
                     print("ask_agent: получен сигнал остановки от stream_callback, прерываем генерацию")
                     return None  # Возвращаем None вместо накопленного текста
             
-            return accumulated_text
+            generated_text = _finalize_output(prompt, accumulated_text)
+            if generated_text and not accumulated_text.strip():
+                # Ответ дала повторная попытка - передаем его и потребителю потока
+                if stream_callback(generated_text, generated_text) is False:
+                    return None
+            return generated_text
         else:
             # Обычная генерация без стриминга
             output = llm(
@@ -534,25 +556,7 @@ def ask_agent(prompt, history=None, max_tokens=None, streaming=False, stream_cal
                 repeat_penalty=model_settings.get("repeat_penalty")
             )
             
-            generated_text = output["choices"][0]["text"].strip()
-            
-
-            
-            # Обрабатываем случай пустого вывода
-            if not generated_text:
-
-                # Более безопасные параметры для повторной попытки
-                output = llm(
-                    prompt.strip(),  # Более простой формат
-                    max_tokens=256,  # Уменьшенное число токенов
-                    temperature=0.5, # Более низкая температура
-                    echo=False
-                )
-                generated_text = output["choices"][0]["text"].strip()
-                
-
-            
-            return generated_text
+            return _finalize_output(prompt, output["choices"][0]["text"])
     except Exception as e:
 
         # Вместо непосредственной передачи ошибки, возвращаем сообщение об ошибке
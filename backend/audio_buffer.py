@@ -0,0 +1,86 @@
+"""
+Кольцевой буфер аудио фиксированного размера
+
+Хранит последние capacity отсчетов записи в заранее выделенном numpy
+массиве, поэтому память не растет с длительностью записи. Позиции
+отсчетов абсолютные (от начала записи): потребитель запоминает, до какого
+места он прочитал, и забирает только новые данные через read_since().
+"""
+
+import threading
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Потокобезопасный кольцевой буфер отсчетов"""
+
+    def __init__(self, capacity, dtype=np.int16):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=dtype)
+        self._lock = threading.Lock()
+        self._write_pos = 0
+        self.total_written = 0
+
+    def write(self, samples):
+        """Дописывает отсчеты, затирая самые старые"""
+        samples = np.asarray(samples, dtype=self._data.dtype).reshape(-1)
+        count = len(samples)
+        if count == 0:
+            return
+
+        with self._lock:
+            tail = samples[-self.capacity:]
+            start = (self._write_pos + count - len(tail)) % self.capacity
+            first = min(len(tail), self.capacity - start)
+            self._data[start:start + first] = tail[:first]
+            self._data[:len(tail) - first] = tail[first:]
+            self._write_pos = (start + len(tail)) % self.capacity
+            self.total_written += count
+
+    def write_silence(self, count):
+        """
+        Дописывает count нулевых отсчетов
+
+        Зануляется не больше capacity отсчетов - старше буфер все равно не
+        хранит, поэтому длинный пропуск не требует памяти, а позиция просто
+        сдвигается на count.
+        """
+        count = int(count)
+        if count <= 0:
+            return
+
+        with self._lock:
+            fill = min(count, self.capacity)
+            start = (self._write_pos + count - fill) % self.capacity
+            first = min(fill, self.capacity - start)
+            self._data[start:start + first] = 0
+            self._data[:fill - first] = 0
+            self._write_pos = (start + fill) % self.capacity
+            self.total_written += count
+
+    def _read_range(self, start, end):
+        """Копия отсчетов с абсолютными позициями [start, end) (под блокировкой)"""
+        count = end - start
+        begin = (self._write_pos - (self.total_written - start)) % self.capacity
+        first = min(count, self.capacity - begin)
+        return np.concatenate((self._data[begin:begin + first], self._data[:count - first]))
+
+    def read_last(self, count):
+        """Последние count отсчетов (или меньше, если записано меньше)"""
+        with self._lock:
+            count = min(int(count), self.total_written, self.capacity)
+            return self._read_range(self.total_written - count, self.total_written)
+
+    def read_since(self, position):
+        """
+        Отсчеты, записанные после абсолютной позиции position
+
+        Returns:
+            (отсчеты, новая позиция, число потерянных отсчетов) - потерянные
+            появляются, если потребитель отстал больше чем на capacity
+        """
+        with self._lock:
+            oldest = max(0, self.total_written - self.capacity)
+            start = max(position, oldest)
+            return self._read_range(start, self.total_written), self.total_written, start - position
@@ -0,0 +1,271 @@
+"""
+Одновременный захват нескольких аудиоустройств с выравниванием по времени
+
+Каждое устройство читается своим потоком sounddevice с callback, поэтому
+медленное устройство не блокирует остальные и их буферы не переполняются.
+Блоки приводятся к общей частоте дискретизации и раскладываются на общую
+шкалу времени по меткам времени АЦП. Микшер складывает источники во float32
+с индивидуальным усилением или отдает их отдельными каналами (например,
+микрофон и собеседник - для последующего разделения спикеров).
+"""
+
+import threading
+import time
+
+import numpy as np
+
+try:
+    import sounddevice as sd
+    SOUNDDEVICE_AVAILABLE = True
+except (ImportError, OSError):
+    sd = None
+    SOUNDDEVICE_AVAILABLE = False
+
+from backend.audio_buffer import AudioRingBuffer
+
+
+class StreamResampler:
+    """Потоковая передискретизация блоков без разрывов на их границах"""
+
+    def __init__(self, source_rate, target_rate):
+        self.ratio = source_rate / target_rate
+        self._position = 0.0
+        self._tail = np.zeros(0, dtype=np.float32)
+
+        # При понижении частоты - сглаживающий фильтр скользящего среднего против наложения спектра
+        taps = int(np.ceil(self.ratio)) if self.ratio > 1 else 1
+        self._kernel = np.full(taps, 1.0 / taps, dtype=np.float32)
+        self._history = np.zeros(taps - 1, dtype=np.float32)
+
+    def process(self, samples):
+        """Передискретизирует очередной блок; состояние переносится в следующий вызов"""
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.ratio == 1.0:
+            return samples
+
+        if len(self._kernel) > 1:
+            extended = np.concatenate((self._history, samples))
+            self._history = extended[len(extended) - len(self._history):]
+            samples = np.convolve(extended, self._kernel, mode="valid").astype(np.float32)
+
+        data = np.concatenate((self._tail, samples))
+        if len(data) < 2:
+            self._tail = data
+            return np.zeros(0, dtype=np.float32)
+
+        # Линейная интерполяция; позиция следующего отсчета переходит в следующий блок
+        positions = np.arange(self._position, len(data) - 1, self.ratio)
+        output = np.interp(positions, np.arange(len(data)), data).astype(np.float32)
+
+        next_position = self._position + len(positions) * self.ratio
+        keep = min(int(next_position), len(data) - 1)
+        self._tail = data[keep:]
+        self._position = next_position - keep
+        return output
+
+
+class CaptureSource:
+    """Одно устройство захвата: поток с callback, приведение к моно и общей частоте"""
+
+    def __init__(self, name, device=None, gain=1.0, buffer_seconds=10, tolerance_ms=20):
+        self.name = name
+        self.device = device
+        self.gain = gain
+        self.buffer_seconds = buffer_seconds
+        self.tolerance_ms = tolerance_ms
+
+        self.stream = None
+        self.buffer = None
+        self.resampler = None
+        self.sample_rate = None
+        self.device_rate = None
+        self.start_time = None
+        self._clock_offset = 0.0
+        self.dropped = 0
+        self.padded = 0
+
+    def start(self, sample_rate, start_time):
+        """Открывает поток устройства с его родной частотой и начинает запись на общую шкалу"""
+        if not SOUNDDEVICE_AVAILABLE:
+            raise RuntimeError("Для захвата аудио требуется sounddevice")
+
+        info = sd.query_devices(self.device, "input")
+        channels = max(1, min(2, int(info["max_input_channels"])))
+        self.device_rate = int(info["default_samplerate"])
+        self.sample_rate = sample_rate
+        self.start_time = start_time
+        self.resampler = StreamResampler(self.device_rate, sample_rate)
+        self.buffer = AudioRingBuffer(sample_rate * self.buffer_seconds, dtype=np.float32)
+
+        self.stream = sd.InputStream(
+            samplerate=self.device_rate,
+            channels=channels,
+            dtype="float32",
+            device=self.device,
+            callback=self._callback
+        )
+        # Часы потока PortAudio переводим в time.monotonic, общий для всех источников.
+        # stream.time доступен сразу после открытия; смещение нужно до первого callback
+        self._clock_offset = time.monotonic() - self.stream.time
+        self.stream.start()
+
+    def stop(self):
+        """Останавливает поток устройства"""
+        if self.stream is not None:
+            try:
+                self.stream.stop()
+                self.stream.close()
+            finally:
+                self.stream = None
+
+    def _block_time(self, frames, time_info):
+        """Момент захвата первого отсчета блока по time.monotonic"""
+        adc_time = time_info.inputBufferAdcTime or time_info.currentTime
+        if adc_time:
+            return adc_time + self._clock_offset
+        return time.monotonic() - frames / self.device_rate
+
+    def _callback(self, indata, frames, time_info, status):
+        """Callback потока: сводит в моно, передискретизирует и кладет на шкалу времени"""
+        if status:
+            print(f"Статус устройства {self.name}: {status}")
+
+        block_time = self._block_time(frames, time_info)
+        samples = self.resampler.process(indata.mean(axis=1))
+
+        # Расхождение метки времени с концом уже записанного: пропуск (переполнение,
+        # поздний старт) заполняется тишиной, опережение - отбрасывается. Мелкий
+        # джиттер меток в пределах допуска игнорируется, чтобы не рвать звук.
+        expected = self.buffer.total_written
+        actual = int(round((block_time - self.start_time) * self.sample_rate))
+        tolerance = int(self.sample_rate * self.tolerance_ms / 1000)
+        drift = actual - expected
+        if drift > tolerance:
+            # Без выделения массива в callback: больше емкости буфера не пишется
+            self.buffer.write_silence(drift)
+            self.padded += drift
+        elif drift < -tolerance:
+            skip = min(-drift, len(samples))
+            samples = samples[skip:]
+            self.dropped += skip
+
+        self.buffer.write(samples)
+
+    def read(self, position, count):
+        """count отсчетов с позиции position общей шкалы с учетом усиления; недостающее - тишина"""
+        samples, _, lost = self.buffer.read_since(position)
+        block = np.zeros(count, dtype=np.float32)
+        available = samples[:max(0, count - lost)]
+        block[lost:lost + len(available)] = available
+        return block * self.gain
+
+
+class CaptureEngine:
+    """
+    Синхронный захват нескольких источников
+
+    Потоки устройств пишут в свои буферы сами, а владелец движка периодически
+    вызывает read() и получает выровненные блоки: моно микс int16 и, если
+    включено separate_channels, матрицу (отсчеты x источники) int16.
+    """
+
+    def __init__(self, sources, sample_rate=16000, block_ms=100, separate_channels=False, max_latency_ms=500):
+        self.sources = list(sources)
+        self.sample_rate = sample_rate
+        self.block_size = int(sample_rate * block_ms / 1000)
+        self.separate_channels = separate_channels
+        self.max_latency = int(sample_rate * max_latency_ms / 1000)
+        self.position = 0
+        self._lock = threading.Lock()
+
+    @property
+    def output_channels(self):
+        """Число каналов выходного файла"""
+        return len(self.sources) if self.separate_channels else 1
+
+    def set_gain(self, name, gain):
+        """Меняет усиление источника на лету"""
+        for source in self.sources:
+            if source.name == name:
+                source.gain = gain
+                return True
+        return False
+
+    def start(self):
+        """
+        Запускает все источники с общей точкой отсчета времени
+
+        Источник, который не удалось открыть, исключается из записи; если не
+        открылся ни один, выбрасывается RuntimeError.
+        """
+        start_time = time.monotonic()
+        started = []
+        for source in self.sources:
+            try:
+                source.start(self.sample_rate, start_time)
+                started.append(source)
+                print(f"Источник {source.name}: устройство {source.device}, {source.device_rate} Гц")
+            except Exception as e:
+                print(f"Не удалось открыть источник {source.name}: {e}")
+
+        if not started:
+            raise RuntimeError("Не удалось открыть ни одно устройство записи")
+        self.sources = started
+        self.position = 0
+
+    def stop(self):
+        """Останавливает потоки всех источников"""
+        for source in self.sources:
+            try:
+                source.stop()
+            except Exception as e:
+                print(f"Ошибка при остановке источника {source.name}: {e}")
+
+    def read(self, flush=False):
+        """
+        Выровненные блоки, которые уже есть у всех источников
+
+        Микс ждет самый медленный источник, но не дольше max_latency: если
+        источник перестал присылать данные, его доля заполняется тишиной.
+        С flush=True отдается все записанное, включая неполный последний блок.
+
+        Returns:
+            Список пар (моно микс int16, каналы int16 или None)
+        """
+        with self._lock:
+            ends = [source.buffer.total_written for source in self.sources]
+            end = min(ends)
+            if flush or max(ends) - end > self.max_latency:
+                end = max(ends)
+
+            blocks = []
+            while end - self.position >= self.block_size or (flush and end > self.position):
+                count = min(self.block_size, end - self.position)
+                columns = np.stack([source.read(self.position, count) for source in self.sources], axis=1)
+                self.position += count
+
+                # Сумма во float32 - переполнения нет; ограничение только на выходе
+                mix = np.clip(columns.sum(axis=1), -1.0, 1.0)
+                channels = None
+                if self.separate_channels:
+                    channels = _to_int16(np.clip(columns, -1.0, 1.0))
+                blocks.append((_to_int16(mix), channels))
+            return blocks
+
+    def status(self):
+        """Состояние источников: частоты и объем скорректированных расхождений"""
+        return {
+            source.name: {
+                "device": source.device,
+                "device_rate": source.device_rate,
+                "gain": source.gain,
+                "padded_seconds": round(source.padded / self.sample_rate, 3),
+                "dropped_seconds": round(source.dropped / self.sample_rate, 3),
+            }
+            for source in self.sources
+        }
+
+
+def _to_int16(samples):
+    """float32 [-1, 1] -> int16"""
+    return (samples * 32767).astype(np.int16)
@@ -0,0 +1,153 @@
+"""
+Кодирование синтезированной речи для передачи клиенту
+
+Вместо WAV ответ можно отдавать в Opus (контейнер OGG) или MP3 с заданным
+битрейтом: 30 секунд речи занимают ~120 КБ при 32 кбит/с вместо ~2.8 МБ WAV.
+Кодирование идет в памяти через PyAV, без него - через FFmpeg по каналам
+stdin/stdout. Формат и частота дискретизации согласуются с клиентом.
+"""
+
+import io
+import shutil
+import subprocess
+import wave
+
+try:
+    import av
+    AV_AVAILABLE = True
+except ImportError:
+    av = None
+    AV_AVAILABLE = False
+
+AUDIO_MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "ogg": "audio/ogg",
+    "mp3": "audio/mpeg",
+}
+
+# Контейнер и кодек для каждого сжатого формата
+_CODECS = {
+    "ogg": ("ogg", "libopus"),
+    "mp3": ("mp3", "libmp3lame"),
+}
+
+# Частоты, которые поддерживает кодек Opus
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+DEFAULT_BITRATE = 32000
+STREAM_CHUNK_SIZE = 32 * 1024
+
+
+def available_formats():
+    """Форматы, которые можно закодировать в текущем окружении"""
+    if AV_AVAILABLE or shutil.which("ffmpeg"):
+        return ["ogg", "mp3", "wav"]
+    return ["wav"]
+
+
+def negotiate_audio_format(formats=None, sample_rate=None, bitrate=None, supported_rates=(48000,)):
+    """
+    Выбирает формат, частоту и битрейт ответа по предпочтениям клиента
+
+    Args:
+        formats: Форматы в порядке предпочтения клиента (wav, ogg, mp3)
+        sample_rate: Желаемая частота дискретизации
+        bitrate: Желаемый битрейт в бит/с для сжатых форматов
+        supported_rates: Частоты, на которых умеет синтезировать TTS
+
+    Returns:
+        dict с ключами format, sample_rate, bitrate, media_type
+    """
+    available = available_formats()
+    audio_format = next((f for f in (formats or []) if f in available), "wav")
+
+    rates = list(supported_rates)
+    if audio_format == "ogg":
+        rates = [rate for rate in rates if rate in OPUS_SAMPLE_RATES] or [48000]
+    target = sample_rate or max(rates)
+    chosen_rate = min(rates, key=lambda rate: (abs(rate - target), -rate))
+
+    return {
+        "format": audio_format,
+        "sample_rate": chosen_rate,
+        "bitrate": max(6000, min(int(bitrate or DEFAULT_BITRATE), 320000)),
+        "media_type": AUDIO_MEDIA_TYPES[audio_format],
+    }
+
+
+def _encode_wav(audio, sample_rate):
+    """Упаковывает int16 моно аудио в WAV в памяти"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(audio.tobytes())
+    return buffer.getvalue()
+
+
+def _encode_av(audio, sample_rate, audio_format, bitrate):
+    """Кодирование через PyAV (libav внутри процесса)"""
+    container_format, codec = _CODECS[audio_format]
+    buffer = io.BytesIO()
+    with av.open(buffer, mode="w", format=container_format) as container:
+        stream = container.add_stream(codec, rate=sample_rate)
+        stream.codec_context.layout = "mono"
+        stream.codec_context.bit_rate = bitrate
+
+        frame = av.AudioFrame.from_ndarray(audio.reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = sample_rate
+        # PyAV сам нарезает кадр под frame_size кодека (960 отсчетов для Opus)
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue()
+
+
+def _encode_ffmpeg(audio, sample_rate, audio_format, bitrate):
+    """Кодирование через FFmpeg: PCM в stdin, результат из stdout"""
+    container_format, codec = _CODECS[audio_format]
+    command = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-f", "s16le",
+        "-ar", str(sample_rate),
+        "-ac", "1",
+        "-i", "pipe:0",
+        "-c:a", codec,
+        "-b:a", str(bitrate),
+        "-f", container_format,
+        "pipe:1"
+    ]
+    try:
+        result = subprocess.run(command, input=audio.tobytes(), capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Ошибка кодирования FFmpeg: {e.stderr.decode(errors='ignore').strip()}")
+    return result.stdout
+
+
+def encode_audio(audio, sample_rate, audio_format="wav", bitrate=DEFAULT_BITRATE):
+    """
+    Кодирует int16 моно аудио в заданный формат
+
+    Returns:
+        Байты файла (WAV, OGG/Opus или MP3)
+    """
+    if audio_format == "wav":
+        return _encode_wav(audio, sample_rate)
+    if audio_format not in _CODECS:
+        raise ValueError(f"Неподдерживаемый формат аудио: {audio_format}")
+
+    if AV_AVAILABLE:
+        return _encode_av(audio, sample_rate, audio_format, bitrate)
+    if shutil.which("ffmpeg"):
+        return _encode_ffmpeg(audio, sample_rate, audio_format, bitrate)
+    raise RuntimeError(f"Для формата {audio_format} требуется PyAV или FFmpeg")
+
+
+def iter_chunks(data, chunk_size=STREAM_CHUNK_SIZE):
+    """Делит закодированный файл на части для потоковой отправки"""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
@@ -20,6 +20,16 @@ DIARIZE_MODEL = "pyannote/speaker-diarization-3.1"
 # Пути для других модулей
 MODEL_PATH = str(PROJECT_ROOT / "models")  # Путь к конкретной модели LLM
 MEMORY_PATH = str(PROJECT_ROOT / "memory")  # Путь к папке с памятью диалогов
+TRANSCRIPT_CACHE_DIR = str(PROJECT_ROOT / "transcript_cache")  # Кэш готовых транскрипций
+TRANSCRIPT_CACHE_MAX_MB = 500  # Максимальный размер кэша транскрипций
+# Кэш декодированного аудио (.npy, по хэшу содержимого). Отключен по умолчанию: каждая
+# запись занимает ~230 МБ на час аудио, а готовые транскрипции уже кэшируются; полезен
+# при повторной обработке тех же файлов с разными настройками (str(PROJECT_ROOT / "decoded_audio_cache"))
+DECODED_AUDIO_CACHE_DIR = None
+DECODED_AUDIO_CACHE_MAX_MB = 2000  # Максимальный размер кэша декодированного аудио
+TTS_CACHE_MAX_MB = 64  # Максимальный размер кэша синтезированной речи в памяти
+TTS_CHUNK_WORKERS = 2  # Потоки параллельного синтеза частей длинного текста
+TTS_TORCH_THREADS = 4  # Потоки torch для синтеза речи (отдельно от n_threads LLM)
 
 # Проверяем существование папок
 WHISPERX_MODELS_EXIST = os.path.exists(WHISPERX_MODELS_DIR)
@@ -0,0 +1,220 @@
+"""
+Однократное декодирование медиафайла для всех стадий обработки
+
+Файл декодируется один раз в 16 кГц моно float32, и этот массив передается
+в ASR, диаризацию и выравнивание вместо того, чтобы каждая стадия заново
+запускала FFmpeg или читала файл с диска. Результат можно сохранить в кэш
+и открывать через memmap без повторного декодирования.
+"""
+
+import hashlib
+import io
+import os
+import subprocess
+import time
+from math import gcd
+
+import numpy as np
+import soundfile as sf
+
+SAMPLE_RATE = 16000
+
+
+def resample(samples, orig_sr, target_sr=SAMPLE_RATE):
+    """Полифазная передискретизация float32 массива"""
+    if orig_sr == target_sr or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+    from scipy.signal import resample_poly
+    factor = gcd(int(orig_sr), int(target_sr))
+    return resample_poly(samples, target_sr // factor, orig_sr // factor).astype(np.float32)
+
+
+class DecodedAudio:
+    """Аудио 16 кГц моно float32 в диапазоне [-1, 1], общее для всех стадий пайплайна"""
+
+    def __init__(self, samples, sample_rate=SAMPLE_RATE, source=None):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.source = source
+
+    @classmethod
+    def from_file(cls, path, cache_dir=None, max_cache_bytes=None):
+        """
+        Декодирует медиафайл (аудио или видео)
+
+        Args:
+            path: Путь к файлу
+            cache_dir: Папка кэша; если задана, декодированный массив сохраняется
+                туда и при повторном вызове с тем же содержимым файла
+                открывается через memmap
+            max_cache_bytes: Предельный размер папки кэша; давно не использованные
+                файлы удаляются
+
+        Returns:
+            DecodedAudio
+        """
+        cache_path = cls._cache_path(path, cache_dir) if cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            # Время доступа хранится в mtime - по нему работает вытеснение
+            try:
+                os.utime(cache_path, None)
+            except OSError:
+                pass
+            return cls(np.load(cache_path, mmap_mode="c"), source=path)
+
+        samples = cls._decode(path)
+
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}.{time.monotonic_ns()}.tmp.npy"
+            np.save(temp_path, samples)
+            os.replace(temp_path, cache_path)
+            if max_cache_bytes:
+                cls._evict_cache(cache_dir, max_cache_bytes, keep=cache_path)
+            # Копирование при записи: массив доступен для записи без копии в памяти
+            samples = np.load(cache_path, mmap_mode="c")
+        return cls(samples, source=path)
+
+    @staticmethod
+    def _evict_cache(cache_dir, max_bytes, keep=None):
+        """Удаляет самые давно использованные файлы кэша, пока папка больше max_bytes"""
+        files = []
+        total = 0
+        for name in os.listdir(cache_dir):
+            if not name.endswith(".npy") or name.endswith(".tmp.npy"):
+                continue
+            path = os.path.join(cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                # Файл открыт через memmap другой обработкой (Windows) - пропускаем
+                pass
+
+    @staticmethod
+    def _cache_path(path, cache_dir, chunk_size=1024 * 1024):
+        """
+        Имя файла кэша по SHA-256 содержимого исходника
+
+        Загрузки сохраняются под новыми временными именами, поэтому ключ по
+        пути никогда бы не совпал; чтение файла для хэша намного дешевле
+        повторного декодирования.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                digest.update(block)
+        return os.path.join(cache_dir, digest.hexdigest() + ".npy")
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Декодирует медиафайл из памяти (например, запись, пришедшую по WebSocket)
+
+        Данные не записываются на диск: WAV/FLAC/OGG читаются soundfile из буфера,
+        остальные форматы (WebM/Opus и др.) передаются в FFmpeg через stdin,
+        а без FFmpeg - декодируются PyAV.
+        """
+        return cls(cls._decode_bytes(data))
+
+    @staticmethod
+    def _ffmpeg_command(source):
+        """Команда FFmpeg для декодирования в 16 кГц моно float32 в stdout"""
+        command = [
+            "ffmpeg",
+            "-loglevel", "error",
+            "-threads", "0",
+            "-i", source,
+            "-vn",                      # Без видео
+            "-f", "f32le",              # Сырой PCM float32
+            "-ac", "1",                 # Моно
+            "-ar", str(SAMPLE_RATE),    # 16 кГц
+            "pipe:1"
+        ]
+        if source != "pipe:0":
+            # Вход из файла: FFmpeg не должен читать stdin
+            command.insert(1, "-nostdin")
+        return command
+
+    @staticmethod
+    def _decode(path):
+        """Декодирует файл через FFmpeg, без него - через soundfile"""
+        try:
+            result = subprocess.run(DecodedAudio._ffmpeg_command(path), capture_output=True, check=True)
+            return np.frombuffer(result.stdout, dtype=np.float32)
+        except FileNotFoundError:
+            pass
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Ошибка декодирования FFmpeg: {e.stderr.decode(errors='ignore').strip()}")
+
+        data, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+        return resample(data.mean(axis=1), sample_rate)
+
+    @staticmethod
+    def _decode_bytes(data):
+        """Декодирует содержимое файла из памяти"""
+        try:
+            samples, sample_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+            return resample(samples.mean(axis=1), sample_rate)
+        except Exception:
+            # Формат не поддерживается libsndfile (например, WebM из MediaRecorder)
+            pass
+
+        try:
+            result = subprocess.run(DecodedAudio._ffmpeg_command("pipe:0"), input=data,
+                                    capture_output=True, check=True)
+            return np.frombuffer(result.stdout, dtype=np.float32)
+        except FileNotFoundError:
+            pass
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Ошибка декодирования FFmpeg: {e.stderr.decode(errors='ignore').strip()}")
+
+        import av
+        chunks = []
+        with av.open(io.BytesIO(data)) as container:
+            resampler = av.AudioResampler(format="flt", layout="mono", rate=SAMPLE_RATE)
+            for frame in container.decode(audio=0):
+                for resampled in resampler.resample(frame):
+                    chunks.append(resampled.to_ndarray().reshape(-1))
+            for resampled in resampler.resample(None):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+        if not chunks:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(chunks).astype(np.float32, copy=False)
+
+    @property
+    def duration(self):
+        """Длительность в секундах"""
+        return len(self.samples) / self.sample_rate
+
+    def __len__(self):
+        return len(self.samples)
+
+    def as_array(self):
+        """Массив для WhisperX (model.transcribe, whisperx.align)"""
+        return np.asarray(self.samples, dtype=np.float32)
+
+    def as_pyannote(self):
+        """
+        Вход для пайплайна pyannote без повторного чтения файла
+
+        Тензор разделяет память с массивом. torch.from_numpy требует буфер,
+        доступный для записи: вывод FFmpeg (np.frombuffer) только для чтения,
+        поэтому такой массив копируется один раз и заменяет исходный.
+        """
+        import torch
+        self.samples = np.require(self.samples, dtype=np.float32, requirements="W")
+        waveform = torch.from_numpy(self.samples).unsqueeze(0)
+        return {"waveform": waveform, "sample_rate": self.sample_rate}
@@ -10,13 +10,21 @@ from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.docstore.document import Document
 
 class DocumentProcessor:
-    def __init__(self):
+    # Параметры разбиения текста на чанки (уменьшены для экономии токенов)
+    CHUNK_SIZE = 500  # Уменьшили с 1000 до 500
+    CHUNK_OVERLAP = 100  # Уменьшили с 200 до 100
+    # Количество строк Excel в одном пакете при потоковом чтении
+    EXCEL_BATCH_ROWS = 200
+
+    def __init__(self, excel_table_mode=False):
         print("Инициализируем DocumentProcessor...")
         # Инициализация векторного хранилища с пустым набором
         self.documents = []
         self.doc_names = []
         self.embeddings = None
         self.vectorstore = None
+        # Табличный режим Excel по умолчанию: группы строк с повторяемым заголовком таблицы
+        self.excel_table_mode = excel_table_mode
 
         print("DocumentProcessor инициализирован")
         self.init_embeddings()
@@ -37,8 +45,12 @@ class DocumentProcessor:
             traceback.print_exc()
             self.embeddings = None
     
-    def process_document(self, file_path):
-        """Обработка документа в зависимости от его типа"""
+    def process_document(self, file_path, excel_table_mode=None):
+        """Обработка документа в зависимости от его типа
+        
+        excel_table_mode переопределяет табличный режим Excel для этого файла
+        (None - значение по умолчанию процессора).
+        """
         file_extension = os.path.splitext(file_path)[1].lower()
         document_text = ""
         
@@ -48,9 +60,34 @@ class DocumentProcessor:
             if file_extension == '.docx':
                 document_text = self.extract_text_from_docx(file_path)
             elif file_extension == '.pdf':
-                document_text = self.extract_text_from_pdf(file_path)
+                # PDF обрабатываем постранично, не собирая весь текст в памяти
+                doc_name = os.path.basename(file_path)
+                ocr_pages = []
+                pages = (text for _, text in self.iter_pdf_pages(file_path, ocr_pages=ocr_pages))
+                total_chars = self.add_document_stream(pages, doc_name, update_index=False)
+                
+                # Страницы без текстового слоя распознаем сразу, пока файл еще существует
+                message = f"Документ {doc_name} успешно обработан"
+                if ocr_pages:
+                    ocr_texts, failed_pages = self.ocr_pdf_pages(file_path, ocr_pages)
+                    total_chars += self.add_document_stream(ocr_texts, doc_name, update_index=False)
+                    if failed_pages:
+                        message += f" (не распознано страниц без текста: {len(failed_pages)})"
+                
+                self.update_vectorstore()
+                print(f"Извлечено текста: {total_chars} символов")
+                print(f"Документ добавлен в коллекцию. Всего документов: {len(self.doc_names)}")
+                return True, message
             elif file_extension in ['.xlsx', '.xls']:
-                document_text = self.extract_text_from_excel(file_path)
+                # Excel читаем в режиме read-only и отдаем в чанкер пакетами строк
+                doc_name = os.path.basename(file_path)
+                if excel_table_mode is None:
+                    excel_table_mode = self.excel_table_mode
+                batches = self.iter_excel_row_batches(file_path, table_mode=excel_table_mode)
+                total_chars = self.add_document_stream(batches, doc_name)
+                print(f"Извлечено текста: {total_chars} символов")
+                print(f"Документ добавлен в коллекцию. Всего документов: {len(self.doc_names)}")
+                return True, f"Документ {doc_name} успешно обработан"
             elif file_extension == '.txt':
                 document_text = self.extract_text_from_txt(file_path)
             elif file_extension in ['.jpg', '.jpeg', '.png', '.webp']:
@@ -91,52 +128,178 @@ class DocumentProcessor:
     def extract_text_from_pdf(self, file_path):
         """Извлечение текста из PDF файла"""
         print(f"Извлекаем текст из PDF файла: {file_path}")
-        text = ""
+        text = "".join(page_text for _, page_text in self.iter_pdf_pages(file_path))
+        print(f"Из PDF извлечено {len(text)} символов")
+        return text
+    
+    def iter_pdf_pages(self, file_path, ocr_pages=None):
+        """Постраничное извлечение текста из PDF (генератор)
+        
+        Каждая страница сначала обрабатывается pdfplumber, при ошибке - PyPDF2
+        только для этой страницы. Номера страниц без текстового слоя
+        добавляются в список ocr_pages (если он передан) для распознавания
+        через ocr_pdf_pages(). Возвращает кортежи (номер страницы, текст).
+        """
+        plumber_pdf = None
+        pypdf_file = None
+        pypdf_reader = None
         
-        # Используем PDFPlumber для более точного извлечения текста
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text += page.extract_text() or ""
-            print(f"PDFPlumber успешно извлек {len(text)} символов")
-        except Exception as e:
-            print(f"Ошибка при извлечении текста с помощью pdfplumber: {str(e)}")
-            
-            # Резервный метод с PyPDF2
             try:
-                with open(file_path, 'rb') as file:
-                    reader = PyPDF2.PdfReader(file)
-                    for page in reader.pages:
-                        text += page.extract_text() or ""
-                print(f"PyPDF2 успешно извлек {len(text)} символов")
-            except Exception as e2:
-                print(f"Ошибка при извлечении текста с помощью PyPDF2: {str(e2)}")
-                raise
+                plumber_pdf = pdfplumber.open(file_path)
+                page_count = len(plumber_pdf.pages)
+            except Exception as e:
+                print(f"pdfplumber не смог открыть файл: {str(e)}")
+                plumber_pdf = None
+                pypdf_file = open(file_path, 'rb')
+                pypdf_reader = PyPDF2.PdfReader(pypdf_file)
+                page_count = len(pypdf_reader.pages)
+            
+            print(f"Страниц в PDF: {page_count}")
+            
+            for page_number in range(page_count):
+                page_text = None
+                
+                # Основной экстрактор - pdfplumber
+                if plumber_pdf is not None:
+                    page = None
+                    try:
+                        page = plumber_pdf.pages[page_number]
+                        page_text = page.extract_text() or ""
+                    except Exception as e:
+                        print(f"pdfplumber: ошибка на странице {page_number + 1}: {str(e)}")
+                        page_text = None
+                    finally:
+                        # Освобождаем кэш разметки страницы, чтобы память не росла
+                        if page is not None and hasattr(page, 'close'):
+                            page.close()
+                
+                # Резервный экстрактор - PyPDF2, только для проблемной страницы
+                if page_text is None:
+                    try:
+                        if pypdf_reader is None:
+                            pypdf_file = open(file_path, 'rb')
+                            pypdf_reader = PyPDF2.PdfReader(pypdf_file)
+                        page_text = pypdf_reader.pages[page_number].extract_text() or ""
+                        print(f"PyPDF2 извлек страницу {page_number + 1}")
+                    except Exception as e:
+                        print(f"PyPDF2: ошибка на странице {page_number + 1}: {str(e)}")
+                        page_text = ""
+                
+                if not page_text.strip():
+                    # Нет текстового слоя - страница пойдет на OCR
+                    if ocr_pages is not None:
+                        ocr_pages.append(page_number)
+                    print(f"Страница {page_number + 1} без текста, требуется OCR")
+                    continue
+                
+                yield page_number, page_text
+        finally:
+            if plumber_pdf is not None:
+                plumber_pdf.close()
+            if pypdf_file is not None:
+                pypdf_file.close()
+    
+    def ocr_pdf_pages(self, file_path, page_numbers):
+        """Распознавание страниц PDF без текстового слоя
         
-        return text
+        Вызывается, пока исходный файл еще доступен. Возвращает кортеж
+        (список распознанных текстов, список номеров нераспознанных страниц).
+        """
+        try:
+            import pytesseract
+        except ImportError:
+            print(f"pytesseract не установлен, страниц без текста пропущено: {len(page_numbers)}")
+            return [], list(page_numbers)
+        
+        texts = []
+        failed = []
+        with pdfplumber.open(file_path) as pdf:
+            for page_number in page_numbers:
+                try:
+                    page = pdf.pages[page_number]
+                    image = page.to_image(resolution=300).original
+                    text = pytesseract.image_to_string(image, lang='rus+eng')
+                    if hasattr(page, 'close'):
+                        page.close()
+                except Exception as e:
+                    print(f"Ошибка OCR страницы {page_number + 1}: {str(e)}")
+                    failed.append(page_number)
+                    continue
+                if text.strip():
+                    texts.append(text)
+                else:
+                    failed.append(page_number)
+        
+        print(f"OCR распознано страниц: {len(texts)}, не распознано: {len(failed)}")
+        return texts, failed
     
     def extract_text_from_excel(self, file_path):
         """Извлечение текста из Excel файла"""
         print(f"Извлекаем текст из Excel файла: {file_path}")
-        workbook = openpyxl.load_workbook(file_path, data_only=True)
-        text_content = []
-        
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            text_content.append(f"Лист: {sheet_name}")
-            
-            for row in sheet.iter_rows():
-                row_values = []
-                for cell in row:
-                    if cell.value is not None:
-                        row_values.append(str(cell.value))
-                if row_values:
-                    text_content.append("\t".join(row_values))
-        
-        result = "\n".join(text_content)
+        result = "\n".join(self.iter_excel_row_batches(file_path))
         print(f"Извлечено {len(result)} символов из Excel")
         return result
     
+    def iter_excel_row_batches(self, file_path, batch_rows=None, table_mode=False):
+        """Потоковое чтение Excel файла пакетами строк (генератор)
+        
+        Книга открывается в режиме read-only, строки читаются итеративно и
+        отдаются текстовыми пакетами, без построения списка всех ячеек.
+        В табличном режиме первая непустая строка листа считается заголовком:
+        строки группируются так, чтобы группа помещалась в один чанк, и
+        каждая группа предваряется названием листа и заголовком.
+        """
+        if batch_rows is None:
+            batch_rows = self.EXCEL_BATCH_ROWS
+        
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet_name in workbook.sheetnames:
+                sheet = workbook[sheet_name]
+                sheet_title = f"Лист: {sheet_name}"
+                header_line = None
+                batch = [] if table_mode else [sheet_title]
+                batch_chars = 0
+                
+                for row in sheet.iter_rows(values_only=True):
+                    row_values = [str(value) for value in row if value is not None]
+                    if not row_values:
+                        continue
+                    line = "\t".join(row_values)
+                    
+                    if not table_mode:
+                        batch.append(line)
+                        if len(batch) >= batch_rows:
+                            yield "\n".join(batch)
+                            batch = []
+                        continue
+                    
+                    if header_line is None:
+                        header_line = line
+                        continue
+                    
+                    # Размер группы ограничен размером чанка с учетом контекста
+                    context_chars = len(sheet_title) + len(header_line) + 2
+                    if batch and (len(batch) >= batch_rows or
+                                  context_chars + batch_chars + len(line) + 1 > self.CHUNK_SIZE):
+                        yield "\n".join([sheet_title, header_line] + batch)
+                        batch = []
+                        batch_chars = 0
+                    batch.append(line)
+                    batch_chars += len(line) + 1
+                
+                if table_mode:
+                    if batch:
+                        yield "\n".join([sheet_title, header_line] + batch)
+                    elif header_line is not None:
+                        # Лист содержит только заголовок
+                        yield "\n".join([sheet_title, header_line])
+                elif batch:
+                    yield "\n".join(batch)
+        finally:
+            workbook.close()
+    
     def extract_text_from_txt(self, file_path):
         """Извлечение текста из TXT файла"""
         print(f"Извлекаем текст из TXT файла: {file_path}")
@@ -197,17 +360,21 @@ class DocumentProcessor:
             print(f"Ошибка при обработке изображения: {len(result)} символов")
             return result
     
+    def _create_text_splitter(self):
+        """Создание сплиттера текста на чанки"""
+        return RecursiveCharacterTextSplitter(
+            chunk_size=self.CHUNK_SIZE,
+            chunk_overlap=self.CHUNK_OVERLAP,
+            length_function=len,
+        )
+    
     def add_document_to_collection(self, text, doc_name):
         """Добавление документа в коллекцию и обновление векторного хранилища"""
         print(f"Добавляем документ '{doc_name}' в коллекцию...")
         print(f"Длина текста: {len(text)} символов")
         
-        # Разбиваем текст на части (уменьшили размер для экономии токенов)
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,  # Уменьшили с 1000 до 500
-            chunk_overlap=100,  # Уменьшили с 200 до 100
-            length_function=len,
-        )
+        # Разбиваем текст на части
+        text_splitter = self._create_text_splitter()
         
         chunks = text_splitter.split_text(text)
         print(f"Создано чанков: {len(chunks)}")
@@ -232,6 +399,51 @@ class DocumentProcessor:
         # Обновляем векторное хранилище
         self.update_vectorstore()
     
+    def add_document_stream(self, text_parts, doc_name, update_index=True):
+        """Добавление документа в коллекцию по частям (страницам, пакетам строк)
+        
+        Каждая часть режется на чанки сразу по мере поступления, поэтому
+        полный текст документа в памяти не собирается. Возвращает число
+        обработанных символов.
+        
+        Продолжения после сбоя с последней добавленной страницы нет намеренно:
+        ошибка страницы не прерывает документ (резервный экстрактор, OCR), а
+        загрузки сохраняются под новыми временными именами и удаляются после
+        обработки, так что продолжать было бы нечего.
+        """
+        print(f"Потоково добавляем документ '{doc_name}' в коллекцию...")
+        text_splitter = self._create_text_splitter()
+        
+        # Продолжаем нумерацию чанков, если документ уже частично добавлен
+        chunk_index = sum(1 for doc in self.documents if doc.metadata.get("source") == doc_name)
+        added_chunks = 0
+        total_chars = 0
+        
+        for part in text_parts:
+            if not part or not part.strip():
+                continue
+            total_chars += len(part)
+            for chunk in text_splitter.split_text(part):
+                self.documents.append(
+                    Document(
+                        page_content=chunk,
+                        metadata={"source": doc_name, "chunk": chunk_index}
+                    )
+                )
+                chunk_index += 1
+                added_chunks += 1
+        
+        if doc_name not in self.doc_names:
+            self.doc_names.append(doc_name)
+        
+        print(f"Создано чанков: {added_chunks}, символов: {total_chars}")
+        print(f"Документ добавлен. Всего документов: {len(self.documents)}, имен: {len(self.doc_names)}")
+        
+        if update_index:
+            self.update_vectorstore()
+        
+        return total_chars
+    
     def update_vectorstore(self):
         """Обновление или создание векторного хранилища"""
         print(f"Обновляем векторное хранилище...")
@@ -383,6 +595,7 @@ class DocumentProcessor:
                 self.documents.pop(i)
             
             print(f"Удалено чанков документа {filename}: {len(documents_to_remove)}")
+            
             print(f"После удаления - self.doc_names: {self.doc_names}")
             print(f"После удаления - self.documents: {len(self.documents)}")
             
@@ -6,12 +6,13 @@ MemoAI Web Backend - FastAPI приложение
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 import uvicorn
 import asyncio
 import json
 import os
 import sys
+import threading
 import traceback
 from typing import List, Dict, Any, Optional
 from datetime import datetime
@@ -33,134 +34,303 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logger.info("Логирование настроено")
 
-# Импорты из оригинального MemoAI
-try:
-    logger.info("Попытка импорта agent...")
-    from backend.agent import ask_agent, model_settings, update_model_settings, reload_model_by_path, get_model_info, initialize_model
-    from backend.context_prompts import context_prompt_manager
-    logger.info("agent импортирован успешно")
-    if ask_agent:
-        logger.info("ask_agent функция доступна")
-    else:
-        logger.warning("ask_agent функция не доступна")
+from backend.model_registry import diarization_models, alignment_models, vosk_models
+from backend.transcript_export import EXPORT_FORMATS, iter_export
+from backend.transcript_cache import TranscriptCache, youtube_media_id
+from backend.config.config import TRANSCRIPT_CACHE_DIR, TRANSCRIPT_CACHE_MAX_MB
+from backend.audio_encoding import negotiate_audio_format, iter_chunks
+
+# Кэш готовых транскрипций по хэшу медиа и настройкам движка
+transcript_cache = TranscriptCache(TRANSCRIPT_CACHE_DIR, max_bytes=TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024)
+
+# Сервисы (LLM, модели речи, документы) создаются при запуске приложения, а не при
+# импорте модуля: процессы пула параллельной транскрибации (spawn) заново
+# импортируют этот скрипт как __mp_main__, и загружать в них модели не нужно
+ask_agent = None
+model_settings = None
+update_model_settings = None
+reload_model_by_path = None
+get_model_info = None
+initialize_model = None
+context_prompt_manager = None
+save_dialog_entry = None
+load_dialog_entry = None
+load_dialog_history = None
+clear_dialog_history = None
+get_recent_dialog_history = None
+speak_text = None
+recognize_speech = None
+recognize_speech_from_file = None
+recognize_speech_from_bytes = None
+check_vosk_model = None
+StreamingRecognizer = None
+preload_vosk_model = None
+SentenceSegmenter = None
+submit_speech_synthesis = None
+preload_tts = None
+get_tts_status = None
+set_tts_threads = None
+synthesize_speech_encoded = None
+DocumentProcessor = None
+UniversalTranscriber = None
+OnlineTranscriber = None
+doc_processor = None
+transcriber = None
+online_transcriber = None
+SILERO_SAMPLE_RATES = (48000,)
+
+
+def init_services():
+    """Импортирует модули MemoAI и инициализирует сервисы (вызывается при запуске приложения)"""
+    global ask_agent, model_settings, update_model_settings, reload_model_by_path, get_model_info
+    global initialize_model, context_prompt_manager, save_dialog_entry, load_dialog_entry
+    global load_dialog_history, clear_dialog_history, get_recent_dialog_history, speak_text
+    global recognize_speech, recognize_speech_from_file, recognize_speech_from_bytes
+    global check_vosk_model, StreamingRecognizer, preload_vosk_model, SentenceSegmenter
+    global submit_speech_synthesis, preload_tts, get_tts_status, set_tts_threads
+    global synthesize_speech_encoded, DocumentProcessor, UniversalTranscriber, OnlineTranscriber
+    global doc_processor, transcriber, online_transcriber, SILERO_SAMPLE_RATES
+
+    # Импорты из оригинального MemoAI
+    try:
+        logger.info("Попытка импорта agent...")
+        from backend.agent import ask_agent, model_settings, update_model_settings, reload_model_by_path, get_model_info, initialize_model
+        from backend.context_prompts import context_prompt_manager
+        logger.info("agent импортирован успешно")
+        if ask_agent:
+            logger.info("ask_agent функция доступна")
+        else:
+            logger.warning("ask_agent функция не доступна")
+
+    except ImportError as e:
+        logger.error(f"Ошибка импорта agent: {e}")
+        print(f"Ошибка импорта agent: {e}")
+        print(f"Текущий путь: {os.getcwd()}")
+        print(f"Python path: {sys.path}")
+        ask_agent = None
+        model_settings = None
+        update_model_settings = None
+        reload_model_by_path = None
+        get_model_info = None
+        initialize_model = None
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при импорте agent: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        ask_agent = None
+        model_settings = None
+        update_model_settings = None
+        reload_model_by_path = None
+        get_model_info = None
+        initialize_model = None
+
+    try:
+        logger.info("Попытка импорта memory...")
+        from backend.memory import save_dialog_entry, load_dialog_history, clear_dialog_history, get_recent_dialog_history
+        logger.info("memory импортирован успешно")
+        if save_dialog_entry:
+            logger.info("save_dialog_entry функция доступна")
+        else:
+            logger.warning("save_dialog_entry функция не доступна")
+
+    except ImportError as e:
+        logger.error(f"Ошибка импорта memory: {e}")
+        print(f"Ошибка импорта memory: {e}")
+        save_dialog_entry = None
+        load_dialog_entry = None
+        load_dialog_history = None
+        clear_dialog_history = None
+        get_recent_dialog_history = None
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при импорте memory: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        save_dialog_entry = None
+        load_dialog_entry = None
+        load_dialog_history = None
+        clear_dialog_history = None
+        get_recent_dialog_history = None
+
+    try:
+        logger.info("Попытка импорта voice...")
+        from backend.voice import speak_text, recognize_speech, recognize_speech_from_file, recognize_speech_from_bytes, check_vosk_model, StreamingRecognizer, preload_vosk_model
+        from backend.voice import SentenceSegmenter, submit_speech_synthesis
+        from backend.voice import preload_tts, get_tts_status, set_tts_threads
+        from backend.voice import synthesize_speech_encoded, SILERO_SAMPLE_RATES
+        logger.info("voice импортирован успешно")
+
+    except ImportError as e:
+        logger.error(f"Ошибка импорта voice: {e}")
+        print(f"Ошибка импорта voice: {e}")
+        speak_text = None
+        recognize_speech = None
+        recognize_speech_from_file = None
+        recognize_speech_from_bytes = None
+        check_vosk_model = None
+        StreamingRecognizer = None
+        preload_vosk_model = None
+        SentenceSegmenter = None
+        submit_speech_synthesis = None
+        synthesize_speech_encoded = None
+        SILERO_SAMPLE_RATES = (48000,)
+        preload_tts = None
+        get_tts_status = None
+        set_tts_threads = None
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при импорте voice: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        speak_text = None
+        recognize_speech = None
+        recognize_speech_from_file = None
+        recognize_speech_from_bytes = None
+        check_vosk_model = None
+        StreamingRecognizer = None
+        preload_vosk_model = None
+        SentenceSegmenter = None
+        submit_speech_synthesis = None
+        synthesize_speech_encoded = None
+        SILERO_SAMPLE_RATES = (48000,)
+        preload_tts = None
+        get_tts_status = None
+        set_tts_threads = None
+
+    try:
+        logger.info("Попытка импорта document_processor...")
+        from backend.document_processor import DocumentProcessor
+        logger.info("document_processor импортирован успешно")
+    except ImportError as e:
+        logger.error(f"Ошибка импорта document_processor: {e}")
+        print("Предупреждение: модуль document_processor не найден")
+        DocumentProcessor = None
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при импорте document_processor: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        DocumentProcessor = None
+
+    try:
+        logger.info("Попытка импорта universal_transcriber...")
+        from backend.universal_transcriber import UniversalTranscriber
+        logger.info("universal_transcriber импортирован успешно")
+    except ImportError as e:
+        logger.error(f"Ошибка импорта universal_transcriber: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        print("Предупреждение: модуль universal_transcriber не найден")
+        UniversalTranscriber = None
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при импорте universal_transcriber: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        UniversalTranscriber = None
+
+    try:
+        logger.info("Попытка импорта online_transcription...")
+        from backend.online_transcription import OnlineTranscriber
+        logger.info("online_transcription импортирован успешно")
+        if OnlineTranscriber:
+            logger.info("OnlineTranscriber класс доступен")
+        else:
+            logger.warning("OnlineTranscriber класс не доступен")
+    except ImportError as e:
+        logger.error(f"Ошибка импорта online_transcription: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        print("Предупреждение: модуль online_transcription не найден")
+        OnlineTranscriber = None
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при импорте online_transcription: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        OnlineTranscriber = None
+
+    # Инициализация сервисов
+    logger.info("=== Инициализация сервисов ===")
+
+    try:
+        logger.info("Импортируем DocumentProcessor...")
+        doc_processor = DocumentProcessor() if DocumentProcessor else None
+        if doc_processor:
+            logger.info("DocumentProcessor инициализирован успешно")
+            # Проверяем состояние
+            doc_list = doc_processor.get_document_list()
+            logger.info(f"Начальное состояние документов: {doc_list}")
+            logger.info(f"Количество документов: {len(doc_list) if doc_list else 0}")
+
+            # Проверяем атрибуты
+            logger.info(f"Vectorstore доступен: {hasattr(doc_processor, 'vectorstore')}")
+            logger.info(f"Documents доступен: {hasattr(doc_processor, 'documents')}")
+            logger.info(f"Doc_names доступен: {hasattr(doc_processor, 'doc_names')}")
+            logger.info(f"Embeddings доступен: {hasattr(doc_processor, 'embeddings')}")
+
+            if hasattr(doc_processor, 'vectorstore'):
+                logger.info(f"Vectorstore значение: {doc_processor.vectorstore is not None}")
+                if doc_processor.vectorstore:
+                    logger.info("Vectorstore инициализирован успешно")
+                else:
+                    logger.warning("Vectorstore не инициализирован")
+            if hasattr(doc_processor, 'documents'):
+                logger.info(f"Documents значение: {len(doc_processor.documents) if doc_processor.documents else 0}")
+                if doc_processor.documents:
+                    logger.info("Documents коллекция содержит документы")
+                else:
+                    logger.info("Documents коллекция пуста")
+            if hasattr(doc_processor, 'doc_names'):
+                logger.info(f"Doc_names значение: {len(doc_processor.doc_names) if doc_processor.doc_names else 0}")
+                if doc_processor.doc_names:
+                    logger.info("Doc_names содержит имена документов")
+                else:
+                    logger.info("Doc_names пуст")
+            if hasattr(doc_processor, 'embeddings'):
+                logger.info(f"Embeddings значение: {doc_processor.embeddings is not None}")
+                if doc_processor.embeddings:
+                    logger.info("Embeddings модель загружена успешно")
+                else:
+                    logger.warning("Embeddings модель не загружена")
+        else:
+            logger.warning("DocumentProcessor не доступен")
+    except Exception as e:
+        logger.error(f"Ошибка инициализации DocumentProcessor: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        doc_processor = None
+
+    try:
+        if UniversalTranscriber:
+            logger.info("Инициализация UniversalTranscriber с движком whisperx...")
+            transcriber = UniversalTranscriber(engine="whisperx")
+            if transcriber:
+                logger.info("UniversalTranscriber инициализирован успешно")
+                # Пайплайн диаризации грузится в фоне, чтобы не задерживать старт сервера
+                threading.Thread(target=transcriber.warmup, daemon=True).start()
+            else:
+                logger.warning("UniversalTranscriber не удалось создать")
+        else:
+            logger.warning("UniversalTranscriber не доступен")
+            transcriber = None
+    except Exception as e:
+        logger.error(f"Ошибка инициализации UniversalTranscriber: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        transcriber = None
+
+    # Модель Vosk общая для голосового чата и транскрибации - грузим ее в фоне заранее
+    if preload_vosk_model:
+        threading.Thread(target=preload_vosk_model, daemon=True).start()
+
+    # Модели Silero загружаем и прогреваем в фоне, чтобы первый голосовой ответ не ждал загрузки
+    if preload_tts:
+        threading.Thread(target=preload_tts, daemon=True).start()
+
+    try:
+        if OnlineTranscriber:
+            logger.info("Инициализация OnlineTranscriber...")
+            online_transcriber = OnlineTranscriber()
+            if online_transcriber:
+                logger.info("OnlineTranscriber инициализирован успешно")
+            else:
+                logger.warning("OnlineTranscriber не удалось создать")
+        else:
+            logger.warning("OnlineTranscriber класс не доступен")
+            online_transcriber = None
+    except Exception as e:
+        logger.error(f"Ошибка инициализации OnlineTranscriber: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        online_transcriber = None
+
+    logger.info("=== Инициализация сервисов завершена ===")
 
-except ImportError as e:
-    logger.error(f"Ошибка импорта agent: {e}")
-    print(f"Ошибка импорта agent: {e}")
-    print(f"Текущий путь: {os.getcwd()}")
-    print(f"Python path: {sys.path}")
-    ask_agent = None
-    model_settings = None
-    update_model_settings = None
-    reload_model_by_path = None
-    get_model_info = None
-    initialize_model = None
-except Exception as e:
-    logger.error(f"Неожиданная ошибка при импорте agent: {e}")
-    import traceback
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    ask_agent = None
-    model_settings = None
-    update_model_settings = None
-    reload_model_by_path = None
-    get_model_info = None
-    initialize_model = None
-    
-try:
-    logger.info("Попытка импорта memory...")
-    from backend.memory import save_dialog_entry, load_dialog_history, clear_dialog_history, get_recent_dialog_history
-    logger.info("memory импортирован успешно")
-    if save_dialog_entry:
-        logger.info("save_dialog_entry функция доступна")
-    else:
-        logger.warning("save_dialog_entry функция не доступна")
-
-except ImportError as e:
-    logger.error(f"Ошибка импорта memory: {e}")
-    print(f"Ошибка импорта memory: {e}")
-    save_dialog_entry = None
-    load_dialog_entry = None
-    load_dialog_history = None
-    clear_dialog_history = None
-    get_recent_dialog_history = None
-except Exception as e:
-    logger.error(f"Неожиданная ошибка при импорте memory: {e}")
-    import traceback
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    save_dialog_entry = None
-    load_dialog_entry = None
-    load_dialog_history = None
-    clear_dialog_history = None
-    get_recent_dialog_history = None
-    
-try:
-    logger.info("Попытка импорта voice...")
-    from backend.voice import speak_text, recognize_speech, recognize_speech_from_file, check_vosk_model
-    logger.info("voice импортирован успешно")
-
-except ImportError as e:
-    logger.error(f"Ошибка импорта voice: {e}")
-    print(f"Ошибка импорта voice: {e}")
-    speak_text = None
-    recognize_speech = None
-    recognize_speech_from_file = None
-    check_vosk_model = None
-except Exception as e:
-    logger.error(f"Неожиданная ошибка при импорте voice: {e}")
-    import traceback
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    speak_text = None
-    recognize_speech = None
-    recognize_speech_from_file = None
-    check_vosk_model = None
-
-try:
-    logger.info("Попытка импорта document_processor...")
-    from backend.document_processor import DocumentProcessor
-    logger.info("document_processor импортирован успешно")
-except ImportError as e:
-    logger.error(f"Ошибка импорта document_processor: {e}")
-    print("Предупреждение: модуль document_processor не найден")
-    DocumentProcessor = None
-except Exception as e:
-    logger.error(f"Неожиданная ошибка при импорте document_processor: {e}")
-    import traceback
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    DocumentProcessor = None
-    
-try:
-    logger.info("Попытка импорта universal_transcriber...")
-    from backend.universal_transcriber import UniversalTranscriber
-    logger.info("universal_transcriber импортирован успешно")
-except ImportError as e:
-    logger.error(f"Ошибка импорта universal_transcriber: {e}")
-    import traceback
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    print("Предупреждение: модуль universal_transcriber не найден")
-    UniversalTranscriber = None
-except Exception as e:
-    logger.error(f"Неожиданная ошибка при импорте universal_transcriber: {e}")
-    import traceback
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    UniversalTranscriber = None
-    
-try:
-    logger.info("Попытка импорта online_transcription...")
-    from backend.online_transcription import OnlineTranscriber
-    logger.info("online_transcription импортирован успешно")
-    if OnlineTranscriber:
-        logger.info("OnlineTranscriber класс доступен")
-    else:
-        logger.warning("OnlineTranscriber класс не доступен")
-except ImportError as e:
-    logger.error(f"Ошибка импорта online_transcription: {e}")
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    print("Предупреждение: модуль online_transcription не найден")
-    OnlineTranscriber = None
-except Exception as e:
-    logger.error(f"Неожиданная ошибка при импорте online_transcription: {e}")
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    OnlineTranscriber = None
 
 # Глобальный словарь для хранения флагов остановки генерации
 stop_generation_flags = {}
@@ -208,93 +378,11 @@ socket_app = ASGIApp(sio, starlette_app)
 # Монтирование Socket.IO
 app.mount("/socket.io", socket_app)
 
-# Инициализация сервисов
-logger.info("=== Инициализация сервисов ===")
-
-try:
-    logger.info("Импортируем DocumentProcessor...")
-    doc_processor = DocumentProcessor() if DocumentProcessor else None
-    if doc_processor:
-        logger.info("DocumentProcessor инициализирован успешно")
-        # Проверяем состояние
-        doc_list = doc_processor.get_document_list()
-        logger.info(f"Начальное состояние документов: {doc_list}")
-        logger.info(f"Количество документов: {len(doc_list) if doc_list else 0}")
-        
-        # Проверяем атрибуты
-        logger.info(f"Vectorstore доступен: {hasattr(doc_processor, 'vectorstore')}")
-        logger.info(f"Documents доступен: {hasattr(doc_processor, 'documents')}")
-        logger.info(f"Doc_names доступен: {hasattr(doc_processor, 'doc_names')}")
-        logger.info(f"Embeddings доступен: {hasattr(doc_processor, 'embeddings')}")
-        
-        if hasattr(doc_processor, 'vectorstore'):
-            logger.info(f"Vectorstore значение: {doc_processor.vectorstore is not None}")
-            if doc_processor.vectorstore:
-                logger.info("Vectorstore инициализирован успешно")
-            else:
-                logger.warning("Vectorstore не инициализирован")
-        if hasattr(doc_processor, 'documents'):
-            logger.info(f"Documents значение: {len(doc_processor.documents) if doc_processor.documents else 0}")
-            if doc_processor.documents:
-                logger.info("Documents коллекция содержит документы")
-            else:
-                logger.info("Documents коллекция пуста")
-        if hasattr(doc_processor, 'doc_names'):
-            logger.info(f"Doc_names значение: {len(doc_processor.doc_names) if doc_processor.doc_names else 0}")
-            if doc_processor.doc_names:
-                logger.info("Doc_names содержит имена документов")
-            else:
-                logger.info("Doc_names пуст")
-        if hasattr(doc_processor, 'embeddings'):
-            logger.info(f"Embeddings значение: {doc_processor.embeddings is not None}")
-            if doc_processor.embeddings:
-                logger.info("Embeddings модель загружена успешно")
-            else:
-                logger.warning("Embeddings модель не загружена")
-    else:
-        logger.warning("DocumentProcessor не доступен")
-except Exception as e:
-    logger.error(f"Ошибка инициализации DocumentProcessor: {e}")
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    doc_processor = None
-
-try:
-    if UniversalTranscriber:
-        logger.info("Инициализация UniversalTranscriber с движком whisperx...")
-        transcriber = UniversalTranscriber(engine="whisperx")
-        if transcriber:
-            logger.info("UniversalTranscriber инициализирован успешно")
-        else:
-            logger.warning("UniversalTranscriber не удалось создать")
-    else:
-        logger.warning("UniversalTranscriber не доступен")
-        transcriber = None
-except Exception as e:
-    logger.error(f"Ошибка инициализации UniversalTranscriber: {e}")
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    transcriber = None
-
-try:
-    if OnlineTranscriber:
-        logger.info("Инициализация OnlineTranscriber...")
-        online_transcriber = OnlineTranscriber()
-        if online_transcriber:
-            logger.info("OnlineTranscriber инициализирован успешно")
-        else:
-            logger.warning("OnlineTranscriber не удалось создать")
-    else:
-        logger.warning("OnlineTranscriber класс не доступен")
-        online_transcriber = None
-except Exception as e:
-    logger.error(f"Ошибка инициализации OnlineTranscriber: {e}")
-    logger.error(f"Traceback: {traceback.format_exc()}")
-    online_transcriber = None
-
-logger.info("=== Инициализация сервисов завершена ===")
-
 # Глобальные настройки транскрибации
 current_transcription_engine = "whisperx"
 current_transcription_language = "ru"
+current_transcription_compute_type = None  # Тип вычислений WhisperX (None - по умолчанию устройства)
+current_transcription_cpu_profile = None  # Профиль WhisperX на CPU (None - по умолчанию)
 
 # Глобальные настройки памяти
 memory_max_messages = 20
@@ -306,7 +394,9 @@ SETTINGS_FILE = os.path.join(os.path.dirname(__file__), "..", "settings.json")
 
 def load_app_settings():
     """Загрузить настройки приложения из файла"""
-    global current_transcription_engine, current_transcription_language, memory_max_messages, memory_include_system_prompts, memory_clear_on_restart
+    global current_transcription_engine, current_transcription_language, current_transcription_compute_type
+    global current_transcription_cpu_profile
+    global memory_max_messages, memory_include_system_prompts, memory_clear_on_restart
     
     try:
         if os.path.exists(SETTINGS_FILE):
@@ -315,6 +405,8 @@ def load_app_settings():
             
             current_transcription_engine = settings.get('transcription_engine', 'whisperx')
             current_transcription_language = settings.get('transcription_language', 'ru')
+            current_transcription_compute_type = settings.get('transcription_compute_type')
+            current_transcription_cpu_profile = settings.get('transcription_cpu_profile')
             
             # Загружаем настройки памяти
             memory_max_messages = settings.get('memory_max_messages', 20)
@@ -361,14 +453,46 @@ def save_app_settings(settings_to_save):
 # Загружаем настройки при старте
 loaded_settings = load_app_settings()
 
-# Очищаем память при перезапуске, если это настроено
-if memory_clear_on_restart and clear_dialog_history:
+
+@app.on_event("startup")
+async def startup_event():
+    """Инициализация сервисов и применение сохраненных настроек при запуске приложения"""
+    init_services()
+    
+    # Применяем сохраненный тип вычислений WhisperX (в том числе подобранный калибровкой)
+    if current_transcription_compute_type and transcriber and hasattr(transcriber, 'set_compute_type'):
+        if not transcriber.set_compute_type(current_transcription_compute_type):
+            logger.warning(f"Сохраненный тип вычислений {current_transcription_compute_type} не применим, используется тип по умолчанию")
+    
+    # Профиль CPU (тип вычислений, потоки, загрузчики) применяется после типа вычислений
+    if current_transcription_cpu_profile and transcriber and hasattr(transcriber, 'set_cpu_profile'):
+        if not transcriber.set_cpu_profile(current_transcription_cpu_profile):
+            logger.warning(f"Сохраненный профиль CPU {current_transcription_cpu_profile} не применим, используется профиль по умолчанию")
+    
+    # Очищаем память при перезапуске, если это настроено
+    if memory_clear_on_restart and clear_dialog_history:
+        try:
+            logger.info("Очистка памяти при перезапуске (настройка включена)")
+            clear_dialog_history()
+            logger.info("Память очищена при перезапуске")
+        except Exception as e:
+            logger.warning(f"Не удалось очистить память при перезапуске: {e}")
+    
+    # Восстанавливаем сохраненную модель
     try:
-        logger.info("Очистка памяти при перезапуске (настройка включена)")
-        clear_dialog_history()
-        logger.info("Память очищена при перезапуске")
+        saved_model_path = loaded_settings.get('current_model_path')
+        
+        if saved_model_path and os.path.exists(saved_model_path) and reload_model_by_path:
+            logger.info(f"Восстанавливаю сохраненную модель: {saved_model_path}")
+            success = reload_model_by_path(saved_model_path)
+            if success:
+                logger.info(f"Модель восстановлена: {saved_model_path}")
+            else:
+                logger.warning(f"Не удалось восстановить модель: {saved_model_path}")
+        else:
+            logger.info("Нет сохраненной модели для восстановления")
     except Exception as e:
-        logger.warning(f"Не удалось очистить память при перезапуске: {e}")
+        logger.error(f"Ошибка восстановления модели: {e}")
 
 # WebSocket менеджер для управления соединениями
 class ConnectionManager:
@@ -946,12 +1070,199 @@ async def websocket_chat(websocket: WebSocket):
         logger.error(f"WebSocket error: {e}")
         manager.disconnect(websocket)
 
-async def process_audio_data(websocket: WebSocket, data: bytes):
-    """Обработка аудио данных от WebSocket клиента"""
-    import tempfile
-    temp_dir = tempfile.gettempdir()
-    audio_file = os.path.join(temp_dir, f"voice_{datetime.now().timestamp()}.wav")
-    
+def default_voice_audio_config():
+    """Формат аудио ответов голосового чата по умолчанию (WAV 48 кГц одним сообщением, как раньше)"""
+    config = negotiate_audio_format(["wav"], sample_rate=48000, supported_rates=SILERO_SAMPLE_RATES)
+    config["chunked"] = False
+    return config
+
+def _log_reply_error(task):
+    """Логирует ошибку задачи ответа голосового чата (отмена ошибкой не считается)"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Ошибка ответа голосового чата: {task.exception()}")
+
+async def respond_to_speech(websocket: WebSocket, recognized_text: str, audio_config: Optional[dict] = None):
+    """
+    Отправляет распознанный текст в LLM и возвращает клиенту ответ и синтезированную речь
+
+    По умолчанию протокол прежний: после генерации клиент получает
+    ai_response, а затем все аудио ответа одним бинарным сообщением.
+    Если клиент включил chunked в audio_config, токены LLM собираются в
+    предложения, каждое предложение сразу уходит на синтез в поток TTS,
+    а готовое аудио отправляется парой tts_chunk (заголовок) + бинарное
+    сообщение, пока LLM генерирует продолжение; ai_response приходит после
+    аудио уже озвученных предложений, tts_complete завершает ответ.
+    Формат, частота и битрейт аудио берутся из согласованного audio_config
+    (по умолчанию WAV 48 кГц).
+
+    Вызывается отдельной задачей соединения: при отмене задачи (новая фраза
+    или stop_processing) генерация LLM прерывается, а неотправленное аудио
+    отбрасывается.
+    """
+    audio_config = audio_config or default_voice_audio_config()
+    # Отправляем распознанный текст клиенту
+    await websocket.send_text(json.dumps({
+        "type": "speech_recognized",
+        "text": recognized_text,
+        "timestamp": datetime.now().isoformat()
+    }))
+
+    # Получаем ответ от AI
+    if not ask_agent:
+        logger.warning("ask_agent функция не доступна")
+        await websocket.send_text(json.dumps({
+            "type": "speech_error", 
+            "error": "AI модуль недоступен. Проверьте загрузку модели."
+        }))
+        return
+
+    history = get_recent_dialog_history(max_entries=memory_max_messages) if get_recent_dialog_history else []
+    logger.info(f"ОТПРАВЛЯЮ В LLM: текст='{recognized_text}', история={len(history)} записей")
+
+    loop = asyncio.get_running_loop()
+    tts_available = submit_speech_synthesis is not None
+    chunked = bool(audio_config.get("chunked"))
+    segmenter = SentenceSegmenter() if tts_available and chunked else None
+
+    # Очередь сообщений клиенту: отправляет их одна задача, чтобы текст и аудио не перемешивались
+    outgoing = asyncio.Queue()
+    # Ответ отменен: поток LLM проверяет флаг в stream_callback
+    cancelled = threading.Event()
+
+    def queue_sentence(sentence):
+        # Синтез стартует сразу, пока LLM генерирует следующее предложение
+        future = asyncio.wrap_future(submit_speech_synthesis(
+            sentence, speaker='baya', lang='ru',
+            sample_rate=audio_config["sample_rate"],
+            audio_format=audio_config["format"],
+            bitrate=audio_config["bitrate"]
+        ))
+        outgoing.put_nowait(("speech", (sentence, future)))
+
+    def stream_callback(chunk, accumulated_text):
+        if cancelled.is_set() or globals().get('voice_chat_stop_flag', False):
+            return False
+        if segmenter is not None:
+            for sentence in segmenter.feed(chunk):
+                loop.call_soon_threadsafe(queue_sentence, sentence)
+        return True
+
+    async def send_outgoing():
+        """Отправляет клиенту аудио предложений по мере готовности, в порядке текста"""
+        index = 0
+        while True:
+            item = await outgoing.get()
+            if item is None:
+                return index
+            kind, payload = item
+            if kind == "message":
+                await websocket.send_text(json.dumps(payload))
+                continue
+
+            sentence, future = payload
+            try:
+                audio_data = await future
+            except Exception as tts_error:
+                logger.error(f"Ошибка синтеза предложения: {tts_error}")
+                audio_data = None
+            if globals().get('voice_chat_stop_flag', False):
+                continue
+            if audio_data and not chunked:
+                await websocket.send_bytes(audio_data)
+                index += 1
+            elif audio_data:
+                # Заголовок кадра: клиент знает формат и размер следующего бинарного сообщения
+                await websocket.send_text(json.dumps({
+                    "type": "tts_chunk",
+                    "index": index,
+                    "text": sentence,
+                    "format": audio_config["format"],
+                    "sample_rate": audio_config["sample_rate"],
+                    "size": len(audio_data)
+                }))
+                await websocket.send_bytes(audio_data)
+                index += 1
+
+    sender = asyncio.create_task(send_outgoing())
+
+    try:
+        try:
+            current_model_path = get_current_model_path()
+            ai_response = await loop.run_in_executor(None, lambda: ask_agent(
+                recognized_text,
+                history=history,
+                streaming=True,
+                stream_callback=stream_callback,
+                model_path=current_model_path
+            ))
+        except Exception as ai_error:
+            logger.error(f"Ошибка обращения к AI: {ai_error}")
+            outgoing.put_nowait(None)
+            await sender
+            await websocket.send_text(json.dumps({
+                "type": "speech_error",
+                "error": f"Ошибка AI модуля: {str(ai_error)}"
+            }))
+            return
+
+        if ai_response is None:
+            # Генерация остановлена командой stop_processing
+            logger.info("Генерация ответа голосового чата остановлена")
+            outgoing.put_nowait(None)
+            await sender
+            return
+
+        logger.info(f"ОТВЕТ ОТ LLM: '{ai_response[:100]}{'...' if len(ai_response) > 100 else ''}')")
+
+        # Сохраняем в память
+        save_dialog_entry("user", recognized_text)
+        save_dialog_entry("assistant", ai_response)
+
+        # Отправляем ответ AI клиенту: в chunked режиме - после аудио уже
+        # озвученных предложений, иначе сразу, а за ним аудио всего ответа
+        outgoing.put_nowait(("message", {
+            "type": "ai_response",
+            "text": ai_response,
+            "timestamp": datetime.now().isoformat()
+        }))
+        if segmenter is not None:
+            for sentence in segmenter.flush():
+                queue_sentence(sentence)
+        elif tts_available and ai_response.strip():
+            queue_sentence(ai_response)
+        outgoing.put_nowait(None)
+        sent_chunks = await sender
+
+        if not tts_available:
+            logger.warning("Синтез речи недоступен")
+            await websocket.send_text(json.dumps({
+                "type": "tts_error",
+                "error": "Модуль синтеза речи недоступен. Проверьте установку TTS библиотек."
+            }))
+        elif sent_chunks == 0 and ai_response.strip() and not globals().get('voice_chat_stop_flag', False):
+            # Синтез не удался
+            await websocket.send_text(json.dumps({
+                "type": "tts_error",
+                "error": "Ошибка синтеза речи"
+            }))
+        elif chunked:
+            await websocket.send_text(json.dumps({
+                "type": "tts_complete",
+                "chunks": sent_chunks
+            }))
+    except asyncio.CancelledError:
+        # Задачу ответа отменили: останавливаем LLM и отправку аудио
+        cancelled.set()
+        sender.cancel()
+        raise
+
+async def process_audio_data(websocket: WebSocket, data: bytes, start_reply):
+    """
+    Обработка аудио данных от WebSocket клиента
+
+    Распознанная фраза передается в start_reply, который запускает ответ
+    отдельной задачей и сразу возвращает управление.
+    """
     # Проверяем флаг остановки голосового чата
     if globals().get('voice_chat_stop_flag', False):
         logger.info("Обработка аудио данных остановлена - установлен флаг остановки")
@@ -960,10 +1271,6 @@ async def process_audio_data(websocket: WebSocket, data: bytes):
     logger.info(f"Начинаю обработку аудио данных размером {len(data)} байт")
     
     try:
-        # Сохраняем временный файл для обработки
-        with open(audio_file, "wb") as f:
-            f.write(data)
-        
         # Проверяем, что получили действительно аудио данные
         if len(data) < 100:  # Слишком маленький размер для аудио
             logger.warning(f"Получены данные слишком маленького размера: {len(data)} байт")
@@ -973,95 +1280,21 @@ async def process_audio_data(websocket: WebSocket, data: bytes):
             }))
             return
         
-        # Распознаем речь
-        logger.info(f"Обрабатываю аудио файл: {audio_file}")
-        
-        if not recognize_speech_from_file:
-            logger.warning("recognize_speech_from_file функция не доступна")
+        # Распознаем речь прямо из памяти, без временных файлов
+        if not recognize_speech_from_bytes:
+            logger.warning("recognize_speech_from_bytes функция не доступна")
             await websocket.send_text(json.dumps({
                 "type": "speech_error",
                 "error": "Модуль распознавания речи недоступен. Проверьте установку Vosk."
             }))
             return
             
-        recognized_text = recognize_speech_from_file(audio_file)
+        loop = asyncio.get_running_loop()
+        recognized_text = await loop.run_in_executor(None, recognize_speech_from_bytes, data)
         logger.info(f"РАСПОЗНАННЫЙ ТЕКСТ: '{recognized_text}'")
         
         if recognized_text and recognized_text.strip():
-            # Отправляем распознанный текст клиенту
-            await websocket.send_text(json.dumps({
-                "type": "speech_recognized",
-                "text": recognized_text,
-                "timestamp": datetime.now().isoformat()
-            }))
-            
-            # Получаем ответ от AI
-            if not ask_agent:
-                logger.warning("ask_agent функция не доступна")
-                await websocket.send_text(json.dumps({
-                    "type": "speech_error", 
-                    "error": "AI модуль недоступен. Проверьте загрузку модели."
-                }))
-                return
-                
-            history = get_recent_dialog_history(max_entries=memory_max_messages) if get_recent_dialog_history else []
-            logger.info(f"ОТПРАВЛЯЮ В LLM: текст='{recognized_text}', история={len(history)} записей")
-            
-            try:
-                current_model_path = get_current_model_path()
-                ai_response = ask_agent(recognized_text, history=history, streaming=False, model_path=current_model_path)
-                logger.info(f"ОТВЕТ ОТ LLM: '{ai_response[:100]}{'...' if len(ai_response) > 100 else ''}')")
-            except Exception as ai_error:
-                logger.error(f"Ошибка обращения к AI: {ai_error}")
-                await websocket.send_text(json.dumps({
-                    "type": "speech_error",
-                    "error": f"Ошибка AI модуля: {str(ai_error)}"
-                }))
-                return
-            
-            # Сохраняем в память
-            save_dialog_entry("user", recognized_text)
-            save_dialog_entry("assistant", ai_response)
-            
-            # Отправляем ответ AI клиенту
-            await websocket.send_text(json.dumps({
-                "type": "ai_response",
-                "text": ai_response,
-                "timestamp": datetime.now().isoformat()
-            }))
-            
-            # Синтезируем речь
-            speech_file = os.path.join(temp_dir, f"speech_{datetime.now().timestamp()}.wav")
-            
-            if not speak_text:
-                logger.warning("speak_text функция не доступна")
-                await websocket.send_text(json.dumps({
-                    "type": "tts_error",
-                    "error": "Модуль синтеза речи недоступен. Проверьте установку TTS библиотек."
-                }))
-                return
-            
-            if speak_text(ai_response, speaker='baya', voice_id='ru', save_to_file=speech_file):
-                # Проверяем, что файл создался и не пустой
-                if os.path.exists(speech_file) and os.path.getsize(speech_file) > 44:  # Минимальный размер WAV заголовка
-                    with open(speech_file, "rb") as f:
-                        audio_data = f.read()
-                    await websocket.send_bytes(audio_data)
-                    os.remove(speech_file)
-                else:
-                    # Файл не создался или поврежден
-                    await websocket.send_text(json.dumps({
-                        "type": "tts_error",
-                        "error": "Не удалось создать аудиофайл"
-                    }))
-                    if os.path.exists(speech_file):
-                        os.remove(speech_file)
-            else:
-                # Синтез не удался
-                await websocket.send_text(json.dumps({
-                    "type": "tts_error",
-                    "error": "Ошибка синтеза речи"
-                }))
+            start_reply(recognized_text)
         else:
             logger.warning("Речь не распознана или пустой текст")
             await websocket.send_text(json.dumps({
@@ -1082,10 +1315,20 @@ async def process_audio_data(websocket: WebSocket, data: bytes):
             }))
         except Exception as send_error:
             logger.error(f"Не удалось отправить сообщение об ошибке: {send_error}")
-    finally:
-        # Удаляем временный аудио файл
-        if os.path.exists(audio_file):
-            os.remove(audio_file)
+
+async def handle_stream_events(websocket: WebSocket, events, start_reply):
+    """Отправляет клиенту события потокового распознавания; законченная фраза сразу уходит в LLM"""
+    for event in events:
+        if event["type"] == "partial":
+            await websocket.send_text(json.dumps({
+                "type": "partial_result",
+                "text": event["text"]
+            }))
+        elif event["type"] == "result":
+            logger.info(f"РАСПОЗНАННЫЙ ТЕКСТ (поток): '{event['text']}'")
+            if globals().get('voice_chat_stop_flag', False):
+                continue
+            start_reply(event["text"])
 
 @app.websocket("/ws/voice")
 async def websocket_voice(websocket: WebSocket):
@@ -1106,93 +1349,176 @@ async def websocket_voice(websocket: WebSocket):
             logger.warning(f"Не удалось отправить сообщение об ошибке: {e}")
         # Не закрываем соединение, просто отправляем ошибку
         
+    # Сессия потокового распознавания (создается командой start_stream)
+    stream_session = None
+    # Формат аудио ответов (меняется командой audio_config)
+    audio_config = default_voice_audio_config()
+    loop = asyncio.get_running_loop()
+
+    # Ответ на фразу идет отдельной задачей, чтобы цикл приема продолжал
+    # читать сообщения: stop_processing и новая фраза прерывают текущий ответ
+    reply_task = None
+
+    def cancel_reply():
+        nonlocal reply_task
+        if reply_task is not None and not reply_task.done():
+            reply_task.cancel()
+        reply_task = None
+
+    def start_reply(text):
+        nonlocal reply_task
+        cancel_reply()
+        reply_task = asyncio.create_task(respond_to_speech(websocket, text, audio_config))
+        reply_task.add_done_callback(_log_reply_error)
+
     try:
         while True:
             # Получаем сообщение (может быть JSON команда или аудио байты)
-            try:
-                # Пытаемся получить текстовое сообщение сначала
-                message = await websocket.receive_text()
-                logger.info(f"Получено текстовое сообщение: {message[:100]}...")  # Логируем первые 100 символов
-                
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                data = message["bytes"]
+
+                if stream_session is not None:
+                    # Потоковый режим: кадр сразу уходит в распознаватель соединения
+                    if globals().get('voice_chat_stop_flag', False):
+                        continue
+                    try:
+                        events = await loop.run_in_executor(None, stream_session.accept, data)
+                        await handle_stream_events(websocket, events, start_reply)
+                    except Exception as stream_error:
+                        logger.error(f"Ошибка потокового распознавания: {stream_error}")
+                        await websocket.send_text(json.dumps({
+                            "type": "speech_error",
+                            "error": f"Ошибка потокового распознавания: {str(stream_error)}"
+                        }))
+                    continue
+
+                logger.info(f"Получены аудио данные размером: {len(data)} байт")
+
+                # Обрабатываем аудио данные с дополнительной защитой
                 try:
-                    data = json.loads(message)
-                    logger.debug(f"Распарсенные данные: {data}")
-                    
-                    if data.get("type") == "start_listening":
-                        # Команда начать прослушивание
-                        logger.info("Получена команда start_listening")
+                    await process_audio_data(websocket, data, start_reply)
+                except Exception as process_error:
+                    logger.error(f"Ошибка обработки аудио данных: {process_error}")
+                    logger.error(f"Тип ошибки: {type(process_error).__name__}")
+                    import traceback
+                    logger.error(f"Traceback: {traceback.format_exc()}")
+
+                    # Отправляем ошибку клиенту, но не закрываем соединение
+                    try:
                         await websocket.send_text(json.dumps({
-                            "type": "listening_started",
-                            "message": "Готов к приему голоса"
+                            "type": "error",
+                            "error": f"Ошибка обработки аудио: {str(process_error)}"
                         }))
-                        continue
-                    elif data.get("type") == "stop_processing":
-                        # Команда остановить обработку (новое)
-                        logger.info("Получена команда stop_processing")
-                        # Используем globals() для доступа к глобальной переменной
-                        globals()['voice_chat_stop_flag'] = True
+                    except Exception as send_error:
+                        logger.error(f"Не удалось отправить сообщение об ошибке: {send_error}")
+                continue
+
+            message = message.get("text") or ""
+            logger.info(f"Получено текстовое сообщение: {message[:100]}...")  # Логируем первые 100 символов
+
+            try:
+                data = json.loads(message)
+                logger.debug(f"Распарсенные данные: {data}")
+
+                if data.get("type") == "start_listening":
+                    # Команда начать прослушивание
+                    logger.info("Получена команда start_listening")
+                    await websocket.send_text(json.dumps({
+                        "type": "listening_started",
+                        "message": "Готов к приему голоса"
+                    }))
+                    continue
+                elif data.get("type") == "audio_config":
+                    # Согласование формата ответов: клиент перечисляет форматы в порядке предпочтения;
+                    # chunked включает потоковую отправку аудио по предложениям (tts_chunk)
+                    audio_config = negotiate_audio_format(
+                        data.get("formats"),
+                        sample_rate=data.get("sample_rate"),
+                        bitrate=data.get("bitrate"),
+                        supported_rates=SILERO_SAMPLE_RATES
+                    )
+                    audio_config["chunked"] = bool(data.get("chunked", False))
+                    logger.info(f"Формат аудио ответов: {audio_config}")
+                    await websocket.send_text(json.dumps(dict(audio_config, type="audio_config")))
+                    continue
+                elif data.get("type") == "start_stream":
+                    # Команда начать потоковое распознавание: дальше клиент шлет аудио кадры
+                    logger.info(f"Получена команда start_stream: {data}")
+                    if not StreamingRecognizer:
                         await websocket.send_text(json.dumps({
-                            "type": "processing_stopped",
-                            "message": "Обработка остановлена"
+                            "type": "speech_error",
+                            "error": "Модуль распознавания речи недоступен. Проверьте установку Vosk."
                         }))
-                        logger.info("Флаг остановки голосового чата установлен")
                         continue
-                    elif data.get("type") == "reset_processing":
-                        # Команда сбросить флаг остановки
-                        logger.info("Получена команда reset_processing")
-                        # Используем globals() для доступа к глобальной переменной
-                        globals()['voice_chat_stop_flag'] = False
+                    try:
+                        stream_session = await loop.run_in_executor(None, lambda: StreamingRecognizer(
+                            sample_rate=data.get("sample_rate", 16000),
+                            audio_format=data.get("format", "pcm_s16le"),
+                            endpoint_silence=data.get("endpoint_silence")
+                        ))
+                    except Exception as e:
+                        logger.error(f"Не удалось начать потоковое распознавание: {e}")
                         await websocket.send_text(json.dumps({
-                            "type": "processing_reset",
-                            "message": "Обработка возобновлена"
+                            "type": "speech_error",
+                            "error": f"Не удалось начать потоковое распознавание: {str(e)}"
                         }))
-                        logger.info("Флаг остановки голосового чата сброшен")
                         continue
-                    else:
-                        logger.warning(f"Неизвестный тип сообщения: {data.get('type', 'unknown')}")
-                        logger.debug(f"Полные данные неизвестного сообщения: {data}")
-                        continue
-                        
-                except json.JSONDecodeError as e:
-                    logger.error(f"Ошибка парсинга JSON: {e}")
-                    logger.error(f"Проблемное сообщение: {message}")
+                    await websocket.send_text(json.dumps({
+                        "type": "stream_started",
+                        "sample_rate": stream_session.sample_rate,
+                        "format": stream_session.audio_format
+                    }))
                     continue
-                    
-            except UnicodeDecodeError:
-                # Если не можем декодировать как текст, пробуем получить как байты
-                try:
-                    data = await websocket.receive_bytes()
-                    logger.info(f"Получены аудио данные размером: {len(data)} байт")
-                    
-                    # Обрабатываем аудио данные с дополнительной защитой
-                    try:
-                        await process_audio_data(websocket, data)
-                    except Exception as process_error:
-                        logger.error(f"Ошибка обработки аудио данных: {process_error}")
-                        logger.error(f"Тип ошибки: {type(process_error).__name__}")
-                        import traceback
-                        logger.error(f"Traceback: {traceback.format_exc()}")
-                        
-                        # Отправляем ошибку клиенту, но не закрываем соединение
-                        try:
-                            await websocket.send_text(json.dumps({
-                                "type": "error",
-                                "error": f"Ошибка обработки аудио: {str(process_error)}"
-                            }))
-                        except Exception as send_error:
-                            logger.error(f"Не удалось отправить сообщение об ошибке: {send_error}")
-                        
-                        # Продолжаем работу WebSocket
-                        continue
-                    
-                except Exception as e:
-                    logger.error(f"Ошибка получения аудио данных: {e}")
-                    logger.error(f"Тип ошибки: {type(e).__name__}")
+                elif data.get("type") == "stop_stream":
+                    # Команда завершить поток: дораспознаем остаток фразы
+                    logger.info("Получена команда stop_stream")
+                    if stream_session is not None:
+                        session, stream_session = stream_session, None
+                        events = await loop.run_in_executor(None, session.finish)
+                        await handle_stream_events(websocket, events, start_reply)
+                    await websocket.send_text(json.dumps({
+                        "type": "stream_stopped"
+                    }))
                     continue
-                
-                # Убираем дублирующийся код - теперь обрабатываем через process_audio_data
+                elif data.get("type") == "stop_processing":
+                    # Команда остановить обработку (новое)
+                    logger.info("Получена команда stop_processing")
+                    # Используем globals() для доступа к глобальной переменной
+                    globals()['voice_chat_stop_flag'] = True
+                    cancel_reply()
+                    if stream_session is not None:
+                        stream_session.reset()
+                    await websocket.send_text(json.dumps({
+                        "type": "processing_stopped",
+                        "message": "Обработка остановлена"
+                    }))
+                    logger.info("Флаг остановки голосового чата установлен")
+                    continue
+                elif data.get("type") == "reset_processing":
+                    # Команда сбросить флаг остановки
+                    logger.info("Получена команда reset_processing")
+                    # Используем globals() для доступа к глобальной переменной
+                    globals()['voice_chat_stop_flag'] = False
+                    await websocket.send_text(json.dumps({
+                        "type": "processing_reset",
+                        "message": "Обработка возобновлена"
+                    }))
+                    logger.info("Флаг остановки голосового чата сброшен")
+                    continue
+                else:
+                    logger.warning(f"Неизвестный тип сообщения: {data.get('type', 'unknown')}")
+                    logger.debug(f"Полные данные неизвестного сообщения: {data}")
+                    continue
+
+            except json.JSONDecodeError as e:
+                logger.error(f"Ошибка парсинга JSON: {e}")
+                logger.error(f"Проблемное сообщение: {message}")
                 continue
-                    
+
     except WebSocketDisconnect:
         logger.info("WebSocket отключен клиентом - нормальное отключение")
         try:
@@ -1217,6 +1543,9 @@ async def websocket_voice(websocket: WebSocket):
             # Не закрываем соединение даже при ошибке отправки
         # Убираем finally блок, который закрывал соединение
 
+    # Соединение закрыто - незавершенный ответ больше некому отправлять
+    cancel_reply()
+
 # ================================
 # ИСТОРИЯ ДИАЛОГОВ
 # ================================
@@ -1530,11 +1859,17 @@ class VoiceSynthesizeRequest(BaseModel):
     voice_id: str = "ru"
     voice_speaker: str = "baya"
     speech_rate: float = 1.0
+    format: str = "wav"  # wav, ogg (Opus) или mp3
+    sample_rate: int = 48000  # 24000 вдвое дешевле при синтезе и передаче
+    bitrate: Optional[int] = None  # Битрейт сжатых форматов, бит/с
 
 class TranscriptionSettings(BaseModel):
     engine: str = "whisperx"  # whisperx или vosk
     language: str = "ru"
     auto_detect: bool = True
+    compute_type: Optional[str] = None  # Тип вычислений WhisperX (на CPU: int8, int8_float32, float32)
+    cpu_profile: Optional[str] = None  # Профиль WhisperX на CPU: тип вычислений, потоки и загрузчики
+    alignment: Optional[bool] = None  # Выравнивание слов WhisperX (точные метки слов)
 
 class YouTubeTranscribeRequest(BaseModel):
     url: str
@@ -1545,72 +1880,57 @@ class DocumentQueryRequest(BaseModel):
 @app.post("/api/voice/synthesize")
 async def synthesize_speech(request: VoiceSynthesizeRequest):
     """Синтезировать речь из текста"""
-    if not speak_text:
-        logger.warning("speak_text функция не доступна")
+    if not synthesize_speech_encoded:
+        logger.warning("synthesize_speech_encoded функция не доступна")
         raise HTTPException(status_code=503, detail="Модуль синтеза речи недоступен. Проверьте установку библиотек для TTS (pyttsx3, sounddevice, torch).")
     
-    import tempfile
-    temp_dir = tempfile.gettempdir()
-    audio_file = os.path.join(temp_dir, f"speech_{datetime.now().timestamp()}.wav")
+    audio_config = negotiate_audio_format(
+        [request.format],
+        sample_rate=request.sample_rate,
+        bitrate=request.bitrate,
+        supported_rates=SILERO_SAMPLE_RATES
+    )
     
     try:
         # Логируем отладочную информацию
         logger.info(f"Синтезирую речь: '{request.text[:100]}{'...' if len(request.text) > 100 else ''}'")
-        logger.info(f"Параметры: voice_id={request.voice_id}, voice_speaker={request.voice_speaker}, speech_rate={request.speech_rate}")
-        
-        # Синтезируем речь с правильными параметрами
-        success = speak_text(
-            text=request.text, 
-            speaker=request.voice_speaker, 
-            voice_id=request.voice_id, 
+        logger.info(f"Параметры: voice_id={request.voice_id}, voice_speaker={request.voice_speaker}, speech_rate={request.speech_rate}, аудио={audio_config}")
+        
+        # Синтезируем и кодируем речь в памяти, без временных файлов
+        loop = asyncio.get_running_loop()
+        audio_data = await loop.run_in_executor(None, lambda: synthesize_speech_encoded(
+            request.text,
+            speaker=request.voice_speaker,
+            lang=request.voice_id,
             speech_rate=request.speech_rate,
-            save_to_file=audio_file
-        )
-        
-        if success and os.path.exists(audio_file):
-            logger.info(f"Аудиофайл создан: {audio_file}, размер: {os.path.getsize(audio_file)} байт")
-            
-            # Создаем временную копию для возврата, оригинал удалится автоматически
-            temp_copy = os.path.join(temp_dir, f"speech_copy_{datetime.now().timestamp()}.wav")
-            import shutil
-            shutil.copy2(audio_file, temp_copy)
-            
-            # Возвращаем копию, которая удалится после отправки
-            async def cleanup_temp_file():
-                try:
-                    if os.path.exists(temp_copy):
-                        os.remove(temp_copy)
-                        logger.info(f"Временный файл удален: {temp_copy}")
-                except Exception as e:
-                    logger.error(f"Ошибка при удалении временного файла: {e}")
-            
-            return FileResponse(
-                temp_copy,
-                media_type="audio/wav",
-                filename="speech.wav",
-                background=cleanup_temp_file
-            )
-        else:
-            logger.error(f"Не удалось создать аудиофайл: success={success}, exists={os.path.exists(audio_file)}")
-            raise HTTPException(status_code=500, detail="Не удалось создать аудиофайл")
-            
+            sample_rate=audio_config["sample_rate"],
+            audio_format=audio_config["format"],
+            bitrate=audio_config["bitrate"]
+        ))
     except Exception as e:
         logger.error(f"Ошибка синтеза речи: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Всегда очищаем временные файлы
-        try:
-            if os.path.exists(audio_file):
-                os.remove(audio_file)
-                logger.info(f"Оригинальный временный файл удален: {audio_file}")
-        except Exception as e:
-            logger.error(f"Ошибка при удалении оригинального временного файла: {e}")
+    
+    if not audio_data:
+        logger.error("Не удалось синтезировать речь")
+        raise HTTPException(status_code=500, detail="Не удалось создать аудиофайл")
+    
+    logger.info(f"Аудио создано: {audio_config['format']}, {audio_config['sample_rate']} Гц, {len(audio_data)} байт")
+    return StreamingResponse(
+        iter_chunks(audio_data),
+        media_type=audio_config["media_type"],
+        headers={
+            "Content-Disposition": f'attachment; filename="speech.{audio_config["format"]}"',
+            "Content-Length": str(len(audio_data)),
+            "X-Audio-Sample-Rate": str(audio_config["sample_rate"])
+        }
+    )
 
 @app.post("/api/voice/recognize")
 async def recognize_speech_api(audio_file: UploadFile = File(...)):
     """Распознать речь из аудиофайла"""
-    if not recognize_speech_from_file:
-        logger.warning("recognize_speech_from_file функция не доступна")
+    if not recognize_speech_from_bytes:
+        logger.warning("recognize_speech_from_bytes функция не доступна")
         return {
             "text": "",
             "success": False,
@@ -1618,22 +1938,13 @@ async def recognize_speech_api(audio_file: UploadFile = File(...)):
             "timestamp": datetime.now().isoformat()
         }
     
-    import tempfile
-    temp_dir = tempfile.gettempdir()
-    file_path = os.path.join(temp_dir, f"audio_{datetime.now().timestamp()}.wav")
-    
     try:
-        # Сохраняем загруженный файл
         content = await audio_file.read()
         logger.info(f"Получен аудиофайл: {audio_file.filename}, размер: {len(content)} байт")
         
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        logger.info(f"Аудиофайл сохранен: {file_path}")
-        
-        # Распознаем речь используя правильную функцию
-        text = recognize_speech_from_file(file_path)
+        # Распознаем речь прямо из загруженных данных, без сохранения на диск
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(None, recognize_speech_from_bytes, content)
         
         # Логируем результат распознавания
         logger.info(f"Распознанный текст: '{text}'")
@@ -1647,11 +1958,35 @@ async def recognize_speech_api(audio_file: UploadFile = File(...)):
     except Exception as e:
         logger.error(f"Ошибка распознавания речи: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Всегда удаляем временный файл
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            logger.info(f"Временный файл удален: {file_path}")
+
+class TTSPreloadRequest(BaseModel):
+    languages: List[str] = ["ru", "en"]
+    warmup: bool = True
+    torch_threads: Optional[int] = None  # Потоки torch для синтеза (отдельно от n_threads LLM)
+
+@app.get("/api/voice/tts/status")
+async def get_tts_status_api():
+    """Состояние моделей синтеза речи: загрузка, прогрев, память, потоки и кэш"""
+    if not get_tts_status:
+        raise HTTPException(status_code=503, detail="Модуль синтеза речи недоступен")
+    return get_tts_status()
+
+@app.post("/api/voice/tts/preload")
+async def preload_tts_api(request: TTSPreloadRequest):
+    """Загрузить и прогреть модели синтеза речи"""
+    if not preload_tts:
+        raise HTTPException(status_code=503, detail="Модуль синтеза речи недоступен")
+    
+    if request.torch_threads:
+        set_tts_threads(request.torch_threads)
+    
+    loop = asyncio.get_running_loop()
+    loaded = await loop.run_in_executor(None, lambda: preload_tts(request.languages, warmup=request.warmup))
+    return {
+        "success": len(loaded) > 0,
+        "loaded": loaded,
+        "status": get_tts_status()
+    }
 
 @app.get("/api/voice/settings")
 async def get_voice_settings():
@@ -1676,19 +2011,33 @@ async def update_voice_settings(settings: VoiceSettings):
 @app.get("/api/transcription/settings")
 async def get_transcription_settings():
     """Получить настройки транскрибации"""
-    global current_transcription_engine, current_transcription_language
+    global current_transcription_engine, current_transcription_language, current_transcription_compute_type
     return {
         "engine": current_transcription_engine,
         "language": current_transcription_language,
+        "compute_type": current_transcription_compute_type,
+        "cpu_profile": current_transcription_cpu_profile,
         "auto_detect": True
     }
 
 @app.put("/api/transcription/settings")
 async def update_transcription_settings(settings: TranscriptionSettings):
     """Обновить настройки транскрибации"""
-    global current_transcription_engine, current_transcription_language, transcriber
+    global current_transcription_engine, current_transcription_language, current_transcription_compute_type, transcriber
+    global current_transcription_cpu_profile
     
     try:
+        # Сначала проверяем все поля, чтобы запрос не применился частично
+        target_engine = settings.engine.lower() if settings.engine else current_transcription_engine
+        if target_engine not in ("whisperx", "vosk"):
+            raise HTTPException(status_code=400, detail=f"Неизвестный движок транскрибации: {settings.engine}")
+        if settings.compute_type and transcriber and hasattr(transcriber, 'is_valid_compute_type'):
+            if not transcriber.is_valid_compute_type(settings.compute_type, target_engine):
+                raise HTTPException(status_code=400, detail=f"Недопустимый тип вычислений для {target_engine}: {settings.compute_type}")
+        if settings.cpu_profile and transcriber and hasattr(transcriber, 'is_valid_cpu_profile'):
+            if not transcriber.is_valid_cpu_profile(settings.cpu_profile, target_engine):
+                raise HTTPException(status_code=400, detail=f"Недопустимый профиль CPU для {target_engine}: {settings.cpu_profile}")
+        
         # Обновляем глобальные настройки
         if settings.engine:
             current_transcription_engine = settings.engine.lower()
@@ -1714,10 +2063,27 @@ async def update_transcription_settings(settings: TranscriptionSettings):
             if transcriber and hasattr(transcriber, 'set_language'):
                 transcriber.set_language(current_transcription_language)
         
+        if settings.alignment is not None and transcriber and hasattr(transcriber, 'set_alignment_enabled'):
+            transcriber.set_alignment_enabled(settings.alignment)
+        
+        if settings.compute_type and transcriber and hasattr(transcriber, 'set_compute_type'):
+            if transcriber.set_compute_type(settings.compute_type):
+                current_transcription_compute_type = settings.compute_type
+                # На CPU тип вычислений выбирает профиль - сохраняем его, чтобы
+                # при запуске не применился прежний профиль
+                current_transcription_cpu_profile = transcriber.get_cpu_profile()
+        
+        if settings.cpu_profile and transcriber and hasattr(transcriber, 'set_cpu_profile'):
+            if transcriber.set_cpu_profile(settings.cpu_profile):
+                current_transcription_cpu_profile = settings.cpu_profile
+                current_transcription_compute_type = transcriber.get_cache_settings().get("compute_type")
+        
         # Сохраняем настройки транскрибации в файл
         save_app_settings({
             'transcription_engine': current_transcription_engine,
-            'transcription_language': current_transcription_language
+            'transcription_language': current_transcription_language,
+            'transcription_compute_type': current_transcription_compute_type,
+            'transcription_cpu_profile': current_transcription_cpu_profile
         })
         
         return {
@@ -1726,14 +2092,54 @@ async def update_transcription_settings(settings: TranscriptionSettings):
             "settings": {
                 "engine": current_transcription_engine,
                 "language": current_transcription_language,
+                "compute_type": current_transcription_compute_type,
+                "cpu_profile": current_transcription_cpu_profile,
                 "auto_detect": settings.auto_detect if hasattr(settings, 'auto_detect') else True
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Ошибка обновления настроек транскрибации: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка обновления настроек: {str(e)}")
 
+@app.post("/api/transcription/calibrate")
+async def calibrate_transcription(file: UploadFile = File(...)):
+    """Подобрать самый быстрый профиль WhisperX на CPU по эталонному отрывку"""
+    global current_transcription_compute_type, current_transcription_cpu_profile
+    if not transcriber or not hasattr(transcriber, 'calibrate_cpu_profile'):
+        raise HTTPException(status_code=503, detail="Transcriber не доступен")
+    
+    import tempfile
+    file_path = os.path.join(tempfile.gettempdir(), f"calibration_{datetime.now().timestamp()}_{file.filename}")
+    try:
+        with open(file_path, "wb") as f:
+            f.write(await file.read())
+        
+        report = await asyncio.get_event_loop().run_in_executor(
+            None, transcriber.calibrate_cpu_profile, file_path
+        )
+        if report is None:
+            raise HTTPException(status_code=400, detail="Калибровка доступна только для WhisperX")
+        
+        # Выбранный профиль целиком сохраняется и применяется после перезапуска
+        current_transcription_cpu_profile = report["best_profile"]
+        current_transcription_compute_type = report["profile"]["compute_type"]
+        save_app_settings({
+            'transcription_cpu_profile': current_transcription_cpu_profile,
+            'transcription_compute_type': current_transcription_compute_type
+        })
+        return {"success": True, **report}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка калибровки транскрибации: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
 # ================================
 # НАСТРОЙКИ ПАМЯТИ
 # ================================
@@ -1830,8 +2236,12 @@ async def clear_memory():
 # ================================
 
 @app.post("/api/documents/upload")
-async def upload_document(file: UploadFile = File(...)):
-    """Загрузить и обработать документ"""
+async def upload_document(file: UploadFile = File(...), excel_table_mode: bool = False):
+    """Загрузить и обработать документ
+
+    excel_table_mode включает табличный режим для Excel: строки группируются
+    в чанки с названием листа и повторяемым заголовком таблицы.
+    """
     logger.info(f"=== Загрузка документа: {file.filename} ===")
     
     if not doc_processor:
@@ -1856,7 +2266,7 @@ async def upload_document(file: UploadFile = File(...)):
         logger.info(f"Файл существует: {os.path.exists(file_path)}")
         logger.info(f"Размер файла: {os.path.getsize(file_path) if os.path.exists(file_path) else 'N/A'} байт")
         
-        success, message = doc_processor.process_document(file_path)
+        success, message = doc_processor.process_document(file_path, excel_table_mode=excel_table_mode)
         logger.info(f"Результат обработки: success={success}, message={message}")
         
         if success:
@@ -2000,6 +2410,15 @@ async def delete_document(filename: str):
 # ТРАНСКРИБАЦИЯ
 # ================================
 
+def _cacheable_transcription(details):
+    """
+    Можно ли сохранить результат в кэш транскрипций
+
+    Ключ кэша включает то, что диаризация ожидалась; результат, где она
+    сорвалась, в кэш не кладется - иначе повтор всегда отдавал бы его.
+    """
+    return details["diarization"] or not transcriber.get_cache_settings().get("diarization")
+
 @app.post("/api/transcribe/upload")
 async def transcribe_file(file: UploadFile = File(...)):
     """Транскрибировать аудио/видео файл с диаризацией по ролям"""
@@ -2022,27 +2441,52 @@ async def transcribe_file(file: UploadFile = File(...)):
         
         logger.info(f"Файл сохранен, размер: {len(content)} байт")
         
+        # Та же запись с теми же настройками уже транскрибировалась - отдаем из кэша
+        cache_key = None
+        if hasattr(transcriber, 'get_cache_settings'):
+            # SHA-256 всего файла считается в пуле потоков, чтобы не блокировать event loop
+            content_hash = await asyncio.get_event_loop().run_in_executor(
+                None, transcript_cache.hash_bytes, content)
+            cache_key = transcript_cache.make_key(content_hash, transcriber.get_cache_settings())
+            cached = transcript_cache.get(cache_key)
+            if cached:
+                logger.info("Транскрипция найдена в кэше")
+                os.remove(file_path)
+                return {
+                    "transcription": cached["transcription"],
+                    "segments": cached.get("segments", []),
+                    "words": cached.get("words", []),
+                    "filename": file.filename,
+                    "success": True,
+                    "timestamp": datetime.now().isoformat(),
+                    "diarization": cached.get("diarization", False),
+                    "cached": True
+                }
+        
         # Транскрибируем с принудительной диаризацией
         logger.info(f"Начинаем транскрибацию с диаризацией по ролям...")
         
-        # Проверяем, поддерживает ли транскрайбер диаризацию
-        if hasattr(transcriber, 'transcribe_with_diarization'):
-            logger.info("Используем принудительную диаризацию...")
-            success, result = transcriber.transcribe_with_diarization(file_path)
-        else:
-            logger.info("Используем стандартную транскрибацию...")
-            success, result = transcriber.transcribe_audio_file(file_path)
+        # Сегменты возвращаются самим вызовом: транскрайбер общий для всех запросов
+        logger.info("Используем принудительную диаризацию...")
+        success, result, details = transcriber.transcribe_with_diarization_detailed(file_path)
         
         logger.info(f"Результат транскрибации: success={success}, result_length={len(str(result)) if result else 0}")
         
         if success:
             logger.info("Транскрибация с диаризацией завершена успешно")
+            segments = details["segments"]
+            words = details["words"]
+            if cache_key and _cacheable_transcription(details):
+                transcript_cache.put(cache_key, {"transcription": result, "segments": segments, "words": words,
+                                                 "diarization": details["diarization"]})
             return {
                 "transcription": result,
+                "segments": segments,
+                "words": words,
                 "filename": file.filename,
                 "success": True,
                 "timestamp": datetime.now().isoformat(),
-                "diarization": True
+                "diarization": details["diarization"]
             }
         else:
             logger.error(f"Ошибка транскрибации: {result}")
@@ -2079,11 +2523,7 @@ async def transcribe_file_with_diarization(file: UploadFile = File(...)):
         # Принудительная диаризация с WhisperX
         logger.info("Начинаем принудительную диаризацию по ролям...")
         
-        if hasattr(transcriber, 'transcribe_with_diarization'):
-            success, result = transcriber.transcribe_with_diarization(file_path)
-        else:
-            logger.warning("Транскрайбер не поддерживает диаризацию, используем стандартную транскрибацию")
-            success, result = transcriber.transcribe_audio_file(file_path)
+        success, result, details = transcriber.transcribe_with_diarization_detailed(file_path)
         
         logger.info(f"Результат диаризации: success={success}, result_length={len(str(result)) if result else 0}")
         
@@ -2091,10 +2531,12 @@ async def transcribe_file_with_diarization(file: UploadFile = File(...)):
             logger.info("Диаризация завершена успешно")
             return {
                 "transcription": result,
+                "segments": details["segments"],
+                "words": details["words"],
                 "filename": file.filename,
                 "success": True,
                 "timestamp": datetime.now().isoformat(),
-                "diarization": True,
+                "diarization": details["diarization"],
                 "forced_diarization": True
             }
         else:
@@ -2107,6 +2549,115 @@ async def transcribe_file_with_diarization(file: UploadFile = File(...)):
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/transcribe/upload/stream")
+async def transcribe_file_stream(file: UploadFile = File(...), format: str = "jsonl"):
+    """Транскрибировать файл и отдавать сегменты по мере готовности (jsonl, srt или vtt)"""
+    logger.info(f"=== Начало потоковой транскрибации файла: {file.filename}, формат {format} ===")
+    
+    if not transcriber or not hasattr(transcriber, 'iter_transcribe_segments'):
+        logger.error("Transcriber не доступен")
+        raise HTTPException(status_code=503, detail="Transcriber не доступен")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Формат должен быть одним из: {', '.join(EXPORT_FORMATS)}")
+    
+    import tempfile
+    file_path = os.path.join(tempfile.gettempdir(), f"media_stream_{datetime.now().timestamp()}_{file.filename}")
+    with open(file_path, "wb") as f:
+        f.write(await file.read())
+    
+    loop = asyncio.get_event_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    # Устанавливается, когда клиент отключился: транскрибация прекращается между сегментами
+    stop = threading.Event()
+    
+    def produce():
+        """Транскрибирует в фоновом потоке и кладет готовые куски вывода в очередь"""
+        segments = transcriber.iter_transcribe_segments(file_path)
+        try:
+            for chunk in iter_export(segments, format):
+                if stop.is_set():
+                    logger.info(f"Клиент отключился, потоковая транскрибация {file.filename} остановлена")
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        except Exception as e:
+            logger.error(f"Ошибка потоковой транскрибации: {e}")
+            if format == "jsonl":
+                loop.call_soon_threadsafe(queue.put_nowait, json.dumps({"error": str(e)}, ensure_ascii=False) + "\n")
+        finally:
+            # Закрытие генератора останавливает декодирование (процесс FFmpeg)
+            segments.close()
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+    
+    async def body():
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                yield chunk.encode("utf-8")
+        except asyncio.CancelledError:
+            logger.info("Потоковая транскрибация: клиент отключился")
+            raise
+        finally:
+            # При отключении клиента Starlette отменяет отдачу ответа - сообщаем производителю
+            stop.set()
+    
+    loop.run_in_executor(None, produce)
+    return StreamingResponse(body(), media_type=EXPORT_FORMATS[format])
+
+@app.post("/api/transcribe/upload/batch")
+async def transcribe_files_batch(files: List[UploadFile] = File(...)):
+    """Транскрибировать несколько аудио/видео файлов общими батчами модели"""
+    logger.info(f"=== Начало пакетной транскрибации: {len(files)} файлов ===")
+    
+    if not transcriber:
+        logger.error("Transcriber не доступен")
+        raise HTTPException(status_code=503, detail="Transcriber не доступен")
+    
+    file_paths = []
+    try:
+        # Сохраняем файлы
+        import tempfile
+        temp_dir = tempfile.gettempdir()
+        for file in files:
+            file_path = os.path.join(temp_dir, f"media_batch_{datetime.now().timestamp()}_{file.filename}")
+            with open(file_path, "wb") as f:
+                f.write(await file.read())
+            file_paths.append(file_path)
+        
+        if hasattr(transcriber, 'transcribe_batch'):
+            results = await asyncio.get_event_loop().run_in_executor(
+                None, transcriber.transcribe_batch, file_paths
+            )
+        else:
+            results = [transcriber.transcribe_audio_file(path) for path in file_paths]
+        
+        return {
+            "results": [
+                {
+                    "filename": file.filename,
+                    "success": success,
+                    "transcription": result if success else None,
+                    "error": None if success else result
+                }
+                for file, (success, result) in zip(files, results)
+            ],
+            "success": any(success for success, _ in results),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Ошибка в эндпоинте пакетной транскрибации: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for file_path in file_paths:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
 @app.post("/api/transcribe/youtube")
 async def transcribe_youtube(request: YouTubeTranscribeRequest):
     """Транскрибировать видео с YouTube с диаризацией по ролям"""
@@ -2117,18 +2668,43 @@ async def transcribe_youtube(request: YouTubeTranscribeRequest):
         raise HTTPException(status_code=503, detail="Transcriber не доступен")
         
     try:
+        cache_key = None
+        if hasattr(transcriber, 'get_cache_settings'):
+            cache_key = transcript_cache.make_key(youtube_media_id(request.url),
+                                                  transcriber.get_cache_settings())
+            cached = transcript_cache.get(cache_key)
+            if cached:
+                logger.info("YouTube транскрипция найдена в кэше")
+                return {
+                    "transcription": cached["transcription"],
+                    "segments": cached.get("segments", []),
+                    "words": cached.get("words", []),
+                    "url": request.url,
+                    "success": True,
+                    "timestamp": datetime.now().isoformat(),
+                    "diarization": cached.get("diarization", False),
+                    "cached": True
+                }
+        
         logger.info("Начинаем YouTube транскрибацию с диаризацией...")
-        success, result = transcriber.transcribe_youtube(request.url)
+        success, result, details = transcriber.transcribe_youtube_detailed(request.url)
         logger.info(f"Результат YouTube транскрибации: success={success}, result_length={len(str(result)) if result else 0}")
         
         if success:
             logger.info("YouTube транскрибация с диаризацией завершена успешно")
+            segments = details["segments"]
+            words = details["words"]
+            if cache_key and _cacheable_transcription(details):
+                transcript_cache.put(cache_key, {"transcription": result, "segments": segments, "words": words,
+                                                 "diarization": details["diarization"]})
             return {
                 "transcription": result,
+                "segments": segments,
+                "words": words,
                 "url": request.url,
                 "success": True,
                 "timestamp": datetime.now().isoformat(),
-                "diarization": True
+                "diarization": details["diarization"]
             }
         else:
             logger.error(f"Ошибка YouTube транскрибации: {result}")
@@ -2179,6 +2755,11 @@ async def get_system_status():
                 "functions": {
                     "universal_transcriber": UniversalTranscriber is not None,
                     "online_transcriber": OnlineTranscriber is not None
+                },
+                "loaded_models": {
+                    "diarization": diarization_models.status(),
+                    "alignment": alignment_models.status(),
+                    "vosk": vosk_models.status()
                 }
             },
             "document_processor": {
@@ -2398,23 +2979,6 @@ if __name__ == "__main__":
     print("API документация: http://localhost:8000/docs")
     print("WebSocket: ws://localhost:8000/ws/chat")
     
-    # Восстанавливаем сохраненную модель
-    try:
-        settings = load_app_settings()
-        saved_model_path = settings.get('current_model_path')
-        
-        if saved_model_path and os.path.exists(saved_model_path) and reload_model_by_path:
-            logger.info(f"Восстанавливаю сохраненную модель: {saved_model_path}")
-            success = reload_model_by_path(saved_model_path)
-            if success:
-                logger.info(f"Модель восстановлена: {saved_model_path}")
-            else:
-                logger.warning(f"Не удалось восстановить модель: {saved_model_path}")
-        else:
-            logger.info("Нет сохраненной модели для восстановления")
-    except Exception as e:
-        logger.error(f"Ошибка восстановления модели: {e}")
-    
     uvicorn.run(
         app,  # Передаем объект app напрямую
         host="0.0.0.0",
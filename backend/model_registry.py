@@ -0,0 +1,163 @@
+"""
+Реестр тяжелых моделей уровня процесса
+
+Модель загружается один раз по ключу и разделяется между всеми
+экземплярами транскрайберов. Каждый владелец берет ссылку через acquire()
+и отдает ее через release(); модель выгружается, когда ссылок не осталось.
+"""
+
+import gc
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+
+class ModelRegistry:
+    """Потокобезопасный реестр моделей со счетчиком ссылок"""
+
+    def __init__(self, name):
+        self.name = name
+        self.logger = logging.getLogger(f"{__name__}.{name}")
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def acquire(self, key, loader):
+        """
+        Возвращает модель по ключу и увеличивает счетчик ссылок
+
+        Args:
+            key: Ключ модели (например, путь к конфигу)
+            loader: Функция без аргументов, загружающая модель при первом обращении
+
+        Returns:
+            Модель или None, если loader не смог ее загрузить
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.setdefault(key, {"model": None, "refs": 0, "lock": threading.Lock()})
+
+            # Загрузка идет под блокировкой записи, чтобы параллельные запросы не грузили модель дважды
+            with entry["lock"]:
+                with self._lock:
+                    if self._entries.get(key) is not entry:
+                        # Запись успели выгрузить, пока мы ждали блокировку
+                        continue
+
+                if entry["model"] is None:
+                    self.logger.info(f"Загрузка модели {self.name}: {key}")
+                    model = loader()
+                    if model is None:
+                        with self._lock:
+                            self._entries.pop(key, None)
+                        return None
+                    entry["model"] = model
+
+                with self._lock:
+                    entry["refs"] += 1
+                return entry["model"]
+
+    def release(self, key):
+        """Отдает ссылку на модель; без ссылок модель выгружается из памяти"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["refs"] == 0:
+                return
+            entry["refs"] -= 1
+            if entry["refs"] > 0:
+                return
+            self._entries.pop(key, None)
+            entry["model"] = None
+
+        self.logger.info(f"Выгрузка модели {self.name}: {key}")
+        gc.collect()
+
+    def status(self):
+        """Возвращает состояние реестра: ключ -> число ссылок"""
+        with self._lock:
+            return {
+                str(key): entry["refs"]
+                for key, entry in self._entries.items()
+                if entry["model"] is not None
+            }
+
+
+class LRUModelCache:
+    """Кэш моделей с вытеснением давно не использованных (например, по языку)"""
+
+    def __init__(self, name, max_items=2):
+        self.name = name
+        self.max_items = max_items
+        self.logger = logging.getLogger(f"{__name__}.{name}")
+        self._lock = threading.Lock()
+        self._models = OrderedDict()
+        self._loading = {}  # Ключ -> Event загрузки, которая сейчас идет
+
+    def get_or_load(self, key, loader):
+        """
+        Возвращает модель по ключу, при промахе загружает ее и вытесняет самую старую
+
+        Загрузка идет вне общей блокировки, чтобы обращения к другим ключам не
+        ждали ее; параллельные запросы того же ключа ждут первую загрузку.
+        """
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key]
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Модель уже грузит другой поток; если его загрузка не удалась - пробуем сами
+            loading.wait()
+
+        evicted = []
+        try:
+            self.logger.info(f"Загрузка модели {self.name}: {key}")
+            model = loader()
+            with self._lock:
+                self._models[key] = model
+                while len(self._models) > self.max_items:
+                    evicted.append(self._models.popitem(last=False)[0])
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            loading.set()
+
+        for evicted_key in evicted:
+            self.logger.info(f"Выгрузка модели {self.name}: {evicted_key}")
+        if evicted:
+            gc.collect()
+        return model
+
+    def status(self):
+        """Возвращает ключи загруженных моделей от старых к новым"""
+        with self._lock:
+            return [str(key) for key in self._models]
+
+
+# Пайплайны диаризации pyannote по пути к конфигу
+diarization_models = ModelRegistry("diarization")
+
+# Модели выравнивания слов wav2vec2 по языкам
+alignment_models = LRUModelCache("alignment", max_items=2)
+
+# Модели распознавания речи Vosk по пути к папке модели
+vosk_models = LRUModelCache("vosk", max_items=2)
+
+
+def get_vosk_model(model_path):
+    """Возвращает модель Vosk для папки model_path, загружая ее один раз на процесс"""
+    from vosk import Model
+    model_path = os.path.abspath(model_path)
+    return vosk_models.get_or_load(model_path, lambda: Model(model_path))
+
+
+def create_vosk_recognizer(model_path, sample_rate, words=False):
+    """Создает легкий KaldiRecognizer поверх общей модели Vosk"""
+    from vosk import KaldiRecognizer
+    recognizer = KaldiRecognizer(get_vosk_model(model_path), sample_rate)
+    if words:
+        recognizer.SetWords(True)
+    return recognizer
@@ -7,9 +7,11 @@ import threading
 import tempfile
 import numpy as np
 import sounddevice as sd
-from vosk import Model, KaldiRecognizer
+from vosk import KaldiRecognizer
 from datetime import datetime
 
+# Общая модель Vosk уровня процесса
+from .model_registry import get_vosk_model
 # Импортируем наш класс для записи системного звука
 from .system_audio import SystemAudioRecorder
 # Новый импорт для использования улучшенной реализации записи системного звука
@@ -54,7 +56,7 @@ class OnlineTranscriber:
                 raise ValueError(f"Путь к модели Vosk не существует: {self.vosk_model_path}")
                 
             print(f"Загрузка модели Vosk из {self.vosk_model_path}...")
-            self.model = Model(self.vosk_model_path)
+            self.model = get_vosk_model(self.vosk_model_path)
             
             # Создаем распознаватели
             self.mic_recognizer = KaldiRecognizer(self.model, self.sample_rate)
@@ -126,77 +128,49 @@ class OnlineTranscriber:
             except Exception as e:
                 print(f"Ошибка при обработке системного аудио: {str(e)}")
                 
+    def recorder_callback(self, data):
+        """Callback рекордера встречи: блоки аудио сразу из потока записи"""
+        if self.is_running:
+            self.system_queue.put(bytes(data))
+    
+    def _emit_result(self, result_json, speaker):
+        """Добавляет распознанную фразу в транскрипцию и передает ее в callback"""
+        text = json.loads(result_json).get("text", "").strip()
+        if not text:
+            return
+        entry = {"time": datetime.now().strftime("%H:%M:%S"), "speaker": speaker, "text": text}
+        self.transcript.append(entry)
+        
+        if self.results_callback:
+            self.results_callback(entry)
+    
     def process_meeting_recording(self):
-        """Периодически останавливает и обрабатывает запись встречи"""
-        segment_duration = 10  # Длительность каждого сегмента в секундах
+        """
+        Непрерывное распознавание записи встречи
         
-        while self.is_running:
+        Рекордер не останавливается: поток записи передает блоки в system_queue,
+        а один распознаватель на всю встречу принимает их по мере поступления.
+        Границы фраз определяет сам Vosk, поэтому слова не режутся на стыках
+        сегментов, а аудио не теряется и не проходит через диск.
+        """
+        recognizer = self.system_recognizer
+        
+        # После остановки дочитываем то, что рекордер успел положить в очередь
+        while self.is_running or not self.system_queue.empty():
             try:
-                # Ждем некоторое время для накопления аудио
-                time.sleep(segment_duration)
-                
-                if not self.is_running:
-                    break
-                
-                # Останавливаем запись и получаем файл
-                if self.using_system_recorder:
-                    audio_file = self.system_audio_recorder.stop_recording()
-                else:
-                    audio_file = self.wasapi_recorder.stop_recording()
-                
-                if audio_file:
-                    # Транскрибируем временный файл
-                    print(f"Транскрибация сегмента: {audio_file}")
-                    
-                    # Создаем временный распознаватель для этого файла
-                    segment_recognizer = KaldiRecognizer(self.model, self.sample_rate)
-                    
-                    # Открываем и обрабатываем аудиофайл
-                    with open(audio_file, "rb") as wf:
-                        wf.read(44)  # Пропускаем WAV-заголовок
-                        
-                        # Обрабатываем файл блоками
-                        while True:
-                            data = wf.read(4000)
-                            if len(data) == 0:
-                                break
-                                
-                            if segment_recognizer.AcceptWaveform(data):
-                                result = json.loads(segment_recognizer.Result())
-                                text = result.get("text", "").strip()
-                                
-                                if text:
-                                    timestamp = datetime.now().strftime("%H:%M:%S")
-                                    entry = {"time": timestamp, "speaker": "Разговор", "text": text}
-                                    self.transcript.append(entry)
-                                    
-                                    if self.results_callback:
-                                        self.results_callback(entry)
-                    
-                    # Обрабатываем последний фрагмент
-                    result = json.loads(segment_recognizer.FinalResult())
-                    text = result.get("text", "").strip()
-                    
-                    if text:
-                        timestamp = datetime.now().strftime("%H:%M:%S")
-                        entry = {"time": timestamp, "speaker": "Разговор", "text": text}
-                        self.transcript.append(entry)
-                        
-                        if self.results_callback:
-                            self.results_callback(entry)
-                
-                # Перезапускаем запись для следующего сегмента, если транскрибация еще идет
-                if self.is_running:
-                    if self.using_system_recorder:
-                        self.system_audio_recorder.start_recording(
-                            system_device_index=self.system_audio_device,
-                            mic_device_index=self.mic_audio_device
-                        )
-                    else:
-                        self.wasapi_recorder.start_recording(self.system_audio_device)
-                    
+                data = self.system_queue.get(timeout=1)
+                if recognizer.AcceptWaveform(data):
+                    self._emit_result(recognizer.Result(), "Разговор")
+            except queue.Empty:
+                pass
             except Exception as e:
                 print(f"Ошибка при обработке записи встречи: {str(e)}")
+        
+        # Последняя незавершенная фраза; FinalResult заодно сбрасывает распознаватель
+        try:
+            self._emit_result(recognizer.FinalResult(), "Разговор")
+        except Exception as e:
+            print(f"Ошибка при обработке записи встречи: {str(e)}")
     
     def start_transcription(self, results_callback=None, capture_mic=True, capture_system=True, mic_device=None, system_device=None, use_wasapi=False):
         """
@@ -220,6 +194,11 @@ class OnlineTranscriber:
                 
         self.capture_mic = capture_mic
         self.capture_system = capture_system
+        
+        # Остатки аудио предыдущей сессии
+        for pending in (self.mic_queue, self.system_queue):
+            while not pending.empty():
+                pending.get_nowait()
         self.results_callback = results_callback
         self.system_audio_device = system_device
         self.mic_audio_device = mic_device
@@ -272,20 +251,27 @@ class OnlineTranscriber:
                 # Используем WASAPI Loopback или Stereo Mix
                 if use_wasapi:
                     self.using_system_recorder = False
-                    self.wasapi_recorder = WasapiLoopbackCapture()
+                    self.wasapi_recorder = WasapiLoopbackCapture(
+                        sample_rate=self.sample_rate,
+                        audio_callback=self.recorder_callback,
+                        keep_frames=False
+                    )
                     self.wasapi_recorder.start_recording(system_device)
                     print(f"Используется улучшенная запись системного звука через WASAPI Loopback")
                 else:
                     # Используем SystemAudioRecorder для записи системного звука
                     self.using_system_recorder = True
-                    self.system_audio_recorder = SystemAudioRecorder()
+                    self.system_audio_recorder = SystemAudioRecorder(
+                        sample_rate=self.sample_rate,
+                        audio_callback=self.recorder_callback
+                    )
                     self.system_audio_recorder.start_recording(
                         system_device_index=system_device,
                         mic_device_index=mic_device if capture_mic else None
                     )
                     print(f"Используется запись системного звука {'и микрофона' if capture_mic else ''}")
                 
-                # Запускаем поток для периодической обработки записей
+                # Запускаем поток непрерывного распознавания записи
                 self.meeting_thread = threading.Thread(target=self.process_meeting_recording)
                 self.meeting_thread.daemon = True
                 self.meeting_thread.start()
@@ -336,8 +322,6 @@ class OnlineTranscriber:
             return False
             
         try:
-            self.is_running = False
-            
             if hasattr(self, 'mic_stream') and self.mic_stream:
                 self.mic_stream.stop()
                 self.mic_stream.close()
@@ -346,11 +330,15 @@ class OnlineTranscriber:
                 self.system_stream.stop()
                 self.system_stream.close()
             
+            # Рекордеры останавливаются до сброса is_running: при остановке они
+            # дописывают остаток аудио через recorder_callback, и он не теряется
             if self.using_system_recorder and self.system_audio_recorder:
                 self.system_audio_recorder.stop_recording()
             
             if self.wasapi_recorder:
                 self.wasapi_recorder.stop_recording()
+            
+            self.is_running = False
                 
             # Ждем завершения потоков
             if hasattr(self, 'mic_thread') and self.mic_thread and self.mic_thread.is_alive():
@@ -377,6 +365,7 @@ class OnlineTranscriber:
             
         except Exception as e:
             print(f"Ошибка при остановке транскрибации: {str(e)}")
+            self.is_running = False
             return False
     
     def get_transcript(self):
@@ -460,18 +449,13 @@ class OnlineTranscriber:
     
     @staticmethod
     def get_mic_devices():
-        """Получить список устройств микрофона"""
+        """Получить список устройств микрофона (индексы sounddevice, как при записи)"""
         mic_devices = []
         try:
-            import pyaudio
-            p = pyaudio.PyAudio()
-            
             # Получаем список всех устройств
-            for i in range(p.get_device_count()):
-                dev_info = p.get_device_info_by_index(i)
-                
+            for i, dev_info in enumerate(sd.query_devices()):
                 # Проверяем, является ли устройство микрофоном
-                if dev_info.get('maxInputChannels', 0) > 0:
+                if dev_info.get('max_input_channels', 0) > 0:
                     name = dev_info.get('name', f'Микрофон {i}')
                     
                     # Проверяем, не является ли это устройство стерео микшером
@@ -486,8 +470,6 @@ class OnlineTranscriber:
                             'name': name,
                         })
             
-            p.terminate()
-            
         except Exception as e:
             print(f"Ошибка при получении устройств микрофона: {str(e)}")
         
@@ -0,0 +1,139 @@
+"""
+Назначение спикеров сегментам и словам транскрипции по результатам диаризации
+
+Реплики диаризации один раз сортируются, после чего все интервалы
+транскрипции обрабатываются одним проходом (sweep line): O((n + m) log m)
+вместо перебора всех реплик для каждого сегмента.
+"""
+
+import heapq
+from bisect import bisect_left
+
+
+def _dominant_label(turns, start, end):
+    """Метка с наибольшим суммарным перекрытием интервала
+
+    При равенстве выбирается спикер, чья пересекающаяся реплика началась раньше.
+    """
+    overlaps = {}
+    for turn_start, turn_end, label in turns:
+        overlap = min(turn_end, end) - max(turn_start, start)
+        if overlap > 0:
+            total, first_start = overlaps.get(label, (0.0, turn_start))
+            overlaps[label] = (total + overlap, min(first_start, turn_start))
+    if not overlaps:
+        return None
+    return max(overlaps, key=lambda label: (overlaps[label][0], -overlaps[label][1]))
+
+
+class SpeakerIntervals:
+    """Отсортированные реплики диаризации (start, end, label)"""
+
+    def __init__(self, turns):
+        self.turns = sorted(turns)
+        self._starts = [turn[0] for turn in self.turns]
+        # Максимальная длительность реплики ограничивает поиск назад при одиночных запросах
+        self._max_duration = max((end - start for start, end, _ in self.turns), default=0.0)
+
+    @classmethod
+    def from_diarization(cls, diarization):
+        """
+        Создает структуру из результата диаризации
+
+        Поддерживаются pyannote Annotation (itertracks), DataFrame с колонками
+        start/end/speaker (whisperx.DiarizationPipeline) и Timeline без меток,
+        где меткой служит номер реплики.
+        """
+        turns = []
+        if hasattr(diarization, "itertracks"):
+            for segment, _, label in diarization.itertracks(yield_label=True):
+                turns.append((float(segment.start), float(segment.end), str(label)))
+        elif hasattr(diarization, "itertuples"):
+            for row in diarization.itertuples():
+                turns.append((float(row.start), float(row.end), str(row.speaker)))
+        else:
+            for index, segment in enumerate(diarization):
+                turns.append((float(segment.start), float(segment.end), f"TRACK_{index}"))
+        return cls(turns)
+
+    def __len__(self):
+        return len(self.turns)
+
+    @property
+    def labels(self):
+        """Уникальные метки спикеров"""
+        return sorted({label for _, _, label in self.turns})
+
+    def best_label(self, start, end):
+        """Метка спикера с наибольшим суммарным перекрытием интервала (или None)"""
+        # Реплики, начавшиеся раньше start - max_duration, закончились до start
+        first = bisect_left(self._starts, start - self._max_duration)
+        last = bisect_left(self._starts, end)
+        return _dominant_label(self.turns[first:last], start, end)
+
+    def assign(self, intervals):
+        """
+        Назначает спикеров списку интервалов одним проходом
+
+        Args:
+            intervals: Список (start, end) в секундах, в любом порядке
+
+        Returns:
+            Список меток (или None, если интервал не пересекается ни с одной репликой)
+            в порядке входных интервалов
+        """
+        order = sorted(range(len(intervals)), key=lambda i: intervals[i][0])
+        result = [None] * len(intervals)
+
+        active = []  # Куча (end, start, label) реплик, которые еще могут пересекаться
+        next_turn = 0
+        for index in order:
+            start, end = intervals[index]
+
+            # Добавляем реплики, начавшиеся до конца интервала
+            while next_turn < len(self.turns) and self.turns[next_turn][0] < end:
+                turn_start, turn_end, label = self.turns[next_turn]
+                heapq.heappush(active, (turn_end, turn_start, label))
+                next_turn += 1
+
+            # Реплики, закончившиеся до начала интервала, не понадобятся и следующим
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+
+            result[index] = _dominant_label(
+                ((turn_start, turn_end, label) for turn_end, turn_start, label in active), start, end
+            )
+        return result
+
+
+def assign_speakers(segments, intervals, default=None):
+    """
+    Проставляет поле speaker сегментам транскрипции (формат WhisperX)
+
+    Если у сегментов есть слова с временными метками, спикер назначается
+    каждому слову, а сегмент получает спикера, говорившего большую часть
+    его слов. Иначе спикер выбирается по перекрытию всего сегмента.
+    """
+    words = [
+        word
+        for segment in segments
+        for word in segment.get("words", []) or []
+        if word.get("start") is not None and word.get("end") is not None
+    ]
+    for word, label in zip(words, intervals.assign([(w["start"], w["end"]) for w in words])):
+        if label is not None:
+            word["speaker"] = label
+
+    segment_labels = intervals.assign([(s.get("start") or 0.0, s.get("end") or 0.0) for s in segments])
+    for segment, segment_label in zip(segments, segment_labels):
+        durations = {}
+        for word in segment.get("words", []) or []:
+            if "speaker" in word:
+                durations[word["speaker"]] = durations.get(word["speaker"], 0.0) + (word["end"] - word["start"])
+        if durations:
+            segment["speaker"] = max(durations, key=durations.get)
+        elif segment_label is not None:
+            segment["speaker"] = segment_label
+        elif default is not None:
+            segment["speaker"] = default
+    return segments
@@ -5,38 +5,59 @@ import wave
 import numpy as np
 import threading
 import platform
-import pyaudio
 import sounddevice as sd
 import soundfile as sf
 from comtypes import CLSCTX_ALL
 from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
 
+from backend.audio_buffer import AudioRingBuffer
+from backend.audio_capture import CaptureEngine, CaptureSource
+
 class SystemAudioRecorder:
     """Класс для записи системного звука (включая голос собеседника) и микрофона"""
     
-    def __init__(self, sample_rate=16000, channels=1):
+    def __init__(self, sample_rate=16000, channels=1, buffer_seconds=60, audio_callback=None,
+                 mic_gain=1.0, system_gain=1.0, separate_channels=False):
         self.sample_rate = sample_rate
         self.channels = channels
         self.temp_dir = tempfile.mkdtemp()
         self.recording = False
         self.is_windows = platform.system() == 'Windows'
         self.recording_thread = None
-        self.audio_data = None
         self.system_audio_device = None
         self.mic_audio_device = None
+        
+        # Запись сразу пишется в WAV файл, в памяти - только последние buffer_seconds
+        self.buffer_seconds = buffer_seconds
+        self.buffer = None
+        self.output_file = None
+        self.frames_written = 0
+        
+        # Получатель блоков аудио в реальном времени (например, распознаватель) - всегда моно микс
+        self.audio_callback = audio_callback
+        
+        # Усиление источников при смешивании; separate_channels пишет микрофон
+        # и системный звук в отдельные каналы WAV для разделения спикеров
+        self.mic_gain = mic_gain
+        self.system_gain = system_gain
+        self.separate_channels = separate_channels
+        self.engine = None
     
     def list_audio_devices(self):
-        """Получает список всех доступных аудиоустройств"""
-        p = pyaudio.PyAudio()
+        """
+        Получает список всех доступных аудиоустройств
+        
+        Устройства перечисляются через sounddevice, как и открываются при
+        записи (CaptureEngine), поэтому индексы совпадают.
+        """
         devices = []
         
         # Перебираем все устройства
         info = "\nДоступные аудиоустройства:\n"
-        for i in range(p.get_device_count()):
-            dev_info = p.get_device_info_by_index(i)
+        for i, dev_info in enumerate(sd.query_devices()):
             name = dev_info.get('name')
-            max_input_channels = dev_info.get('maxInputChannels')
-            max_output_channels = dev_info.get('maxOutputChannels')
+            max_input_channels = dev_info.get('max_input_channels')
+            max_output_channels = dev_info.get('max_output_channels')
             
             device_type = []
             if max_input_channels > 0:
@@ -75,8 +96,6 @@ class SystemAudioRecorder:
                 default_mic = device
                 break
         
-        p.terminate()
-        
         # Выводим информацию о рекомендуемых устройствах
         if system_device:
             info += f"\nРекомендуемое устройство для системного звука: [{system_device['index']}] {system_device['name']}\n"
@@ -108,18 +127,14 @@ class SystemAudioRecorder:
             
             # Проверяем, есть ли Stereo Mix
             # Примечание: это упрощенная версия, которая может не работать на всех системах
-            p = pyaudio.PyAudio()
             found = False
             
-            for i in range(p.get_device_count()):
-                dev = p.get_device_info_by_index(i)
-                if 'stereo mix' in dev['name'].lower() and dev['maxInputChannels'] > 0:
+            for dev in sd.query_devices():
+                if 'stereo mix' in dev['name'].lower() and dev['max_input_channels'] > 0:
                     found = True
                     print(f"Найден Stereo Mix: {dev['name']}")
                     break
             
-            p.terminate()
-            
             if not found:
                 print("Stereo Mix не найден или отключен в вашей системе.")
                 print("Инструкция для включения:")
@@ -162,6 +177,11 @@ class SystemAudioRecorder:
             self.system_audio_device = system_device_index
             self.mic_audio_device = mic_device_index
             
+            # Файл и буфер новой записи
+            self.output_file = os.path.join(self.temp_dir, f"meeting_recording_{int(time.time() * 1000)}.wav")
+            self.buffer = AudioRingBuffer(self.sample_rate * self.buffer_seconds)
+            self.frames_written = 0
+            
             # Запускаем запись в отдельном потоке
             self.recording = True
             self.recording_thread = threading.Thread(target=self._record_audio, args=(duration,))
@@ -185,9 +205,9 @@ class SystemAudioRecorder:
         
         self.recording = False
         
-        # Ждем завершения потока записи
+        # Ждем завершения потока записи (он закрывает WAV файл)
         if self.recording_thread and self.recording_thread.is_alive():
-            self.recording_thread.join(2)  # Ждем максимум 2 секунды
+            self.recording_thread.join(5)
         
         # Сохраняем записанные данные
         output_path = self._save_recording()
@@ -196,38 +216,31 @@ class SystemAudioRecorder:
         return output_path
     
     def _record_audio(self, duration=None):
-        """Внутренний метод для записи аудио"""
+        """
+        Внутренний метод для записи аудио
+
+        Микрофон и системный звук читаются независимыми потоками CaptureEngine
+        и выравниваются по времени; здесь выровненные блоки дописываются в WAV
+        файл, а в памяти остаются только последние секунды микса в кольцевом
+        буфере - память не растет с длительностью записи.
+        """
+        writer = None
+        engine = None
         try:
-            p = pyaudio.PyAudio()
-            
-            # Открываем поток для микрофона
-            mic_stream = p.open(
-                format=pyaudio.paInt16,
-                channels=self.channels,
-                rate=self.sample_rate,
-                input=True,
-                frames_per_buffer=1024,
-                input_device_index=self.mic_audio_device
-            )
-            
-            # Открываем поток для системного звука, если он доступен
-            system_stream = None
+            sources = [CaptureSource("mic", self.mic_audio_device, self.mic_gain)]
             if self.system_audio_device is not None:
-                try:
-                    system_stream = p.open(
-                        format=pyaudio.paInt16,
-                        channels=self.channels,
-                        rate=self.sample_rate,
-                        input=True,
-                        frames_per_buffer=1024,
-                        input_device_index=self.system_audio_device
-                    )
-                except Exception as e:
-                    print(f"Не удалось открыть системный звук: {e}")
+                sources.append(CaptureSource("system", self.system_audio_device, self.system_gain))
+            
+            engine = CaptureEngine(sources, self.sample_rate, separate_channels=self.separate_channels)
+            engine.start()
+            self.engine = engine
             
-            # Буферы для хранения данных
-            mic_frames = []
-            system_frames = []
+            # WAV файл пишется по мере записи: моно микс или канал на источник
+            self.channels = engine.output_channels
+            writer = wave.open(self.output_file, 'wb')
+            writer.setnchannels(self.channels)
+            writer.setsampwidth(2)  # 16 бит = 2 байта
+            writer.setframerate(self.sample_rate)
             
             start_time = time.time()
             
@@ -241,83 +254,60 @@ class SystemAudioRecorder:
                     self.recording = False
                     break
                 
-                # Читаем данные с микрофона
-                mic_data = mic_stream.read(1024, exception_on_overflow=False)
-                mic_frames.append(mic_data)
-                
-                # Читаем данные с системного звука, если он доступен
-                if system_stream:
-                    system_data = system_stream.read(1024, exception_on_overflow=False)
-                    system_frames.append(system_data)
-            
-            # Закрываем потоки
-            mic_stream.stop_stream()
-            mic_stream.close()
-            
-            if system_stream:
-                system_stream.stop_stream()
-                system_stream.close()
-            
-            p.terminate()
+                time.sleep(0.05)
+                for mix, channels in engine.read():
+                    self._write_block(writer, mix, channels)
             
-            # Сохраняем данные для последующей обработки
-            self.audio_data = {
-                'mic': mic_frames,
-                'system': system_frames if system_stream else None
-            }
+            # Останавливаем устройства и дописываем остаток
+            engine.stop()
+            for mix, channels in engine.read(flush=True):
+                self._write_block(writer, mix, channels)
             
         except Exception as e:
             print(f"Ошибка при записи: {e}")
             self.recording = False
+            if engine is not None:
+                engine.stop()
+        finally:
+            if writer is not None:
+                writer.close()
+    
+    def _write_block(self, writer, mix, channels):
+        """Дописывает выровненный блок в файл, буфер и получателю в реальном времени"""
+        writer.writeframes((mix if channels is None else channels).tobytes())
+        self.frames_written += len(mix)
+        self.buffer.write(mix)
+        if self.audio_callback:
+            self.audio_callback(mix.tobytes())
+    
+    def set_gain(self, mic_gain=None, system_gain=None):
+        """Меняет усиление микрофона и системного звука, в том числе во время записи"""
+        if mic_gain is not None:
+            self.mic_gain = mic_gain
+            if self.engine:
+                self.engine.set_gain("mic", mic_gain)
+        if system_gain is not None:
+            self.system_gain = system_gain
+            if self.engine:
+                self.engine.set_gain("system", system_gain)
+    
+    def get_recent_audio(self, seconds):
+        """Последние seconds секунд записи (моно микс int16) из кольцевого буфера"""
+        if self.buffer is None:
+            return np.zeros(0, dtype=np.int16)
+        return self.buffer.read_last(int(seconds * self.sample_rate))
     
     def _save_recording(self):
-        """Сохраняет записанные данные в файл с миксованием микрофона и системного звука"""
-        if not self.audio_data:
+        """Завершает запись: WAV файл уже записан потоком записи, возвращает путь к нему"""
+        if self.recording_thread and self.recording_thread.is_alive():
+            print("Поток записи еще не завершился, файл может быть неполным")
+        
+        if not self.output_file or not os.path.exists(self.output_file) or self.frames_written == 0:
             print("Нет данных для сохранения")
             return None
         
-        try:
-            # Создаем имя выходного файла
-            output_file = os.path.join(self.temp_dir, f"meeting_recording_{int(time.time())}.wav")
-            
-            # Проверяем наличие данных системного звука
-            if self.audio_data['system']:
-                # Если есть системный звук, смешиваем его с микрофоном
-                # Преобразуем байтовые данные в numpy массивы
-                mic_data = np.frombuffer(b''.join(self.audio_data['mic']), dtype=np.int16)
-                system_data = np.frombuffer(b''.join(self.audio_data['system']), dtype=np.int16)
-                
-                # Обрезаем массивы до одинаковой длины
-                min_length = min(len(mic_data), len(system_data))
-                mic_data = mic_data[:min_length]
-                system_data = system_data[:min_length]
-                
-                # Смешиваем микрофон и системный звук (50/50)
-                # Микшируем, избегая переполнения
-                mixed_data = np.clip(mic_data + system_data, -32768, 32767).astype(np.int16)
-                
-                # Сохраняем микшированные данные в файл
-                with wave.open(output_file, 'wb') as wf:
-                    wf.setnchannels(self.channels)
-                    wf.setsampwidth(2)  # 16 бит = 2 байта
-                    wf.setframerate(self.sample_rate)
-                    wf.writeframes(mixed_data.tobytes())
-            else:
-                # Если нет системного звука, сохраняем только микрофон
-                with wave.open(output_file, 'wb') as wf:
-                    wf.setnchannels(self.channels)
-                    wf.setsampwidth(2)  # 16 бит = 2 байта
-                    wf.setframerate(self.sample_rate)
-                    wf.writeframes(b''.join(self.audio_data['mic']))
-            
-            # Очищаем данные после сохранения
-            self.audio_data = None
-            
-            return output_file
-            
-        except Exception as e:
-            print(f"Ошибка при сохранении записи: {e}")
-            return None
+        print(f"Записано {self.frames_written / self.sample_rate:.1f} с аудио")
+        return self.output_file
     
     def check_windows_stereo_mix(self):
         """Проверяет доступность Stereo Mix на Windows и дает рекомендации"""
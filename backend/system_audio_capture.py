@@ -13,7 +13,7 @@ from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
 class WasapiLoopbackCapture:
     """Класс для записи системного звука через WASAPI loopback режим без необходимости Stereo Mix"""
     
-    def __init__(self, sample_rate=16000, channels=1, chunk_size=1024):
+    def __init__(self, sample_rate=16000, channels=1, chunk_size=1024, audio_callback=None, keep_frames=True):
         self.sample_rate = sample_rate
         self.channels = channels
         self.chunk_size = chunk_size
@@ -22,6 +22,11 @@ class WasapiLoopbackCapture:
         self.recording_thread = None
         self.frames = []
         
+        # Получатель блоков аудио в реальном времени; без keep_frames запись
+        # не копится в памяти, и stop_recording не сохраняет файл
+        self.audio_callback = audio_callback
+        self.keep_frames = keep_frames
+        
     def list_devices(self):
         """Выводит список доступных аудиоустройств"""
         p = pyaudio.PyAudio()
@@ -138,7 +143,10 @@ class WasapiLoopbackCapture:
                 
                 # Читаем данные
                 data = stream.read(self.chunk_size, exception_on_overflow=False)
-                self.frames.append(data)
+                if self.keep_frames:
+                    self.frames.append(data)
+                if self.audio_callback:
+                    self.audio_callback(data)
                 
                 # Каждые секунду выводим сообщение (необязательно)
                 current_duration = int(time.time() - start_time)
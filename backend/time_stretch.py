@@ -0,0 +1,116 @@
+"""
+Изменение темпа речи без изменения высоты тона (WSOLA)
+
+Waveform Similarity Overlap-Add: сигнал нарезается на окна с шагом
+Ha = Hs * rate и складывается с шагом Hs, а положение каждого окна
+уточняется в пределах tolerance так, чтобы оно лучше всего продолжало
+предыдущее. Поиск сдвига - одно матричное умножение на окно, поэтому
+на речи это в разы быстрее фазового вокодера librosa.
+"""
+
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def wsola_time_stretch(audio, rate, sample_rate, frame_ms=30.0, tolerance_ms=10.0):
+    """
+    Меняет темп аудио в rate раз (rate > 1 - быстрее, < 1 - медленнее)
+
+    Args:
+        audio: Моно float массив
+        rate: Коэффициент скорости
+        sample_rate: Частота дискретизации
+        frame_ms: Длина окна наложения
+        tolerance_ms: Максимальный сдвиг окна при поиске наилучшего совпадения
+
+    Returns:
+        float32 массив длиной ~len(audio) / rate
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    frame = int(sample_rate * frame_ms / 1000) // 2 * 2
+    if rate == 1.0 or rate <= 0 or len(audio) < frame:
+        return audio
+
+    synthesis_hop = frame // 2
+    analysis_hop = synthesis_hop * rate
+    tolerance = int(sample_rate * tolerance_ms / 1000)
+
+    # Периодическое окно Ханна: при перекрытии 50% сумма окон равна 1
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame) / frame)).astype(np.float32)
+
+    output_length = int(len(audio) / rate)
+    frames = output_length // synthesis_hop + 1
+
+    # Отступы, чтобы окна у краев не выходили за массив: индекс i входа -> i + tolerance
+    padded = np.pad(audio, (tolerance, frame + 2 * tolerance + int(analysis_hop) + synthesis_hop))
+    output = np.zeros(frames * synthesis_hop + frame, dtype=np.float32)
+
+    # Поиск ведем по прореженному сигналу (~8 кГц) - на точность сдвига это почти не влияет
+    step = max(1, sample_rate // 8000)
+
+    position = 0
+    for index in range(frames):
+        nominal = int(round(index * analysis_hop))
+        if index > 0:
+            # Естественное продолжение предыдущего окна во входном сигнале
+            template = padded[position + synthesis_hop + tolerance:position + synthesis_hop + tolerance + frame:step]
+            region = padded[nominal:nominal + 2 * tolerance + frame]
+            candidates = sliding_window_view(region, frame)[:, ::step]
+            position = nominal - tolerance + int(np.argmax(candidates @ template))
+        else:
+            position = nominal
+
+        start = index * synthesis_hop
+        output[start:start + frame] += window * padded[position + tolerance:position + tolerance + frame]
+
+    return output[:output_length]
+
+
+def benchmark(duration=10.0, sample_rate=48000, rates=(0.8, 1.25, 1.5)):
+    """
+    Сравнивает задержку WSOLA и librosa.effects.time_stretch
+
+    Returns:
+        Список словарей: движок, коэффициент, миллисекунды на секунду аудио
+    """
+    # Речеподобный сигнал: гармоники основного тона с амплитудной модуляцией слогов
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    pitch = 140 + 20 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    signal = sum(np.sin(k * phase) / k for k in range(1, 8))
+    signal *= 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    signal = (0.3 * signal / np.max(np.abs(signal))).astype(np.float32)
+
+    engines = {"wsola": lambda x, rate: wsola_time_stretch(x, rate, sample_rate)}
+    try:
+        import librosa
+        engines["librosa"] = lambda x, rate: librosa.effects.time_stretch(x, rate=rate)
+    except ImportError:
+        pass
+
+    report = []
+    for name, stretch in engines.items():
+        for rate in rates:
+            started = time.perf_counter()
+            stretch(signal, rate)
+            elapsed = time.perf_counter() - started
+            report.append({
+                "engine": name,
+                "rate": rate,
+                "ms_per_audio_second": round(elapsed * 1000 / duration, 2),
+            })
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Бенчмарк изменения темпа речи")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность тестового сигнала (сек)")
+    parser.add_argument("--sample-rate", type=int, default=48000, help="Частота дискретизации")
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(args.duration, args.sample_rate), ensure_ascii=False, indent=2))
@@ -0,0 +1,64 @@
+"""
+Единственный владелец числа потоков torch (intra-op) в процессе
+
+torch.set_num_threads задает одно значение на весь процесс, поэтому стадии,
+которые работают одновременно (диаризация, синтез речи), не вызывают его
+сами, а берут бюджет через torch_threads(). Пока бюджеты активны, действует
+наименьший из них - ни одна стадия не займет больше ядер, чем ей выделено;
+после выхода последней стадии восстанавливается исходное значение.
+"""
+
+import threading
+from contextlib import contextmanager
+
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    torch = None
+    TORCH_AVAILABLE = False
+
+_lock = threading.Lock()
+_leases = {}
+_next_lease = 0
+_default_threads = None
+
+
+def _apply():
+    """Применяет действующее значение (под блокировкой)"""
+    threads = min(_leases.values()) if _leases else _default_threads
+    if threads and torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+
+
+@contextmanager
+def torch_threads(threads):
+    """
+    Ограничивает потоки torch на время блока
+
+    Args:
+        threads: Бюджет потоков стадии (None или 0 - без ограничения)
+    """
+    global _next_lease, _default_threads
+    if not TORCH_AVAILABLE or not threads:
+        yield
+        return
+
+    with _lock:
+        if _default_threads is None:
+            _default_threads = torch.get_num_threads()
+        lease = _next_lease
+        _next_lease += 1
+        _leases[lease] = max(1, int(threads))
+        _apply()
+    try:
+        yield
+    finally:
+        with _lock:
+            _leases.pop(lease, None)
+            _apply()
+
+
+def current_threads():
+    """Число потоков torch, действующее сейчас"""
+    return torch.get_num_threads() if TORCH_AVAILABLE else None
@@ -1,7 +1,7 @@
 import os
 import tempfile
 import subprocess
-from vosk import Model, KaldiRecognizer
+from vosk import KaldiRecognizer
 import wave
 import json
 import pytubefix
@@ -27,8 +27,54 @@ import shutil
 from tqdm import tqdm
 import re
 import sys
+import itertools
 import logging
 import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from backend.model_registry import get_vosk_model
+from backend.transcript_export import make_segment
+from backend.vad import find_split_points, detect_speech_regions, SpeechTimeline, SilenceGate
+
+# Модель Vosk в процессе-воркере параллельной транскрибации (загружается инициализатором пула)
+_worker_model = None
+
+
+def _init_vosk_worker(model_path):
+    """Инициализатор процесса пула: загружает модель один раз на воркер"""
+    global _worker_model
+    if _worker_model is None:
+        _worker_model = get_vosk_model(model_path)
+
+
+def _decode_vosk_segment(index, pcm_bytes, offset_seconds, sample_rate):
+    """Распознает один сегмент аудио в процессе-воркере
+    
+    Возвращает индекс сегмента и список фраз с временем относительно начала файла.
+    """
+    rec = KaldiRecognizer(_worker_model, sample_rate)
+    rec.SetWords(True)
+    
+    raw_results = []
+    block = sample_rate * 2 * 5  # 5 секунд 16-битного аудио
+    for i in range(0, len(pcm_bytes), block):
+        if rec.AcceptWaveform(pcm_bytes[i:i + block]):
+            raw_results.append(json.loads(rec.Result()))
+    raw_results.append(json.loads(rec.FinalResult()))
+    
+    phrases = []
+    for result in raw_results:
+        text = result.get("text", "").strip()
+        if not text:
+            continue
+        words = result.get("result", [])
+        phrases.append({
+            "text": text,
+            "start": offset_seconds + (words[0]["start"] if words else 0.0),
+            "end": offset_seconds + (words[-1]["end"] if words else 0.0)
+        })
+    return index, phrases
+
 
 class Transcriber:
     def __init__(self):
@@ -77,6 +123,20 @@ class Transcriber:
         self.use_ffmpeg = self._check_ffmpeg_availability()  # Проверка доступности FFmpeg
         self.logger.debug(f"FFmpeg доступен: {self.use_ffmpeg}")
         
+        # Потоковый режим: FFmpeg декодирует в stdout, байты сразу идут в распознаватель
+        self.use_pipe_streaming = True
+        self.stream_chunk_size = 8000  # Сэмплов в одном блоке (0.5 сек при 16 кГц)
+        
+        # Параллельный режим для длинных записей: сегменты по паузам в пуле процессов
+        self.parallel_workers = max(1, (os.cpu_count() or 1) // 2)
+        self.parallel_min_duration = 600  # Минимальная длительность файла (сек)
+        self.parallel_segment_duration = 60  # Желаемая длительность сегмента (сек)
+        
+        # Отсев тишины перед распознаванием (VAD); временные метки пересчитываются
+        self.use_vad = True
+        self.vad_silence_threshold_db = -45.0  # Порог тишины для потокового режима
+        self.vad_hangover = 1.0  # Сколько тишины после речи отдавать распознавателю (сек)
+        
         # Обратный вызов для обновления прогресса
         self.progress_callback = None
         
@@ -220,7 +280,7 @@ class Transcriber:
             
             # Загружаем модель
             self.logger.info("Инициализация модели Vosk...")
-            self.model = Model(self.model_size)
+            self.model = get_vosk_model(self.model_size)
             self.logger.info("Модель Vosk успешно загружена")
             return True
         except Exception as e:
@@ -231,6 +291,18 @@ class Transcriber:
     
     def transcribe_audio(self, audio_path):
         """Транскрибация аудио файла"""
+        success, text, _ = self.transcribe_audio_detailed(audio_path)
+        return success, text
+    
+    def transcribe_audio_detailed(self, audio_path):
+        """Транскрибация аудио файла с фразами
+        
+        Фразы возвращаются вместе с текстом, а не хранятся в экземпляре:
+        один транскрайбер обслуживает параллельные запросы.
+        
+        Returns:
+            (успех, текст или ошибка, сегменты start, end, speaker, text, words)
+        """
         self.logger.info(f"=== Начало транскрибации аудио файла: {audio_path} ===")
         
         # Обновляем прогресс
@@ -242,7 +314,7 @@ class Transcriber:
             success = self.load_model()
             if not success:
                 self.logger.error("Не удалось загрузить модель транскрибации")
-                return False, "Не удалось загрузить модель транскрибации"
+                return False, "Не удалось загрузить модель транскрибации", []
         
         try:
             self.logger.info(f"Начинаю транскрибацию файла: {audio_path}")
@@ -251,10 +323,14 @@ class Transcriber:
             # Проверяем, существует ли файл
             if not os.path.exists(audio_path):
                 self.logger.error(f"Файл не найден: {audio_path}")
-                return False, f"Файл не найден: {audio_path}"
+                return False, f"Файл не найден: {audio_path}", []
             
             self.logger.debug(f"Размер файла: {os.path.getsize(audio_path)} байт")
             
+            # Потоковый режим без промежуточного WAV файла
+            if self.use_ffmpeg and self.use_pipe_streaming and not self._is_wav_16khz_mono(audio_path):
+                return self._transcribe_audio_pipe(audio_path)
+            
             # Убедимся, что временная директория существует
             if not os.path.exists(self.temp_dir):
                 os.makedirs(self.temp_dir, exist_ok=True)
@@ -274,34 +350,43 @@ class Transcriber:
                 if self.use_ffmpeg:
                     success, wav_path = self._convert_with_ffmpeg(audio_path, wav_path)
                     if not success:
-                        return False, wav_path
+                        return False, wav_path, []
                 else:
                     success, wav_path = self._convert_with_sounddevice(audio_path, wav_path)
                     if not success:
-                        return False, wav_path
+                        return False, wav_path, []
                 self.update_progress(40)
             
             # Проверяем файл перед открытием
             if not os.path.exists(wav_path):
-                return False, f"Ошибка: WAV файл не был создан: {wav_path}"
+                return False, f"Ошибка: WAV файл не был создан: {wav_path}", []
                 
             try:
                 # Открываем WAV файл для распознавания
                 wf = wave.open(wav_path, "rb")
                 
                 # Проверяем параметры аудио
+                duration = wf.getnframes() / wf.getframerate()
                 print(f"Параметры WAV файла: каналы={wf.getnchannels()}, частота={wf.getframerate()}, "
-                      f"сэмплов={wf.getnframes()}, длительность={wf.getnframes()/wf.getframerate():.2f} сек")
+                      f"сэмплов={wf.getnframes()}, длительность={duration:.2f} сек")
+                
+                # Длинные записи распознаем параллельно на нескольких ядрах
+                # (длительность известна из заголовка WAV)
+                if self.parallel_workers > 1 and duration >= self.parallel_min_duration:
+                    wf.close()
+                    return self._transcribe_parallel(wav_path)
                 
                 # Создаем распознаватель с точным указанием параметров
                 rec = KaldiRecognizer(self.model, wf.getframerate())
                 
                 # Проверяем, что распознаватель создан успешно
                 if rec is None:
-                    return False, "Не удалось создать распознаватель Kaldi"
+                    return False, "Не удалось создать распознаватель Kaldi", []
                 
-                # Собираем результаты транскрибации
+                # Собираем результаты транскрибации; слова нужны для временных меток фраз
+                rec.SetWords(True)
                 result_text = []
+                phrases = []
                 
                 # Увеличиваем размер буфера для ускорения обработки (40000 сэмплов вместо 4000)
                 buffer_size = 40000
@@ -314,6 +399,9 @@ class Transcriber:
                 # Устанавливаем начальный прогресс транскрибации
                 self.update_progress(45)
                 
+                gate = self._create_silence_gate()
+                timeline = gate.timeline if gate else None
+                
                 while True:
                     data = wf.readframes(buffer_size)
                     if len(data) == 0:
@@ -330,38 +418,429 @@ class Transcriber:
                     if progress % 10 == 0:
                         print(f"Прогресс транскрибации: {progress}%")
                         
+                    # Длинная тишина в распознаватель не отправляется
+                    if gate:
+                        data = gate.process(data)
+                        if not data:
+                            continue
+                    
                     # Отправляем данные в распознаватель
                     if rec.AcceptWaveform(data):
-                        part_result = json.loads(rec.Result())
-                        if 'text' in part_result and part_result['text'].strip():
-                            result_text.append(part_result['text'])
+                        event = self._make_result_event(json.loads(rec.Result()), timeline)
+                        if event:
+                            result_text.append(event["text"])
+                            phrases.append(event)
                 
                 # Получаем финальный результат
-                part_result = json.loads(rec.FinalResult())
-                if 'text' in part_result and part_result['text'].strip():
-                    result_text.append(part_result['text'])
+                event = self._make_result_event(json.loads(rec.FinalResult()), timeline)
+                if event:
+                    result_text.append(event["text"])
+                    phrases.append(event)
                 
                 # Закрываем файл
                 wf.close()
                 
+                if gate and gate.skipped:
+                    print(f"VAD: пропущено {gate.skipped:.1f} сек тишины")
+                
                 full_text = " ".join(result_text)
                 
                 # Проверяем, что есть какой-то результат
                 if not full_text.strip():
-                    return False, "Не удалось распознать текст в аудио (пустой результат)"
+                    return False, "Не удалось распознать текст в аудио (пустой результат)", []
                 
                 print(f"Транскрибация завершена, получено {len(full_text.split())} слов")
                 self.update_progress(100)
-                return True, full_text
+                return True, full_text, self._phrase_segments(phrases)
                 
             except Exception as wav_err:
                 print(f"Ошибка при обработке WAV файла: {str(wav_err)}")
-                return False, f"Ошибка при обработке WAV файла: {str(wav_err)}"
+                return False, f"Ошибка при обработке WAV файла: {str(wav_err)}", []
             
         except Exception as e:
             print(f"Ошибка при транскрибации аудио: {str(e)}")
-            return False, f"Ошибка при транскрибации: {str(e)}"
+            return False, f"Ошибка при транскрибации: {str(e)}", []
+            
+    def _transcribe_audio_pipe(self, audio_path):
+        """Транскрибация через конвейер FFmpeg -> Vosk без временного WAV
+        
+        Длительность записи FFmpeg сообщает в заголовке до первых данных, поэтому
+        выбор параллельного режима делается по уже запущенному декодированию, и
+        тот же поток аудио уходит в выбранный путь.
+        """
+        self.logger.info("Потоковая транскрибация через конвейер FFmpeg")
+        result_text = []
+        phrases = []
+        
+        info = {}
+        blocks = self._iter_pcm_blocks(audio_path, info=info)
+        try:
+            first = next(blocks, None)
+        except Exception as e:
+            self.logger.error(f"Ошибка потоковой транскрибации: {e}")
+            return False, f"Ошибка при транскрибации: {str(e)}", []
+        if first is not None:
+            blocks = itertools.chain([first], blocks)
+        
+        duration = info.get("duration")
+        if self.parallel_workers > 1 and duration and duration >= self.parallel_min_duration:
+            return self._transcribe_parallel(audio_path, blocks=blocks, info=info)
+        
+        try:
+            for event in self._iter_transcribe_pcm((block.tobytes() for block in blocks), info):
+                if event["type"] == "result":
+                    result_text.append(event["text"])
+                    phrases.append({"text": event["text"], "start": event["start"], "end": event["end"]})
+        except Exception as e:
+            self.logger.error(f"Ошибка потоковой транскрибации: {e}")
+            return False, f"Ошибка при транскрибации: {str(e)}", []
+        
+        full_text = " ".join(result_text)
+        if not full_text.strip():
+            return False, "Не удалось распознать текст в аудио (пустой результат)", []
+        
+        print(f"Транскрибация завершена, получено {len(full_text.split())} слов")
+        self.update_progress(100)
+        return True, full_text, self._phrase_segments(phrases)
+    
+    @staticmethod
+    def _phrase_segments(phrases):
+        """Фразы с временными метками в структурированном формате (start, end, speaker, text, words)"""
+        return [make_segment(phrase["start"], phrase["end"], phrase["text"]) for phrase in phrases]
+    
+    def iter_transcribe_stream(self, audio_path, partial_callback=None):
+        """Потоковая транскрибация аудио (генератор событий)
+        
+        FFmpeg декодирует файл в 16 кГц моно s16le прямо в stdout, и байты
+        подаются в KaldiRecognizer по мере поступления. Генерирует события:
+        {"type": "partial", "text"} - промежуточная гипотеза,
+        {"type": "result", "text", "start", "end"} - завершенная фраза.
+        Если задан partial_callback, он вызывается для каждого события.
+        """
+        info = {}
+        pcm = self._iter_pcm_from_ffmpeg(audio_path, self.stream_chunk_size * 2, info=info)
+        yield from self._iter_transcribe_pcm(pcm, info, partial_callback)
+    
+    def _iter_transcribe_pcm(self, pcm, info, partial_callback=None):
+        """Распознает поток байтов PCM 16 кГц моно (генератор событий)
+        
+        info заполняет декодер: длительность записи для прогресса появляется в
+        нем после первого блока.
+        """
+        if not self.model:
+            if not self.load_model():
+                raise RuntimeError("Не удалось загрузить модель транскрибации")
+        
+        rec = KaldiRecognizer(self.model, self.sample_rate)
+        rec.SetWords(True)
+        
+        bytes_per_second = self.sample_rate * 2
+        processed_bytes = 0
+        last_partial = ""
+        gate = self._create_silence_gate()
+        timeline = gate.timeline if gate else None
+        
+        self.update_progress(45)
+        
+        def emit(event):
+            if partial_callback:
+                try:
+                    partial_callback(event)
+                except Exception as callback_error:
+                    self.logger.warning(f"Ошибка в callback потоковой транскрибации: {callback_error}")
+            return event
+        
+        for data in pcm:
+            processed_bytes += len(data)
+            duration = info.get("duration")
+            if duration:
+                progress = min(100, int(processed_bytes * 100 / (duration * bytes_per_second)))
+                self.update_progress(45 + int(progress * 0.5))
+            
+            if gate:
+                data = gate.process(data)
+                if not data:
+                    continue
+            
+            if rec.AcceptWaveform(data):
+                event = self._make_result_event(json.loads(rec.Result()), timeline)
+                last_partial = ""
+                if event:
+                    yield emit(event)
+            else:
+                partial = json.loads(rec.PartialResult()).get("partial", "").strip()
+                if partial and partial != last_partial:
+                    last_partial = partial
+                    yield emit({"type": "partial", "text": partial})
+        
+        event = self._make_result_event(json.loads(rec.FinalResult()), timeline)
+        if event:
+            yield emit(event)
+        
+        if gate and gate.skipped:
+            self.logger.info(f"VAD: пропущено {gate.skipped:.1f} сек тишины")
+    
+    def transcribe_audio_parallel(self, audio_path, workers=None):
+        """Параллельная транскрибация длинного аудио на нескольких ядрах
+        
+        Аудио декодируется потоком и режется на сегменты в местах тишины по
+        мере чтения; готовые сегменты сразу уходят в пул процессов, поэтому
+        в памяти одновременно находятся только окно разбиения и задания в
+        работе. Результаты склеиваются по порядку с временными метками.
+        """
+        success, text, _ = self._transcribe_parallel(audio_path, workers)
+        return success, text
+    
+    def _transcribe_parallel(self, audio_path, workers=None, blocks=None, info=None):
+        """Параллельная транскрибация: (успех, текст или ошибка, сегменты)
+        
+        blocks и info - уже запущенное декодирование записи (если выбор режима
+        делался по нему); иначе файл декодируется здесь.
+        """
+        workers = workers or self.parallel_workers
+        self.logger.info(f"Параллельная транскрибация ({workers} процессов): {audio_path}")
+        
+        if not self.model:
+            if not self.load_model():
+                return False, "Не удалось загрузить модель транскрибации", []
+        
+        try:
+            self.update_progress(35)
+            if blocks is None:
+                info = {}
+                blocks = self._iter_pcm_blocks(audio_path, info=info)
+            phrases = self._decode_segments_parallel(self._iter_parallel_jobs(blocks), workers, info)
+        except Exception as e:
+            self.logger.error(f"Ошибка параллельной транскрибации: {e}")
+            self.logger.error(f"Traceback: {traceback.format_exc()}")
+            return False, f"Ошибка при транскрибации: {str(e)}", []
+        
+        full_text = " ".join(phrase["text"] for phrase in phrases)
+        if not full_text.strip():
+            return False, "Не удалось распознать текст в аудио (пустой результат)", []
+        
+        print(f"Транскрибация завершена, получено {len(full_text.split())} слов")
+        self.update_progress(100)
+        return True, full_text, self._phrase_segments(phrases)
+    
+    def _iter_parallel_jobs(self, blocks):
+        """Делит поток блоков int16 на задания для пула процессов (генератор)
+        
+        Разрез ищется в самом тихом месте около parallel_segment_duration,
+        как только в окне накопилось достаточно аудио. Каждое задание - пара
+        (участки (start, end) в сэмплах исходной записи, PCM байты склеенных
+        участков). С VAD тишина внутри сегмента отбрасывается.
+        """
+        target = int(self.parallel_segment_duration * self.sample_rate)
+        window = np.zeros(0, dtype=np.int16)
+        window_start = 0
+        
+        for block in blocks:
+            window = np.concatenate((window, block))
+            # Первый разрез find_split_points не зависит от хвоста, если окна хватает на два сегмента
+            while len(window) >= 2 * target:
+                split = find_split_points(window, self.sample_rate,
+                                          target_sec=self.parallel_segment_duration)[0][1]
+                job = self._make_parallel_job(window[:split], window_start)
+                if job:
+                    yield job
+                window = window[split:]
+                window_start += split
+        
+        for start, end in find_split_points(window, self.sample_rate,
+                                            target_sec=self.parallel_segment_duration):
+            job = self._make_parallel_job(window[start:end], window_start + start)
+            if job:
+                yield job
+    
+    def _make_parallel_job(self, segment, offset):
+        """Задание для воркера из сегмента, начинающегося с сэмпла offset"""
+        if not self.use_vad:
+            return [(offset, offset + len(segment))], segment.tobytes()
+        
+        regions = detect_speech_regions(segment, self.sample_rate)
+        if not regions:
+            return None
+        pcm = np.concatenate([segment[start:end] for start, end in regions]).tobytes()
+        return [(offset + start, offset + end) for start, end in regions], pcm
+    
+    def _create_silence_gate(self):
+        """Создает потоковый фильтр тишины, если VAD включен"""
+        if not self.use_vad:
+            return None
+        return SilenceGate(self.sample_rate, threshold_db=self.vad_silence_threshold_db,
+                           hangover_sec=self.vad_hangover)
+    
+    def _decode_segments_parallel(self, jobs, workers, info=None):
+        """Распознает задания в пуле процессов и возвращает фразы в порядке времени
+        
+        Воркеры запускаются через spawn и загружают модель сами: fork процесса
+        сервера, в котором уже работают потоки, небезопасен. В пул одновременно
+        отправляется не больше двух заданий на воркер.
+        """
+        context = multiprocessing.get_context("spawn")
+        max_pending = workers * 2
+        regions_by_index = {}
+        results = {}
+        
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=context,
+                                 initializer=_init_vosk_worker,
+                                 initargs=(self.model_size,)) as pool:
+            pending = set()
+            
+            def collect(done_futures):
+                for future in done_futures:
+                    index, phrases = future.result()
+                    results[index] = phrases
+                duration = (info or {}).get("duration")
+                if duration:
+                    processed = max((regions_by_index[i][-1][1] for i in results), default=0)
+                    progress = min(100, int(processed * 100 / (duration * self.sample_rate)))
+                    self.update_progress(45 + int(progress * 0.5))
+            
+            for index, (regions, pcm) in enumerate(jobs):
+                regions_by_index[index] = regions
+                pending.add(pool.submit(_decode_vosk_segment, index, pcm, 0.0, self.sample_rate))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            
+            done, _ = wait(pending)
+            collect(done)
+        
+        self.logger.info(f"Распознано сегментов: {len(regions_by_index)}")
+        
+        # Время фраз считается от начала склеенного задания - переводим в исходное
+        ordered = []
+        for index in sorted(regions_by_index):
+            timeline = SpeechTimeline.from_regions(regions_by_index[index], self.sample_rate)
+            for phrase in results.get(index, []):
+                phrase["start"] = timeline.to_original(phrase["start"])
+                phrase["end"] = timeline.to_original(phrase["end"], is_end=True)
+                ordered.append(phrase)
+        return ordered
+    
+    def _iter_pcm_blocks(self, audio_path, block_seconds=10, info=None):
+        """Потоковое декодирование аудио в блоки int16 16 кГц моно
+        
+        Если передан словарь info, в него записывается длительность записи
+        (duration, сек) - не позже первого блока.
+        """
+        block_frames = self.sample_rate * block_seconds
+        
+        if not self._is_wav_16khz_mono(audio_path):
+            if self.use_ffmpeg:
+                for data in self._iter_pcm_from_ffmpeg(audio_path, block_frames * 2, info=info):
+                    yield np.frombuffer(data, dtype=np.int16)
+                return
             
+            # Без FFmpeg конвертируем через soundfile во временный WAV
+            wav_path = os.path.abspath(os.path.join(self.temp_dir, "audio_for_parallel.wav"))
+            success, result = self._convert_with_sounddevice(audio_path, wav_path)
+            if not success:
+                raise RuntimeError(result)
+            audio_path = wav_path
+        
+        if info is not None:
+            info["duration"] = sf.info(audio_path).duration
+        for block in sf.blocks(audio_path, blocksize=block_frames, dtype='int16'):
+            yield block
+    
+    def _make_result_event(self, result, timeline=None):
+        """Формирует событие завершенной фразы из результата Vosk
+        
+        Если часть тишины была отброшена, timeline переводит время в исходное.
+        """
+        text = result.get("text", "").strip()
+        if not text:
+            return None
+        
+        words = result.get("result", [])
+        start = words[0]["start"] if words else None
+        end = words[-1]["end"] if words else None
+        if timeline:
+            start = timeline.to_original(start)
+            end = timeline.to_original(end, is_end=True)
+        return {
+            "type": "result",
+            "text": text,
+            "start": start,
+            "end": end
+        }
+    
+    def _iter_pcm_from_ffmpeg(self, input_path, chunk_bytes, info=None):
+        """Декодирует медиафайл через FFmpeg в 16 кГц моно s16le и отдает блоки байтов
+        
+        Если передан словарь info, после первого блока в него записывается
+        длительность записи (duration, сек или None) из заголовка FFmpeg.
+        """
+        command = [
+            "ffmpeg",
+            "-nostdin",
+            "-hide_banner",
+            "-nostats",
+            "-loglevel", "info",  # Уровень info нужен для строки Duration в заголовке
+            "-i", input_path,  # Входной файл
+            "-vn",             # Без видео
+            "-f", "s16le",     # Сырой PCM 16 бит
+            "-acodec", "pcm_s16le",
+            "-ar", str(self.sample_rate),  # Частота 16 кГц
+            "-ac", "1",        # Моно
+            "pipe:1"           # Вывод в stdout
+        ]
+        self.logger.debug(f"Запуск конвейера FFmpeg: {' '.join(command)}")
+        
+        # stderr пишется во временный файл: непрочитанный канал при большом
+        # потоке ошибок (поврежденный файл) заполнился бы и заблокировал FFmpeg
+        stderr_file = tempfile.TemporaryFile()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        
+        try:
+            first = True
+            while True:
+                data = process.stdout.read(chunk_bytes)
+                if first and info is not None:
+                    info["duration"] = self._read_ffmpeg_duration(stderr_file)
+                first = False
+                if not data:
+                    break
+                yield data
+            
+            process.stdout.close()
+            if process.wait() != 0:
+                # Сообщение об ошибке - в конце вывода, после заголовка
+                stderr_file.seek(0, os.SEEK_END)
+                stderr_file.seek(max(0, stderr_file.tell() - 64 * 1024))
+                stderr = stderr_file.read().decode('utf-8', errors='ignore')
+                raise RuntimeError(f"Ошибка FFmpeg: {stderr}")
+        finally:
+            # Если потребитель прервал генератор, останавливаем FFmpeg
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            stderr_file.close()
+    
+    @staticmethod
+    def _read_ffmpeg_duration(stderr_file):
+        """Длительность записи (сек) из заголовка, который FFmpeg пишет в stderr
+        
+        Заголовок выводится до первых декодированных данных, а дальше FFmpeg
+        (с -nostats) пишет в stderr только ошибки и итог, поэтому чтение с
+        общей с процессом позицией файла ничего не затирает: после чтения
+        позиция возвращается в конец.
+        """
+        try:
+            stderr_file.seek(0)
+            header = stderr_file.read(64 * 1024).decode('utf-8', errors='ignore')
+        finally:
+            stderr_file.seek(0, os.SEEK_END)
+        match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", header)
+        if not match:
+            return None
+        hours, minutes, seconds = match.groups()
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    
     def _is_wav_16khz_mono(self, file_path):
         """Проверяет, соответствует ли WAV файл требованиям 16кГц, моно"""
         try:
@@ -907,6 +1386,11 @@ class Transcriber:
     
     def transcribe_youtube(self, url):
         """Транскрибация видео с YouTube"""
+        success, text, _ = self.transcribe_youtube_detailed(url)
+        return success, text
+    
+    def transcribe_youtube_detailed(self, url):
+        """Транскрибация видео с YouTube: (успех, текст или ошибка, сегменты)"""
         # Сбрасываем прогресс
         self.update_progress(5)
         
@@ -914,7 +1398,7 @@ class Transcriber:
         print("Шаг 1: Загрузка видео с YouTube")
         success, video_path = self.download_youtube(url)
         if not success:
-            return False, video_path  # Возвращаем сообщение об ошибке
+            return False, video_path, []  # Возвращаем сообщение об ошибке
         
         # Уже достигли 70% после загрузки видео
         
@@ -922,7 +1406,7 @@ class Transcriber:
         print("\nШаг 2: Извлечение аудио из видео")
         success, audio_path = self.extract_audio_from_video(video_path)
         if not success:
-            return False, audio_path
+            return False, audio_path, []
             
         # Достигли 90% после извлечения аудио
             
@@ -944,7 +1428,7 @@ class Transcriber:
         self.progress_callback = progress_wrapper
         
         # Выполняем транскрибацию
-        result = self.transcribe_audio(audio_path)
+        result = self.transcribe_audio_detailed(audio_path)
         
         # Восстанавливаем оригинальный callback
         self.progress_callback = original_callback
@@ -1111,6 +1595,16 @@ class Transcriber:
             print(f"Ошибка при записи аудио с микрофона: {str(e)}")
             return False, f"Ошибка при записи аудио: {str(e)}"
     
+    def set_parallel_workers(self, workers):
+        """Устанавливает число процессов для параллельной транскрибации (1 - отключено)"""
+        self.parallel_workers = max(1, int(workers))
+        print(f"Процессов параллельной транскрибации: {self.parallel_workers}")
+    
+    def set_vad_enabled(self, enabled):
+        """Включает или отключает отсев тишины перед распознаванием"""
+        self.use_vad = bool(enabled)
+        print(f"Отсев тишины (VAD): {'включен' if self.use_vad else 'отключен'}")
+    
     def set_progress_callback(self, callback):
         """Устанавливает функцию обратного вызова для отображения прогресса"""
         self.progress_callback = callback
@@ -0,0 +1,126 @@
+"""
+Постоянный кэш результатов транскрибации
+
+Ключ - хэш содержимого медиафайла вместе с настройками движка (движок,
+размер модели, тип вычислений, язык, диаризация), поэтому повторная загрузка
+той же записи с теми же настройками возвращается без запуска ASR.
+Каталог кэша ограничен по размеру: при переполнении удаляются записи,
+к которым дольше всего не обращались.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def youtube_media_id(url):
+    """Идентификатор медиа для ссылки YouTube
+
+    Содержимое видео по его ID не меняется, поэтому ключом служит ID,
+    а не хэш файла - так попадание в кэш не требует повторной загрузки видео.
+    """
+    match = re.search(r"(?:v=|youtu\.be/|shorts/|embed/|live/)([\w-]{11})", url)
+    return f"youtube:{match.group(1)}" if match else f"url:{url.strip()}"
+
+
+class TranscriptCache:
+    """Кэш структурированных транскрипций в каталоге на диске (по файлу JSON на запись)"""
+
+    def __init__(self, cache_dir, max_bytes=500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def hash_bytes(content):
+        """SHA-256 содержимого медиафайла"""
+        return hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def hash_file(path, chunk_size=1024 * 1024):
+        """SHA-256 файла, читаемого блоками"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(media_id, settings):
+        """Ключ записи по идентификатору медиа и настройкам транскрибации"""
+        payload = json.dumps({"media": media_id, "settings": settings}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Возвращает сохраненную запись или None"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # Время доступа хранится в mtime - по нему работает вытеснение
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, entry):
+        """Сохраняет запись и при необходимости освобождает место в каталоге"""
+        entry = dict(entry, cached_at=time.time())
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить транскрипцию в кэш: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        """Удаляет самые давно использованные записи, пока каталог больше max_bytes"""
+        with self._lock:
+            files = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def clear(self):
+        """Удаляет все записи кэша"""
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,98 @@
+"""
+Структурированный вывод транскрипции и экспорт в SRT, WebVTT и JSONL
+
+Сегмент транскрипции - словарь start, end, speaker, text, words.
+Экспортеры реализованы генераторами, чтобы длинную транскрипцию можно было
+отдавать клиенту по частям, не собирая весь текст в памяти.
+"""
+
+import json
+
+EXPORT_FORMATS = {
+    "jsonl": "application/x-ndjson",
+    "srt": "application/x-subrip",
+    "vtt": "text/vtt",
+}
+
+
+def make_segment(start, end, text, speaker=None, words=None):
+    """Сегмент в едином структурированном формате"""
+    return {
+        "start": round(start, 3) if start is not None else None,
+        "end": round(end, 3) if end is not None else None,
+        "speaker": speaker,
+        "text": text.strip(),
+        "words": words or [],
+    }
+
+
+def segments_from_result(result):
+    """Переводит результат WhisperX (segments со словами и спикерами) в структурированные сегменты"""
+    segments = []
+    for segment in (result or {}).get("segments", []):
+        text = segment.get("text", "").strip()
+        if not text:
+            continue
+        words = [
+            {
+                "word": word.get("word", ""),
+                "start": word.get("start"),
+                "end": word.get("end"),
+                "speaker": word.get("speaker", segment.get("speaker")),
+            }
+            for word in segment.get("words", []) or []
+        ]
+        segments.append(make_segment(segment.get("start"), segment.get("end"), text,
+                                     segment.get("speaker"), words))
+    return segments
+
+
+def _timestamp(seconds, separator):
+    """Время в формате ЧЧ:ММ:СС<sep>ммм"""
+    milliseconds = int(round((seconds or 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{milliseconds:03d}"
+
+
+def _caption_text(segment):
+    """Текст субтитра с именем спикера, если он известен"""
+    if segment.get("speaker"):
+        return f"{segment['speaker']}: {segment['text']}"
+    return segment["text"]
+
+
+def iter_srt(segments):
+    """Генерирует блоки субтитров SRT по одному на сегмент"""
+    for index, segment in enumerate(segments, 1):
+        yield (f"{index}\n"
+               f"{_timestamp(segment['start'], ',')} --> {_timestamp(segment['end'], ',')}\n"
+               f"{_caption_text(segment)}\n\n")
+
+
+def iter_vtt(segments):
+    """Генерирует заголовок и блоки субтитров WebVTT"""
+    yield "WEBVTT\n\n"
+    for segment in segments:
+        yield (f"{_timestamp(segment['start'], '.')} --> {_timestamp(segment['end'], '.')}\n"
+               f"{_caption_text(segment)}\n\n")
+
+
+def iter_jsonl(segments):
+    """Генерирует по одной JSON строке на сегмент"""
+    for segment in segments:
+        yield json.dumps(segment, ensure_ascii=False) + "\n"
+
+
+def iter_export(segments, export_format):
+    """Генератор экспорта в заданном формате (jsonl, srt, vtt)"""
+    exporters = {"jsonl": iter_jsonl, "srt": iter_srt, "vtt": iter_vtt}
+    if export_format not in exporters:
+        raise ValueError(f"Неизвестный формат экспорта: {export_format}")
+    return exporters[export_format](segments)
+
+
+def export_transcript(segments, export_format):
+    """Экспорт всей транскрипции в строку"""
+    return "".join(iter_export(segments, export_format))
@@ -0,0 +1,73 @@
+"""
+Кэш синтезированной речи в памяти
+
+Ключ - (текст, голос, язык, частота дискретизации, скорость речи), значение -
+готовое аудио int16. Одинаковые фразы (приветствия, сообщения об ошибках,
+повторяющиеся ответы) не синтезируются заново. Размер кэша ограничен
+в байтах: при переполнении удаляются записи, к которым дольше всего не обращались.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class SpeechCache:
+    """Потокобезопасный LRU кэш аудио с ограничением по суммарному размеру"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text, speaker, lang, sample_rate, speech_rate):
+        """Ключ записи по тексту и параметрам синтеза"""
+        return (text.strip(), speaker, lang, int(sample_rate), round(float(speech_rate), 3))
+
+    def get(self, key):
+        """Возвращает (аудио, частота) или None"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, audio, sample_rate):
+        """Сохраняет аудио и вытесняет самые старые записи сверх max_bytes"""
+        size = audio.nbytes
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._size -= previous[0].nbytes
+            self._items[key] = (audio, sample_rate)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._items.popitem(last=False)
+                self._size -= evicted.nbytes
+
+    def clear(self):
+        """Удаляет все записи"""
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def status(self):
+        """Размер и статистика попаданий"""
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -1,9 +1,10 @@
 import os
-from typing import Optional, Callable, Tuple
+from typing import Optional, Callable, Tuple, List, Iterator, Dict
 import logging
 import traceback
 from backend.transcriber import Transcriber
-from backend.whisperx_transcriber import WhisperXTranscriber
+from backend.whisperx_transcriber import WhisperXTranscriber, CPU_COMPUTE_TYPES, GPU_COMPUTE_TYPES, CPU_COMPUTE_PROFILES
+from backend.transcript_export import make_segment
 
 class UniversalTranscriber:
     """
@@ -125,6 +126,16 @@ class UniversalTranscriber:
             self.logger.error(f"Traceback: {traceback.format_exc()}")
             return False
     
+    def warmup(self) -> bool:
+        """Заранее загружает пайплайн диаризации WhisperX в реестр процесса"""
+        if not self.whisperx_transcriber:
+            return False
+        try:
+            return self.whisperx_transcriber.warmup_diarization()
+        except Exception as e:
+            self.logger.error(f"Ошибка прогрева диаризации: {e}")
+            return False
+    
     def get_current_engine(self) -> str:
         """Возвращает текущий движок"""
         return self.engine
@@ -161,15 +172,148 @@ class UniversalTranscriber:
         if self.current_transcriber:
             self.current_transcriber.set_language(lang)
     
-    def set_compute_type(self, compute_type: str):
-        """Устанавливает тип вычислений (только для WhisperX)"""
+    def is_valid_compute_type(self, compute_type: str, engine: Optional[str] = None) -> bool:
+        """
+        Проверяет тип вычислений для движка engine (по умолчанию - текущего), ничего не меняя
+        
+        Тип вычислений применим только к WhisperX. Если экземпляр WhisperX еще
+        не создан, устройство неизвестно и допускаются типы для CPU и GPU.
+        """
+        if (engine or self.engine).lower() != "whisperx":
+            return False
+        if self.whisperx_transcriber:
+            return compute_type in self.whisperx_transcriber.supported_compute_types()
+        return compute_type in CPU_COMPUTE_TYPES or compute_type in GPU_COMPUTE_TYPES
+    
+    def set_compute_type(self, compute_type: str) -> bool:
+        """Устанавливает тип вычислений (только для WhisperX)
+        
+        На CPU: int8, int8_float32, float32. Возвращает False для недопустимого значения.
+        """
         if self.engine == "whisperx" and self.whisperx_transcriber:
-            self.whisperx_transcriber.set_compute_type(compute_type)
+            return self.whisperx_transcriber.set_compute_type(compute_type)
         elif self.engine == "vosk":
             print("Тип вычислений не применим для Vosk")
+        return False
+    
+    def is_valid_cpu_profile(self, profile: str, engine: Optional[str] = None) -> bool:
+        """Проверяет профиль CPU WhisperX для движка engine (по умолчанию - текущего), ничего не меняя"""
+        if (engine or self.engine).lower() != "whisperx" or profile not in CPU_COMPUTE_PROFILES:
+            return False
+        return not self.whisperx_transcriber or self.whisperx_transcriber.device == "cpu"
+    
+    def set_cpu_profile(self, profile: str) -> bool:
+        """Устанавливает профиль CPU (только для WhisperX на CPU)"""
+        if self.engine == "whisperx" and self.whisperx_transcriber:
+            return self.whisperx_transcriber.set_cpu_profile(profile)
+        print("Профили CPU применимы только для WhisperX")
+        return False
+    
+    def get_cpu_profile(self) -> Optional[str]:
+        """Текущий профиль CPU WhisperX (None на GPU и для Vosk)"""
+        if self.whisperx_transcriber and self.whisperx_transcriber.device == "cpu":
+            return self.whisperx_transcriber.cpu_profile
+        return None
+    
+    def calibrate_cpu_profile(self, reference_audio: str) -> Optional[dict]:
+        """Замеряет скорость профилей WhisperX на CPU и включает самый быстрый
+        
+        Замеры идут на отдельном экземпляре WhisperX: рабочий экземпляр в это
+        время может обслуживать транскрибации, и его настройки меняются только
+        применением итогового профиля.
+        """
+        if not self.whisperx_transcriber:
+            self.logger.error("Калибровка доступна только для WhisperX")
+            return None
+        
+        calibrator = WhisperXTranscriber()
+        calibrator.model_size = self.whisperx_transcriber.model_size
+        calibrator.language = self.whisperx_transcriber.language
+        calibrator.batch_size = self.whisperx_transcriber.batch_size
+        try:
+            report = calibrator.calibrate_cpu_profiles(reference_audio)
+        finally:
+            calibrator.cleanup()
+        
+        self.whisperx_transcriber.set_cpu_profile(report["best_profile"])
+        return report
+    
+    def set_alignment_enabled(self, enabled: bool):
+        """Включает выравнивание слов (только для WhisperX)"""
+        if self.whisperx_transcriber:
+            self.whisperx_transcriber.set_alignment_enabled(enabled)
+        else:
+            print("Выравнивание слов не применимо для Vosk")
+    
+    def get_cache_settings(self) -> Dict:
+        """Настройки, от которых зависит результат транскрибации (часть ключа кэша)"""
+        if self.whisperx_transcriber:
+            whisperx = self.whisperx_transcriber
+            return {
+                "engine": "whisperx",
+                "model_size": whisperx.model_size,
+                "compute_type": whisperx.compute_type,
+                "language": whisperx.language,
+                "diarization": whisperx.diarization_enabled(),
+                "alignment": whisperx.use_alignment,
+                "use_vad": whisperx.use_vad,
+            }
+        if self.vosk_transcriber:
+            return {
+                "engine": "vosk",
+                "model_size": os.path.basename(self.vosk_transcriber.model_size),
+                "compute_type": None,
+                "language": self.vosk_transcriber.language,
+                "diarization": False,
+                "use_vad": self.vosk_transcriber.use_vad,
+            }
+        return {"engine": self.engine}
+    
+    @staticmethod
+    def _details(result) -> Tuple[bool, str, Dict]:
+        """
+        Приводит результат движка к (успех, текст, {"segments", "words", "diarization"})
+        
+        WhisperX возвращает словарь сегментов, слов и флага диаризации,
+        Vosk - список фраз без спикеров, старые методы - только (успех, текст).
+        """
+        success, text = result[0], result[1]
+        details = result[2] if len(result) > 2 else None
+        if isinstance(details, dict):
+            return success, text, details
+        return success, text, {"segments": details or [], "words": [], "diarization": False}
+    
+    def iter_transcribe_segments(self, audio_path: str) -> Iterator[Dict]:
+        """
+        Генератор структурированных сегментов по мере их готовности
+        
+        Vosk отдает фразы по ходу распознавания. У WhisperX сегменты становятся
+        окончательными только после диаризации, поэтому они отдаются после нее.
+        """
+        if self.whisperx_transcriber:
+            success, result, details = self.whisperx_transcriber.transcribe_audio_file_detailed(audio_path)
+            if not success:
+                raise RuntimeError(result)
+            yield from details["segments"]
+        elif self.vosk_transcriber:
+            for event in self.vosk_transcriber.iter_transcribe_stream(audio_path):
+                if event["type"] == "result":
+                    yield make_segment(event["start"], event["end"], event["text"])
+        else:
+            raise RuntimeError("Транскрайбер не инициализирован")
     
     def transcribe_audio_file(self, audio_path: str) -> Tuple[bool, str]:
         """Транскрибирует аудио файл"""
+        success, result, _ = self.transcribe_audio_file_detailed(audio_path)
+        return success, result
+    
+    def transcribe_audio_file_detailed(self, audio_path: str) -> Tuple[bool, str, Dict]:
+        """
+        Транскрибирует аудио файл и возвращает сегменты вместе с текстом
+        
+        Returns:
+            (успех, текст или ошибка, {"segments": [...], "words": [...]})
+        """
         self.logger.info(f"Начало транскрибации аудио файла: {audio_path}")
         self.logger.debug(f"Используется движок: {self.engine}")
         
@@ -177,7 +321,7 @@ class UniversalTranscriber:
         if self.whisperx_transcriber:
             self.logger.info("Используем WhisperX для диаризации по ролям...")
             try:
-                result = self.whisperx_transcriber.transcribe_audio_file(audio_path)
+                result = self.whisperx_transcriber.transcribe_audio_file_detailed(audio_path)
                 if result[0]:
                     self.logger.info("Транскрибация с диаризацией завершена успешно")
                 else:
@@ -193,9 +337,9 @@ class UniversalTranscriber:
             try:
                 # Вызываем правильный метод в зависимости от движка
                 if self.engine == "whisperx" and self.whisperx_transcriber:
-                    result = self.whisperx_transcriber.transcribe_audio_file(audio_path)
+                    result = self.whisperx_transcriber.transcribe_audio_file_detailed(audio_path)
                 elif self.engine == "vosk" and self.vosk_transcriber:
-                    result = self.vosk_transcriber.transcribe_audio(audio_path)
+                    result = self.vosk_transcriber.transcribe_audio_detailed(audio_path)
                 else:
                     # Fallback на текущий транскрайбер
                     if hasattr(self.current_transcriber, 'transcribe_audio_file'):
@@ -203,23 +347,54 @@ class UniversalTranscriber:
                     elif hasattr(self.current_transcriber, 'transcribe_audio'):
                         result = self.current_transcriber.transcribe_audio(audio_path)
                     else:
-                        return False, f"Транскрайбер {self.engine} не поддерживает транскрибацию файлов"
+                        return self._details((False, f"Транскрайбер {self.engine} не поддерживает транскрибацию файлов"))
                 
                 if result[0]:
                     self.logger.info("Транскрибация аудио файла завершена успешно")
                 else:
                     self.logger.error(f"Ошибка транскрибации: {result[1]}")
-                return result
+                return self._details(result)
             except Exception as e:
                 self.logger.error(f"Исключение при транскрибации аудио файла: {e}")
                 self.logger.error(f"Traceback: {traceback.format_exc()}")
-                return False, f"Ошибка транскрибации: {e}"
+                return self._details((False, f"Ошибка транскрибации: {e}"))
         else:
             self.logger.error("Транскрайбер не инициализирован")
-            return False, "Транскрайбер не инициализирован"
+            return self._details((False, "Транскрайбер не инициализирован"))
+    
+    def transcribe_batch(self, audio_paths: List[str]) -> List[Tuple[bool, str]]:
+        """
+        Транскрибирует несколько файлов за один проход
+        
+        WhisperX собирает куски речи всех файлов в общие батчи модели;
+        Vosk обрабатывает файлы по очереди.
+        
+        Returns:
+            Список (успех, результат или ошибка) в порядке audio_paths
+        """
+        self.logger.info(f"Пакетная транскрибация {len(audio_paths)} файлов")
+        
+        if self.whisperx_transcriber:
+            try:
+                return self.whisperx_transcriber.transcribe_batch(audio_paths)
+            except Exception as e:
+                self.logger.error(f"Ошибка пакетной транскрибации WhisperX: {e}")
+                self.logger.error(f"Traceback: {traceback.format_exc()}")
+                return [(False, f"Ошибка транскрибации: {e}")] * len(audio_paths)
+        
+        if self.vosk_transcriber:
+            return [self.vosk_transcriber.transcribe_audio(path) for path in audio_paths]
+        
+        self.logger.error("Транскрайбер не инициализирован")
+        return [(False, "Транскрайбер не инициализирован")] * len(audio_paths)
     
     def transcribe_youtube(self, url: str) -> Tuple[bool, str]:
         """Транскрибирует аудио с YouTube"""
+        success, result, _ = self.transcribe_youtube_detailed(url)
+        return success, result
+    
+    def transcribe_youtube_detailed(self, url: str) -> Tuple[bool, str, Dict]:
+        """Транскрибирует аудио с YouTube и возвращает сегменты вместе с текстом"""
         self.logger.info(f"Начало транскрибации YouTube видео: {url}")
         self.logger.debug(f"Используется движок: {self.engine}")
         
@@ -227,28 +402,28 @@ class UniversalTranscriber:
             try:
                 # Вызываем правильный метод в зависимости от движка
                 if self.engine == "whisperx" and self.whisperx_transcriber:
-                    result = self.whisperx_transcriber.transcribe_youtube(url)
+                    result = self.whisperx_transcriber.transcribe_youtube_detailed(url)
                 elif self.engine == "vosk" and self.vosk_transcriber:
-                    result = self.vosk_transcriber.transcribe_youtube(url)
+                    result = self.vosk_transcriber.transcribe_youtube_detailed(url)
                 else:
                     # Fallback на текущий транскрайбер
                     if hasattr(self.current_transcriber, 'transcribe_youtube'):
                         result = self.current_transcriber.transcribe_youtube(url)
                     else:
-                        return False, f"Транскрайбер {self.engine} не поддерживает YouTube транскрибацию"
+                        return self._details((False, f"Транскрайбер {self.engine} не поддерживает YouTube транскрибацию"))
                 
                 if result[0]:
                     self.logger.info("Транскрибация YouTube видео завершена успешно")
                 else:
                     self.logger.error(f"Ошибка транскрибации YouTube: {result[1]}")
-                return result
+                return self._details(result)
             except Exception as e:
                 self.logger.error(f"Исключение при транскрибации YouTube: {e}")
                 self.logger.error(f"Traceback: {traceback.format_exc()}")
-                return False, f"Ошибка транскрибации YouTube: {e}"
+                return self._details((False, f"Ошибка транскрибации YouTube: {e}"))
         else:
             self.logger.error("Транскрайбер не инициализирован")
-            return False, "Транскрайбер не инициализирован"
+            return self._details((False, "Транскрайбер не инициализирован"))
     
     def transcribe_with_diarization(self, audio_path: str) -> Tuple[bool, str]:
         """
@@ -260,15 +435,25 @@ class UniversalTranscriber:
         Returns:
             Tuple[bool, str]: (успех, результат или ошибка)
         """
+        success, result, _ = self.transcribe_with_diarization_detailed(audio_path)
+        return success, result
+    
+    def transcribe_with_diarization_detailed(self, audio_path: str) -> Tuple[bool, str, Dict]:
+        """
+        Транскрибирует с диаризацией и возвращает сегменты вместе с текстом
+        
+        Returns:
+            (успех, текст или ошибка, {"segments": [...], "words": [...]})
+        """
         self.logger.info(f"Принудительная транскрибация с диаризацией: {audio_path}")
         
         if not self.whisperx_transcriber:
             self.logger.error("WhisperX недоступен для диаризации")
-            return False, "WhisperX недоступен для диаризации по ролям"
+            return self._details((False, "WhisperX недоступен для диаризации по ролям"))
         
         try:
             self.logger.info("Используем WhisperX для диаризации по ролям...")
-            result = self.whisperx_transcriber.transcribe_audio_file(audio_path)
+            result = self.whisperx_transcriber.transcribe_audio_file_detailed(audio_path)
             
             if result[0]:
                 self.logger.info("Диаризация с WhisperX завершена успешно")
@@ -280,7 +465,7 @@ class UniversalTranscriber:
         except Exception as e:
             self.logger.error(f"Ошибка диаризации с WhisperX: {e}")
             self.logger.error(f"Traceback: {traceback.format_exc()}")
-            return False, f"Ошибка диаризации: {e}"
+            return self._details((False, f"Ошибка диаризации: {e}"))
     
     def get_engine_info(self) -> dict:
         """Возвращает информацию о текущем движке"""
@@ -0,0 +1,299 @@
+"""
+Простой энергетический детектор речевой активности (VAD) для моно аудио
+
+Используется как общий предварительный этап перед ASR (Vosk и WhisperX):
+в распознаватель подаются только участки речи, а временные метки
+результатов пересчитываются на исходную временную шкалу через SpeechTimeline.
+"""
+
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# Длительность кадра анализа в миллисекундах
+FRAME_MS = 30
+
+
+def _to_float(audio):
+    """Приводит аудио к float32 в диапазоне [-1, 1]"""
+    audio = np.asarray(audio)
+    if np.issubdtype(audio.dtype, np.integer):
+        return audio.astype(np.float32) / 32768.0
+    return audio.astype(np.float32, copy=False)
+
+
+def frame_energies(audio, sample_rate, frame_ms=FRAME_MS):
+    """Возвращает RMS энергию каждого кадра в dBFS"""
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    samples = _to_float(audio)
+
+    n_frames = int(np.ceil(len(samples) / frame_len))
+    if n_frames == 0:
+        return np.array([], dtype=np.float32)
+
+    # Дополняем последний кадр нулями до полной длины
+    padded = np.zeros(n_frames * frame_len, dtype=np.float32)
+    padded[:len(samples)] = samples
+    frames = padded.reshape(n_frames, frame_len)
+
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(rms + 1e-10)
+
+
+def find_split_points(audio, sample_rate, target_sec=60.0, search_sec=10.0, frame_ms=FRAME_MS):
+    """
+    Разбивает аудио на сегменты длиной около target_sec, разрезая в самых тихих местах
+
+    Args:
+        audio: Массив сэмплов (int16 или float)
+        sample_rate: Частота дискретизации
+        target_sec: Желаемая длительность сегмента
+        search_sec: Окно поиска тишины вокруг желаемой точки разреза
+        frame_ms: Длительность кадра анализа
+
+    Returns:
+        Список кортежей (start, end) в сэмплах
+    """
+    total = len(audio)
+    target = int(target_sec * sample_rate)
+    if total <= target * 1.5:
+        return [(0, total)]
+
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    energies = frame_energies(audio, sample_rate, frame_ms)
+    half_window = int(search_sec * sample_rate / 2)
+
+    segments = []
+    position = 0
+    while total - position > target * 1.5:
+        ideal = position + target
+        # Окно поиска не подходит к краям ближе половины сегмента
+        low = max(ideal - half_window, position + target // 2)
+        high = min(ideal + half_window, total - target // 2)
+        first_frame = low // frame_len
+        last_frame = min(len(energies), high // frame_len + 1)
+
+        if first_frame >= last_frame:
+            split = ideal
+        else:
+            # Самый тихий кадр в окне поиска
+            quietest = first_frame + int(np.argmin(energies[first_frame:last_frame]))
+            split = quietest * frame_len + frame_len // 2
+
+        split = min(max(split, position + 1), total)
+        segments.append((position, split))
+        position = split
+
+    segments.append((position, total))
+    return segments
+
+
+def adaptive_threshold(energies, margin_db=10.0, floor_db=-70.0):
+    """Порог речи по уровню шума записи
+
+    Порог ставится на margin_db выше шумового фона (10-й перцентиль), но не
+    выше уровня на 25 дБ ниже громких участков - чтобы запись почти без пауз
+    не была целиком принята за тишину.
+    """
+    if len(energies) == 0:
+        return floor_db
+    noise_floor = float(np.percentile(energies, 10))
+    loud_level = float(np.percentile(energies, 95))
+    return max(floor_db, min(noise_floor + margin_db, loud_level - 25.0))
+
+
+def detect_speech_regions(audio, sample_rate, threshold_db=None, min_speech_ms=250,
+                          min_silence_ms=500, pad_ms=200, frame_ms=FRAME_MS):
+    """
+    Находит участки речи в аудио
+
+    Args:
+        audio: Массив сэмплов (int16 или float)
+        sample_rate: Частота дискретизации
+        threshold_db: Порог энергии речи в dBFS (None - адаптивный)
+        min_speech_ms: Более короткие всплески энергии отбрасываются
+        min_silence_ms: Более короткие паузы не разрывают участок речи
+        pad_ms: Запас, добавляемый к краям каждого участка
+        frame_ms: Длительность кадра анализа
+
+    Returns:
+        Список кортежей (start, end) в сэмплах
+    """
+    total = len(audio)
+    energies = frame_energies(audio, sample_rate, frame_ms)
+    if len(energies) == 0:
+        return []
+
+    if threshold_db is None:
+        threshold_db = adaptive_threshold(energies)
+
+    voiced = energies > threshold_db
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    min_speech_frames = max(1, int(min_speech_ms / frame_ms))
+    min_silence_frames = max(1, int(min_silence_ms / frame_ms))
+    pad = int(pad_ms * sample_rate / 1000)
+
+    # Границы непрерывных участков речи в кадрах
+    changes = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(changes == 1)
+    ends = np.flatnonzero(changes == -1)
+
+    # Склеиваем участки, разделенные короткими паузами
+    merged = []
+    for start, end in zip(starts, ends):
+        if merged and start - merged[-1][1] < min_silence_frames:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    regions = []
+    for start, end in merged:
+        if end - start < min_speech_frames:
+            continue
+        start_sample = int(max(0, start * frame_len - pad))
+        end_sample = int(min(total, end * frame_len + pad))
+        if regions and start_sample <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end_sample)
+        else:
+            regions.append((start_sample, end_sample))
+    return regions
+
+
+def group_regions(audio, regions, sample_rate, target_sec=60.0):
+    """
+    Группирует участки речи в сегменты длительностью около target_sec
+
+    Слишком длинные участки без пауз дополнительно режутся find_split_points.
+    Возвращает список групп, каждая группа - список (start, end) в сэмплах.
+    """
+    target = int(target_sec * sample_rate)
+    groups = []
+    current = []
+    current_len = 0
+
+    for start, end in regions:
+        if end - start > target * 1.5:
+            if current:
+                groups.append(current)
+                current, current_len = [], 0
+            for sub_start, sub_end in find_split_points(audio[start:end], sample_rate, target_sec):
+                groups.append([(start + sub_start, start + sub_end)])
+            continue
+
+        if current and current_len + (end - start) > target:
+            groups.append(current)
+            current, current_len = [], 0
+        current.append((start, end))
+        current_len += end - start
+
+    if current:
+        groups.append(current)
+    return groups
+
+
+class SpeechTimeline:
+    """Соответствие времени в сжатом (без тишины) аудио исходной временной шкале"""
+
+    def __init__(self):
+        self._compact_starts = []
+        self._original_starts = []
+        self._durations = []
+        self.compact_duration = 0.0
+
+    @classmethod
+    def from_regions(cls, regions, sample_rate):
+        """Создает шкалу из участков речи, заданных в сэмплах"""
+        timeline = cls()
+        for start, end in regions:
+            timeline.add_span(start / sample_rate, (end - start) / sample_rate)
+        return timeline
+
+    def add_span(self, original_start, duration):
+        """Добавляет следующий сохраненный участок исходного аудио"""
+        if duration <= 0:
+            return
+        if self._durations:
+            last_end = self._original_starts[-1] + self._durations[-1]
+            if abs(last_end - original_start) < 1e-6:
+                # Участок продолжает предыдущий - расширяем его
+                self._durations[-1] += duration
+                self.compact_duration += duration
+                return
+        self._compact_starts.append(self.compact_duration)
+        self._original_starts.append(original_start)
+        self._durations.append(duration)
+        self.compact_duration += duration
+
+    def to_original(self, compact_time, is_end=False):
+        """Переводит время в сжатом аудио во время исходной записи
+
+        Для конца интервала (is_end=True) время на стыке участков относится
+        к предыдущему участку, а не к началу следующего.
+        """
+        if compact_time is None or not self._compact_starts:
+            return compact_time
+        search = bisect_left if is_end else bisect_right
+        index = max(0, search(self._compact_starts, compact_time) - 1)
+        offset = min(max(0.0, compact_time - self._compact_starts[index]), self._durations[index])
+        return self._original_starts[index] + offset
+
+
+def extract_speech(audio, regions, sample_rate):
+    """Склеивает участки речи в одно сжатое аудио и возвращает его вместе с SpeechTimeline"""
+    if not regions:
+        return audio[:0], SpeechTimeline()
+    compact = np.concatenate([audio[start:end] for start, end in regions])
+    return compact, SpeechTimeline.from_regions(regions, sample_rate)
+
+
+def remap_segments(segments, timeline):
+    """Пересчитывает start/end сегментов и слов (формат WhisperX) на исходную шкалу"""
+    for segment in segments:
+        if segment.get("start") is not None:
+            segment["start"] = timeline.to_original(segment["start"])
+        if segment.get("end") is not None:
+            segment["end"] = timeline.to_original(segment["end"], is_end=True)
+        for word in segment.get("words", []) or []:
+            if word.get("start") is not None:
+                word["start"] = timeline.to_original(word["start"])
+            if word.get("end") is not None:
+                word["end"] = timeline.to_original(word["end"], is_end=True)
+    return segments
+
+
+class SilenceGate:
+    """
+    Потоковый отсев длинной тишины для распознавателей, принимающих аудио блоками
+
+    После окончания речи еще hangover_sec тишины пропускается в распознаватель,
+    чтобы он мог завершить фразу; остальная тишина отбрасывается. Пропущенные
+    участки учитываются в timeline для пересчета временных меток.
+    """
+
+    def __init__(self, sample_rate, threshold_db=-45.0, hangover_sec=1.0):
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.hangover_sec = hangover_sec
+        self.timeline = SpeechTimeline()
+        self.position = 0.0
+        self.silence_run = 0.0
+        self.skipped = 0.0
+
+    def process(self, pcm_bytes):
+        """Принимает блок 16-битного PCM, возвращает байты для распознавателя (или b'')"""
+        samples = np.frombuffer(pcm_bytes, dtype=np.int16)
+        duration = len(samples) / self.sample_rate
+        start = self.position
+        self.position += duration
+
+        energies = frame_energies(samples, self.sample_rate)
+        if len(energies) and energies.max() > self.threshold_db:
+            self.silence_run = 0.0
+        else:
+            self.silence_run += duration
+            if self.silence_run > self.hangover_sec:
+                self.skipped += duration
+                return b""
+
+        self.timeline.add_span(start, duration)
+        return pcm_bytes
@@ -4,12 +4,22 @@ import torch
 import queue
 import sounddevice as sd
 import re
+import threading
 import time
 import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from vosk import Model, KaldiRecognizer
+from vosk import KaldiRecognizer
 from backend.agent import ask_agent
 from backend.memory import save_to_memory
+from backend.model_registry import get_vosk_model, create_vosk_recognizer
+from backend.decoded_audio import DecodedAudio
+from backend.tts_cache import SpeechCache
+from backend.audio_encoding import encode_audio, DEFAULT_BITRATE
+from backend.time_stretch import wsola_time_stretch
+from backend.torch_threads import torch_threads
+from backend.config.config import TTS_CACHE_MAX_MB, TTS_CHUNK_WORKERS, TTS_TORCH_THREADS
 
 # Попытка импорта librosa для изменения темпа аудио
 try:
@@ -19,11 +29,13 @@ try:
     print("librosa доступна для изменения темпа аудио")
 except ImportError:
     librosa_available = False
-    print("librosa не установлена, изменение темпа аудио будет недоступно")
+    print("librosa не установлена, темп аудио меняется через WSOLA")
 
 # Константы
 SAMPLE_RATE = 16000
 VOSK_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "model_small")
+SILERO_SAMPLE_RATE = 48000
+SILERO_SAMPLE_RATES = (8000, 24000, 48000)  # Частоты, на которых синтезирует Silero
 SILERO_MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'silero_models')
 MODELS_URLS = {
     'ru': 'https://models.silero.ai/models/tts/ru/v3_1_ru.pt',
@@ -38,6 +50,9 @@ MODEL_PATHS = {
 models = {}
 tts_model_loaded = False
 pyttsx3_engine = None
+tts_model_info = {}  # Время загрузки, прогрев и память моделей Silero по языкам
+tts_torch_threads = TTS_TORCH_THREADS  # Потоки torch для синтеза (отдельно от n_threads LLM)
+_tts_load_lock = threading.Lock()
 
 # Попытка импорта резервной библиотеки TTS
 try:
@@ -49,12 +64,21 @@ except ImportError:
 
 #---------- Функции для изменения темпа аудио ----------#
 
-def change_audio_speed(audio, sample_rate, speed_factor):
-    """Изменяет скорость воспроизведения аудио без изменения частоты"""
-    if not librosa_available:
-        print("librosa недоступна, возвращаю оригинальное аудио")
+def change_audio_speed(audio, sample_rate, speed_factor, engine="wsola"):
+    """
+    Изменяет скорость воспроизведения аудио без изменения частоты
+
+    По умолчанию используется WSOLA на numpy (backend.time_stretch),
+    engine="librosa" оставлен для сравнения. При скорости 1.0 аудио
+    возвращается без обработки.
+    """
+    if speed_factor == 1.0:
         return audio
     
+    if engine == "librosa" and not librosa_available:
+        print("librosa недоступна, использую WSOLA")
+        engine = "wsola"
+    
     try:
         # Конвертируем torch tensor в numpy array
         if isinstance(audio, torch.Tensor):
@@ -63,7 +87,10 @@ def change_audio_speed(audio, sample_rate, speed_factor):
             audio_numpy = audio
         
         # Изменяем темп аудио
-        audio_fast = librosa.effects.time_stretch(audio_numpy, rate=speed_factor)
+        if engine == "librosa":
+            audio_fast = librosa.effects.time_stretch(audio_numpy, rate=speed_factor)
+        else:
+            audio_fast = wsola_time_stretch(audio_numpy, speed_factor, sample_rate)
         
         # Конвертируем обратно в torch tensor
         if isinstance(audio, torch.Tensor):
@@ -115,17 +142,32 @@ def download_model(lang):
 
 def load_model(lang):
     """Загрузка модели из локального файла"""
-    global models, tts_model_loaded
     
     if lang in models:
         return True
         
     model_path = MODEL_PATHS[lang]
     
+    # Фоновая предзагрузка и первый запрос не должны грузить модель дважды
+    with _tts_load_lock:
+        if lang in models:
+            return True
+        return _load_model_file(lang, model_path)
+
+def _load_model_file(lang, model_path):
+    """Загружает пакет модели Silero и запоминает время загрузки и память"""
+    global tts_model_loaded
+    
     try:
         if os.path.isfile(model_path):
+            started = time.time()
             model = torch.package.PackageImporter(model_path).load_pickle("tts_models", "model")
             model.to('cpu')
+            tts_model_info[lang] = {
+                "load_seconds": round(time.time() - started, 2),
+                "memory_bytes": _model_memory_bytes(model, model_path),
+                "warmed_up": False,
+            }
             models[lang] = model
             tts_model_loaded = True
             return True
@@ -136,19 +178,92 @@ def load_model(lang):
         print(f"Ошибка загрузки модели {lang}: {e}")
         return False
 
-def init_tts():
+def _model_memory_bytes(model, model_path):
+    """Оценка памяти модели: параметры и буферы torch, иначе размер файла пакета"""
+    try:
+        module = getattr(model, 'model', model)
+        tensors = list(module.parameters()) + list(module.buffers())
+        if tensors:
+            return sum(t.numel() * t.element_size() for t in tensors)
+    except Exception:
+        pass
+    return os.path.getsize(model_path)
+
+def set_tts_threads(num_threads):
+    """
+    Задает число потоков torch для синтеза речи
+
+    Бюджет отделен от n_threads LLM: синтез берет его через torch_threads
+    на время работы, не затрагивая llama.cpp.
+    """
+    global tts_torch_threads
+    tts_torch_threads = max(1, int(num_threads))
+    print(f"Потоки torch для TTS: {tts_torch_threads}")
+    return tts_torch_threads
+
+WARMUP_TEXTS = {
+    'ru': 'Привет, я готова к работе.',
+    'en': 'Hello, I am ready.'
+}
+
+def warmup_tts(lang, speaker='baya'):
+    """Прогревочный синтез: первый вызов apply_tts компилирует граф и выделяет буферы"""
+    if lang not in models:
+        return False
+    try:
+        started = time.time()
+        with torch_threads(tts_torch_threads):
+            models[lang].apply_tts(text=WARMUP_TEXTS.get(lang, WARMUP_TEXTS['en']),
+                                   speaker=speaker if lang == 'ru' else 'en_0',
+                                   sample_rate=SILERO_SAMPLE_RATE, put_accent=False, put_yo=False)
+        tts_model_info[lang]["warmed_up"] = True
+        tts_model_info[lang]["warmup_seconds"] = round(time.time() - started, 2)
+        print(f"Модель TTS {lang} прогрета за {tts_model_info[lang]['warmup_seconds']} с")
+        return True
+    except Exception as e:
+        print(f"Ошибка прогрева модели TTS {lang}: {e}")
+        return False
+
+def preload_tts(languages=('ru', 'en'), warmup=True):
+    """Загружает модели Silero заранее и при необходимости прогревает их"""
+    loaded = []
+    for lang in languages:
+        if lang not in MODEL_PATHS:
+            print(f"Неизвестный язык TTS: {lang}")
+            continue
+        if download_model(lang) and load_model(lang):
+            if warmup and not tts_model_info[lang]["warmed_up"]:
+                warmup_tts(lang)
+            loaded.append(lang)
+    return loaded
+
+def get_tts_status():
+    """Состояние TTS: загруженные модели, память, потоки и кэш"""
+    status = {
+        "silero_loaded": tts_model_loaded,
+        "pyttsx3_available": pyttsx3_engine is not None,
+        "torch_threads": tts_torch_threads,
+        "models": {
+            lang: dict(tts_model_info.get(lang, {}), loaded=lang in models)
+            for lang in MODEL_PATHS
+        },
+        "cache": speech_cache.status(),
+    }
+    try:
+        import psutil
+        status["process_rss_bytes"] = psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    return status
+
+def init_tts(preload=True):
     """Инициализация всей системы TTS"""
-    global tts_model_loaded
-    
     # Инициализация pyttsx3 как резервной системы
-    pyttsx3_initialized = init_pyttsx3()
-    
-    # Пытаемся загрузить русскую модель
-    if download_model('ru') and load_model('ru'):
-        tts_model_loaded = True
+    init_pyttsx3()
     
-    # Пытаемся загрузить английскую модель
-    download_model('en') and load_model('en')
+    # Модели Silero (русская и английская) с прогревом
+    if preload:
+        preload_tts()
 
 def split_text_into_chunks(text, max_chunk_size=1000):
     """Делит текст на части, длина каждой не превышает max_chunk_size символов"""
@@ -183,6 +298,175 @@ def detect_language(text):
     else:
         return 'en'
 
+def _prepare_tts_text(text):
+    """Подготовка текста для Silero: короткие фразы озвучиваются нестабильно"""
+    if len(text.strip()) < 10:
+        # Для коротких текстов добавляем контекст и заменяем проблемные символы
+        return f"Ответ: {text.replace(',', ' и ').replace('.', ' точка').replace('1', 'один').replace('2', 'два').replace('3', 'три').replace('4', 'четыре').replace('5', 'пять')}"
+    return text
+
+def _synthesize_chunk(model, chunk, speaker, sample_rate):
+    """Синтезирует одну часть текста, при ошибке пробует упрощенный вариант"""
+    try:
+        audio = model.apply_tts(
+            text=chunk, 
+            speaker=speaker,
+            sample_rate=sample_rate,
+            put_accent=False,  # Убираем акценты для стабильности
+            put_yo=False       # Убираем ё для стабильности
+        )
+    except Exception as chunk_error:
+        print(f"Ошибка синтеза части текста: {chunk_error}")
+        # Пытаемся с упрощенными настройками
+        simplified_chunk = chunk.replace(',', '').replace('.', '').replace('!', '').replace('?', '')
+        if not simplified_chunk.strip():
+            return None
+        try:
+            audio = model.apply_tts(
+                text=simplified_chunk, 
+                speaker='baya',  # Принудительно используем простой голос
+                sample_rate=sample_rate,  # Используем ту же частоту
+                put_accent=False,
+                put_yo=False
+            )
+        except Exception as fallback_error:
+            print(f"Fallback тоже не сработал: {fallback_error}")
+            return None
+    return audio
+
+# Пул синтеза независимых частей длинного текста
+_tts_chunk_executor = ThreadPoolExecutor(max_workers=TTS_CHUNK_WORKERS, thread_name_prefix="silero-chunk")
+
+# Кэш синтезированных фраз
+speech_cache = SpeechCache(max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024)
+
+def synthesize_speech(text, speaker='baya', lang=None, speech_rate=1.0, sample_rate=SILERO_SAMPLE_RATE):
+    """
+    Синтез речи Silero в память
+
+    Результат кэшируется по тексту и параметрам синтеза, части длинного
+    текста синтезируются параллельно. Частота 24 кГц вдвое дешевле 48 кГц
+    и для речи почти не отличается на слух.
+
+    Returns:
+        (numpy int16 массив, частота дискретизации) или None при ошибке
+    """
+    if not text or not text.strip():
+        return None
+    
+    # Определяем язык, если не указан
+    if lang is None:
+        lang = detect_language(text)
+    
+    if sample_rate not in SILERO_SAMPLE_RATES:
+        sample_rate = SILERO_SAMPLE_RATE
+    
+    cache_key = SpeechCache.make_key(text, speaker, lang, sample_rate, speech_rate)
+    cached = speech_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # Проверяем, загружена ли нужная модель
+    if lang not in models and not load_model(lang):
+        return None
+    
+    model = models[lang]
+    chunks = split_text_into_chunks(_prepare_tts_text(text))
+    if len(chunks) == 1:
+        with torch_threads(tts_torch_threads):
+            results = [_synthesize_chunk(model, chunks[0], speaker, sample_rate)]
+    else:
+        # Части независимы - синтезируем параллельно, map сохраняет их порядок.
+        # Бюджет потоков TTS делится между воркерами и берется один раз здесь,
+        # а не каждым воркером пула
+        with torch_threads(max(1, tts_torch_threads // TTS_CHUNK_WORKERS)):
+            results = list(_tts_chunk_executor.map(
+                lambda chunk: _synthesize_chunk(model, chunk, speaker, sample_rate),
+                chunks
+            ))
+    
+    parts = [
+        audio.cpu().numpy() if isinstance(audio, torch.Tensor) else np.asarray(audio)
+        for audio in results
+        if audio is not None
+    ]
+    if not parts:
+        return None
+    
+    # Темп меняется один раз для всего текста, а не для каждой части
+    audio = change_audio_speed(np.concatenate(parts), sample_rate, speech_rate)
+    audio = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    # Массив из кэша отдается всем вызывающим - защищаем его от изменения
+    audio.setflags(write=False)
+    speech_cache.put(cache_key, audio, sample_rate)
+    return audio, sample_rate
+
+def synthesize_speech_encoded(text, speaker='baya', lang=None, speech_rate=1.0,
+                              sample_rate=SILERO_SAMPLE_RATE, audio_format='wav', bitrate=DEFAULT_BITRATE):
+    """Синтез речи Silero в байты файла заданного формата (wav, ogg, mp3) или None при ошибке"""
+    result = synthesize_speech(text, speaker=speaker, lang=lang, speech_rate=speech_rate, sample_rate=sample_rate)
+    if result is None:
+        return None
+    audio, rate = result
+    return encode_audio(audio, rate, audio_format=audio_format, bitrate=bitrate)
+
+# Отдельный поток синтеза: предложения озвучиваются по очереди, пока LLM генерирует следующие
+_tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="silero-tts")
+
+def submit_speech_synthesis(text, speaker='baya', lang=None, speech_rate=1.0,
+                            sample_rate=SILERO_SAMPLE_RATE, audio_format='wav', bitrate=DEFAULT_BITRATE):
+    """Ставит синтез текста в очередь потока TTS и возвращает Future с байтами аудио"""
+    return _tts_executor.submit(synthesize_speech_encoded, text, speaker, lang, speech_rate,
+                                sample_rate, audio_format, bitrate)
+
+class SentenceSegmenter:
+    """
+    Собирает поток токенов LLM в законченные предложения для синтеза речи
+
+    Предложение отдается, когда после знака конца предложения пришел пробел
+    или перевод строки. Слишком короткие предложения склеиваются со следующими
+    (Silero плохо озвучивает короткие фразы), слишком длинные без знаков
+    препинания режутся по запятой или пробелу.
+    """
+
+    _boundary = re.compile(r'[.!?…]+["»)]*\s+|\n+')
+
+    def __init__(self, min_chars=20, max_chars=300):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+
+    def _find_cut(self):
+        """Позиция конца очередного предложения в буфере или None"""
+        for match in self._boundary.finditer(self.buffer):
+            if len(self.buffer[:match.end()].strip()) >= self.min_chars:
+                return match.end()
+        
+        if len(self.buffer) > self.max_chars:
+            cut = self.buffer.rfind(', ', 0, self.max_chars)
+            if cut <= 0:
+                cut = self.buffer.rfind(' ', 0, self.max_chars)
+            return cut + 1 if cut > 0 else self.max_chars
+        return None
+
+    def feed(self, chunk):
+        """Добавляет фрагмент текста и возвращает список законченных предложений"""
+        self.buffer += chunk
+        sentences = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            sentence, self.buffer = self.buffer[:cut].strip(), self.buffer[cut:]
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self):
+        """Возвращает остаток текста после окончания генерации"""
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
+
 def speak_text_silero(text, speaker='baya', sample_rate=48000, lang=None, speech_rate=1.0, save_to_file=None):
     """Озвучивание текста с помощью Silero TTS"""
     global models
@@ -205,94 +489,36 @@ def speak_text_silero(text, speaker='baya', sample_rate=48000, lang=None, speech
         print(f"Исходная частота дискретизации: {sample_rate} Hz")
         
         # Используем стандартную частоту дискретизации для Silero
-        effective_sample_rate = 48000  # Всегда используем максимальное качество
+        effective_sample_rate = SILERO_SAMPLE_RATE  # Всегда используем максимальное качество
         
         print(f"Использую стандартную частоту дискретизации: {effective_sample_rate} Hz")
         print(f"Скорость речи будет изменена через изменение темпа аудио: {speech_rate}x")
         
-        # Обрабатываем короткие тексты и проблемные символы
-        if len(text.strip()) < 10:
-            # Для коротких текстов добавляем контекст и заменяем проблемные символы
-            text = f"Ответ: {text.replace(',', ' и ').replace('.', ' точка').replace('1', 'один').replace('2', 'два').replace('3', 'три').replace('4', 'четыре').replace('5', 'пять')}"
-        
-        # Разбиваем текст на части, если он длинный
-        chunks = split_text_into_chunks(text)
-        all_audio = []
-        
-        for i, chunk in enumerate(chunks):
-            if i > 0:
-                time.sleep(0.3)  # Пауза между частями
-                
-            try:
-                audio = models[lang].apply_tts(
-                    text=chunk, 
-                    speaker=speaker,
-                    sample_rate=effective_sample_rate,
-                    put_accent=False,  # Убираем акценты для стабильности
-                    put_yo=False       # Убираем ё для стабильности
-                )
-                
-                # Изменяем темп аудио для изменения скорости речи
-                if speech_rate != 1.0:
-                    print(f"Изменяю темп аудио с {speech_rate}x")
-                    audio = change_audio_speed(audio, effective_sample_rate, speech_rate)
-                
-                if save_to_file:
-                    all_audio.append(audio)
-                else:
-                    sd.play(audio, effective_sample_rate)
-                    sd.wait()
-                    
-            except Exception as chunk_error:
-    
-                # Пытаемся с упрощенными настройками
-                try:
-                    simplified_chunk = chunk.replace(',', '').replace('.', '').replace('!', '').replace('?', '')
-                    if simplified_chunk.strip():
-                        audio = models[lang].apply_tts(
-                            text=simplified_chunk, 
-                            speaker='baya',  # Принудительно используем простой голос
-                            sample_rate=effective_sample_rate,  # Используем ту же частоту
-                            put_accent=False,
-                            put_yo=False
-                        )
-                        
-                        # Изменяем темп аудио для изменения скорости речи
-                        if speech_rate != 1.0:
-                            print(f"Fallback: изменяю темп аудио с {speech_rate}x")
-                            audio = change_audio_speed(audio, effective_sample_rate, speech_rate)
-                        
-                        if save_to_file:
-                            all_audio.append(audio)
-                        else:
-                            sd.play(audio, effective_sample_rate)
-                            sd.wait()
-                except Exception as fallback_error:
-                    print(f"Fallback тоже не сработал: {fallback_error}")
-                    continue
-        
-        if save_to_file and all_audio:
+        if save_to_file:
+            result = synthesize_speech(text, speaker=speaker, lang=lang, speech_rate=speech_rate)
+            if result is None:
+                return False
             try:
-                import torch
-                import scipy.io.wavfile
-                
-                # Объединяем все части аудио
-                combined_audio = torch.cat(all_audio, dim=0)
-                audio_numpy = combined_audio.cpu().numpy()
-                
-                # Нормализуем аудио
-                if audio_numpy.max() <= 1.0:
-                    audio_numpy = (audio_numpy * 32767).astype('int16')
-                
-                # Сохраняем в файл с учетом измененной частоты дискретизации
-                scipy.io.wavfile.write(save_to_file, effective_sample_rate, audio_numpy)
+                with open(save_to_file, 'wb') as f:
+                    f.write(encode_audio(*result, audio_format='wav'))
                 print(f"Аудио сохранено в {save_to_file}")
                 return True
-                
             except Exception as save_error:
                 print(f"Ошибка сохранения аудио: {save_error}")
                 return False
         
+        # Воспроизводим по частям: первая часть звучит, не дожидаясь синтеза остальных
+        chunks = split_text_into_chunks(_prepare_tts_text(text))
+        for i, chunk in enumerate(chunks):
+            if i > 0:
+                time.sleep(0.3)  # Пауза между частями
+            
+            audio = _synthesize_chunk(models[lang], chunk, speaker, effective_sample_rate)
+            if audio is not None:
+                audio = change_audio_speed(audio, effective_sample_rate, speech_rate)
+                sd.play(audio, effective_sample_rate)
+                sd.wait()
+        
         return True
     except Exception as e:
         print(f"Ошибка при синтезе речи через Silero: {e}")
@@ -327,7 +553,8 @@ def speak_text(text, speaker='baya', voice_id='ru', speech_rate=1.0, save_to_fil
         return False
     
     # Пытаемся озвучить через Silero
-    if tts_model_loaded and speak_text_silero(text, speaker, lang=voice_id, speech_rate=speech_rate, save_to_file=save_to_file):
+    # Модель Silero загружается при первом обращении, если не была загружена заранее
+    if speak_text_silero(text, speaker, lang=voice_id, speech_rate=speech_rate, save_to_file=save_to_file):
         return True
     
     # Если не получилось, используем pyttsx3 (только для воспроизведения, не для сохранения)
@@ -347,13 +574,25 @@ def check_vosk_model():
         return False
     return True
 
+def preload_vosk_model():
+    """Загружает модель Vosk заранее, чтобы первый голосовой запрос не ждал ее загрузки"""
+    if not check_vosk_model():
+        return False
+    try:
+        get_vosk_model(VOSK_MODEL_PATH)
+        print("Модель распознавания речи Vosk загружена")
+        return True
+    except Exception as e:
+        print(f"Ошибка предзагрузки модели Vosk: {e}")
+        return False
+
 def recognize_speech():
     """Распознавание речи с микрофона"""
     if not check_vosk_model():
         raise Exception("Модель распознавания речи не найдена")
     
     try:
-        model = Model(VOSK_MODEL_PATH)
+        model = get_vosk_model(VOSK_MODEL_PATH)
         q = queue.Queue()
 
         def callback(indata, frames, time, status):
@@ -374,241 +613,171 @@ def recognize_speech():
         print(f"Ошибка при распознавании речи: {e}")
         return ""
 
-def recognize_speech_from_file(file_path):
-    """Распознавание речи из аудиофайла используя ту же логику что и recognize_speech"""
+def _recognize_pcm(pcm, sample_rate=SAMPLE_RATE):
+    """Распознает PCM 16 бит моно и возвращает объединенный текст всех фраз"""
+    rec = create_vosk_recognizer(VOSK_MODEL_PATH, sample_rate)
+
+    results = []
+    chunk_size = sample_rate * 2 // 10  # 0.1 секунды
+
+    for i in range(0, len(pcm), chunk_size):
+        if rec.AcceptWaveform(pcm[i:i + chunk_size]):
+            text = json.loads(rec.Result()).get("text", "")
+            if text.strip():
+                results.append(text.strip())
+                print(f"Частичный результат: {text}")
+
+    final_text = json.loads(rec.FinalResult()).get("text", "")
+    if final_text.strip():
+        results.append(final_text.strip())
+        print(f"Финальный результат: {final_text}")
+
+    return " ".join(results).strip()
+
+def recognize_speech_from_bytes(data):
+    """
+    Распознавание речи из аудио в памяти (WAV, WebM, OGG и др.)
+
+    Аудио декодируется из буфера в 16 кГц моно без временных файлов
+    (передискретизация - полифазным фильтром) и сразу подается в распознаватель.
+    """
     if not check_vosk_model():
         raise Exception("Модель распознавания речи не найдена")
-    
+
     try:
-        import wave
-        import numpy as np
-        print(f"Обрабатываю файл: {file_path}")
-        
-        # Проверяем существование файла
-        if not os.path.exists(file_path):
-            raise Exception(f"Файл не найден: {file_path}")
-        
-        # Сначала проверим размер файла
-        file_size = os.path.getsize(file_path)
-        print(f"Размер файла: {file_size} байт")
-        
-        if file_size < 10:  # Минимальный размер любого аудиофайла
-            print("Файл слишком мал для содержания аудио")
+        print(f"Обрабатываю аудио из памяти: {len(data)} байт")
+        if len(data) < 10:  # Минимальный размер любого аудиофайла
+            print("Слишком мало данных для содержания аудио")
             return ""
-        
-        # Определяем формат файла и конвертируем в WAV если нужно
-        converted_file_path = None
+
         try:
-            # Пытаемся определить формат по содержимому
-            with open(file_path, 'rb') as f:
-                header = f.read(12)
-            
-            is_wav = header.startswith(b'RIFF') and b'WAVE' in header
-            is_webm = header.startswith(b'\x1a\x45\xdf\xa3')  # WebM signature
-            
-            if not is_wav:
-                print(f"Файл не в формате WAV, конвертирую...")
-        
-                
-                try:
-                    from pydub import AudioSegment
-                    
-                    # Загружаем аудио в любом формате
-                    if is_webm:
-                        print("Обнаружен WebM формат")
-                        audio = AudioSegment.from_file(file_path, format="webm")
-                    else:
-                        print("Пытаюсь загрузить в автоматическом режиме")
-                        audio = AudioSegment.from_file(file_path)
-                    
-                    # Конвертируем в нужный формат
-                    audio = audio.set_frame_rate(SAMPLE_RATE)  # 16kHz
-                    audio = audio.set_channels(1)  # моно
-                    audio = audio.set_sample_width(2)  # 16-bit
-                    
-                    # Сохраняем как WAV
-                    import tempfile
-                    temp_dir = tempfile.gettempdir()
-                    converted_file_path = os.path.join(temp_dir, f"converted_{os.path.basename(file_path)}.wav")
-                    audio.export(converted_file_path, format="wav")
-                    
-            
-                    file_path = converted_file_path
-                    
-                except ImportError:
-                    print("pydub не установлен, не могу конвертировать из WebM")
-                    return ""
-                except Exception as e:
-                    print(f"Ошибка конвертации: {e}")
-                    # Продолжаем с исходным файлом
-                    pass
+            samples = DecodedAudio.from_bytes(data).samples
+            pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
         except Exception as e:
-            print(f"Ошибка при определении формата: {e}")
-            # Продолжаем с исходным файлом
-        
-        # Пытаемся открыть как WAV файл
-        try:
-            with wave.open(file_path, 'rb') as wf:
-                # Получаем параметры файла
-                channels = wf.getnchannels()
-                sampwidth = wf.getsampwidth()
-                framerate = wf.getframerate()
-                nframes = wf.getnframes()
-                
-        
-                
-                if nframes == 0:
-                    print("Аудиофайл не содержит данных")
-                    return ""
-                
-                # Читаем все аудиоданные
-                frames = wf.readframes(nframes)
-                
-                if len(frames) == 0:
-                    print("Не удалось прочитать аудиоданные")
-                    return ""
-                
-                # Конвертируем в numpy массив для обработки
-                if sampwidth == 1:
-                    dtype = np.uint8
-                elif sampwidth == 2:
-                    dtype = np.int16
-                elif sampwidth == 4:
-                    dtype = np.int32
-                else:
-                    dtype = np.int16
-                
-                audio_array = np.frombuffer(frames, dtype=dtype)
-                
-                if len(audio_array) == 0:
-                    print("Пустой аудио массив")
-                    return ""
-                
-                # Конвертируем в моно если нужно
-                if channels == 2:
-                    print("Конвертирую стерео в моно")
-                    if len(audio_array) % 2 != 0:
-                        # Обрезаем до четного числа для правильного reshape
-                        audio_array = audio_array[:-1]
-                    audio_array = audio_array.reshape(-1, 2)
-                    audio_array = np.mean(audio_array, axis=1).astype(dtype)
-                    channels = 1
-                
-                # Конвертируем в 16-бит если нужно
-                if sampwidth != 2:
-                    print(f"Конвертирую разрядность с {sampwidth*8} на 16 бит")
-                    if sampwidth == 1:
-                        # 8-бит в 16-бит (unsigned to signed)
-                        audio_array = ((audio_array.astype(np.float32) - 128) * 256).astype(np.int16)
-                    elif sampwidth == 4:
-                        # 32-бит в 16-бит
-                        audio_array = (audio_array // 65536).astype(np.int16)
-                    sampwidth = 2
-                
-                # Ресэмплинг если нужно (простой decimation/interpolation)
-                if framerate != SAMPLE_RATE:
-                    print(f"Конвертирую частоту с {framerate} на {SAMPLE_RATE}")
-                    if len(audio_array) > 1:
-                        # Простой ресэмплинг
-                        ratio = SAMPLE_RATE / framerate
-                        new_length = max(1, int(len(audio_array) * ratio))
-                        indices = np.linspace(0, len(audio_array) - 1, new_length)
-                        audio_array = np.interp(indices, np.arange(len(audio_array)), audio_array.astype(np.float32)).astype(np.int16)
-                        framerate = SAMPLE_RATE
-                
-                # Конвертируем обратно в байты
-                frames = audio_array.tobytes()
-                
-        
-        
-        except (wave.Error, EOFError, Exception) as e:
-            print(f"Ошибка чтения WAV файла: {e}")
-            print("Попытка чтения как raw аудио...")
-            
-            # Попытаемся обработать как raw аудио
-            try:
-                with open(file_path, 'rb') as f:
-                    raw_data = f.read()
-                    
-                if len(raw_data) < 4:
-                    print("Слишком мало данных в файле")
-                    return ""
-                
-                # Попробуем интерпретировать как 16-бит аудио
-                # Убираем возможный заголовок
-                if raw_data.startswith(b'RIFF'):
-                    # Пропускаем WAV заголовок (обычно 44 байта)
-                    header_size = 44
-                    if len(raw_data) > header_size:
-                        raw_data = raw_data[header_size:]
-                    else:
-                        print("Файл содержит только заголовок")
-                        return ""
-                
-                # Преобразуем в 16-битные сэмплы
-                if len(raw_data) % 2 != 0:
-                    raw_data = raw_data[:-1]  # Убираем лишний байт
-                
-                frames = raw_data
-                framerate = SAMPLE_RATE
-                sampwidth = 2
-                channels = 1
-                
-        
-                
-            except Exception as e2:
-                print(f"Ошибка чтения raw аудио: {e2}")
-                return ""
-        
-        # Инициализируем модель распознавания
-        model = Model(VOSK_MODEL_PATH)
-        rec = KaldiRecognizer(model, framerate)
-        
+            print(f"Ошибка декодирования аудио: {e}")
+            print("Попытка чтения как raw аудио 16 бит...")
+            # Пропускаем возможный WAV заголовок (обычно 44 байта)
+            pcm = data[44:] if data.startswith(b'RIFF') else data
+            pcm = pcm[:len(pcm) - len(pcm) % 2]
+
+        if not pcm:
+            print("Аудио не содержит данных")
+            return ""
+
         print("Начинаю распознавание...")
-        
-        # Обрабатываем аудио порциями
-        results = []
-        chunk_size = framerate * sampwidth * channels // 10  # 0.1 секунды
-        
-        for i in range(0, len(frames), chunk_size):
-            chunk = frames[i:i + chunk_size]
-            if len(chunk) == 0:
-                break
-                
-            if rec.AcceptWaveform(chunk):
-                result = json.loads(rec.Result())
-                text = result.get("text", "")
-                if text.strip():
-                    results.append(text.strip())
-                    print(f"Частичный результат: {text}")
-        
-        # Получаем финальный результат
-        final_result = json.loads(rec.FinalResult())
-        final_text = final_result.get("text", "")
-        if final_text.strip():
-            results.append(final_text.strip())
-            print(f"Финальный результат: {final_text}")
-        
-        # Объединяем все результаты
-        full_text = " ".join(results).strip()
+        return _recognize_pcm(pcm)
 
-        
-        return full_text
-        
     except Exception as e:
-        print(f"Ошибка при распознавании речи из файла: {e}")
+        print(f"Ошибка при распознавании речи: {e}")
         import traceback
         traceback.print_exc()
         return ""  # Возвращаем пустую строку вместо исключения
-    finally:
-        # Очищаем временный файл если он был создан
-        if converted_file_path and os.path.exists(converted_file_path):
-            try:
-                os.remove(converted_file_path)
-                print(f"Удален временный файл: {converted_file_path}")
-            except Exception as e:
-                print(f"Не удалось удалить временный файл: {e}")
-        pass
+
+def recognize_speech_from_file(file_path):
+    """Распознавание речи из аудиофайла используя ту же логику что и recognize_speech"""
+    if not check_vosk_model():
+        raise Exception("Модель распознавания речи не найдена")
+
+    print(f"Обрабатываю файл: {file_path}")
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        print(f"Ошибка чтения файла {file_path}: {e}")
+        return ""
+
+    return recognize_speech_from_bytes(data)
+
+class StreamingRecognizer:
+    """
+    Потоковое распознавание речи для одного WebSocket соединения
+
+    Держит один KaldiRecognizer на все время соединения и принимает аудио
+    кадрами по мере поступления. Конец фразы определяет эндпоинтинг Vosk
+    (пауза после речи), после чего возвращается итоговый результат.
+
+    Форматы кадров:
+        pcm_s16le - сырой PCM 16 бит моно с частотой sample_rate
+        opus - отдельные Opus пакеты (декодируются через PyAV, если он установлен)
+    """
+
+    AUDIO_FORMATS = ("pcm_s16le", "opus")
+
+    def __init__(self, sample_rate=SAMPLE_RATE, audio_format="pcm_s16le", endpoint_silence=None):
+        if audio_format not in self.AUDIO_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат аудио: {audio_format}")
+
+        self.audio_format = audio_format
+        self.sample_rate = SAMPLE_RATE if audio_format == "opus" else int(sample_rate)
+        if not check_vosk_model():
+            raise Exception("Модель распознавания речи не найдена")
+        self.recognizer = create_vosk_recognizer(VOSK_MODEL_PATH, self.sample_rate, words=True)
+        self.last_partial = ""
+
+        # Длительность паузы, после которой фраза считается законченной (vosk >= 0.3.45)
+        if endpoint_silence is not None and hasattr(self.recognizer, "SetEndpointerDelays"):
+            self.recognizer.SetEndpointerDelays(5.0, float(endpoint_silence), 30.0)
+
+        self._opus_decoder = None
+        self._opus_resampler = None
+        if audio_format == "opus":
+            self._init_opus_decoder()
+
+    def _init_opus_decoder(self):
+        """Декодер Opus пакетов в PCM 16 кГц моно"""
+        try:
+            import av
+        except ImportError:
+            raise ValueError("Для формата opus требуется PyAV (pip install av)")
+        self._opus_decoder = av.CodecContext.create("opus", "r")
+        self._opus_decoder.sample_rate = 48000
+        self._opus_resampler = av.AudioResampler(format="s16", layout="mono", rate=self.sample_rate)
+
+    def _to_pcm(self, data):
+        """Переводит кадр клиента в PCM s16le"""
+        if self._opus_decoder is None:
+            return data
+
+        import av
+        pcm = bytearray()
+        for frame in self._opus_decoder.decode(av.packet.Packet(data)):
+            for resampled in self._opus_resampler.resample(frame):
+                pcm.extend(resampled.to_ndarray().tobytes())
+        return bytes(pcm)
+
+    def accept(self, data):
+        """
+        Подает очередной кадр аудио в распознаватель
+
+        Returns:
+            Список событий: {"type": "partial", "text": ...} при изменении гипотезы
+            и {"type": "result", "text": ...} при завершении фразы
+        """
+        pcm = self._to_pcm(data)
+        if not pcm:
+            return []
+
+        if self.recognizer.AcceptWaveform(pcm):
+            self.last_partial = ""
+            text = json.loads(self.recognizer.Result()).get("text", "").strip()
+            return [{"type": "result", "text": text}] if text else []
+
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "").strip()
+        if partial and partial != self.last_partial:
+            self.last_partial = partial
+            return [{"type": "partial", "text": partial}]
+        return []
+
+    def finish(self):
+        """Завершает текущую фразу (клиент прекратил отправку аудио)"""
+        self.last_partial = ""
+        text = json.loads(self.recognizer.FinalResult()).get("text", "").strip()
+        return [{"type": "result", "text": text}] if text else []
+
+    def reset(self):
+        """Сбрасывает незавершенную фразу"""
+        self.last_partial = ""
+        self.recognizer.Reset()
 
 def run_voice():
     """Запуск голосового интерфейса в консоли"""
@@ -642,5 +811,6 @@ def run_voice():
     except KeyboardInterrupt:
         print("\nГолосовой режим завершён.")
 
-# Инициализируем TTS при импорте модуля
-init_tts() 
\ No newline at end of file
+# Резервный TTS инициализируем при импорте; модели Silero загружает preload_tts
+# (сервер вызывает его в фоне при старте, иначе они загрузятся при первом синтезе)
+init_tts(preload=False) 
\ No newline at end of file
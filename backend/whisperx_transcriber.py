@@ -30,8 +30,16 @@ except ImportError:
     WHISPERX_AVAILABLE = False
 import gc
 import logging
+import threading
 import traceback
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from backend.decoded_audio import DecodedAudio
+from backend.model_registry import diarization_models, alignment_models
+from backend.speaker_assignment import SpeakerIntervals, assign_speakers
+from backend.transcript_export import segments_from_result
+from backend.torch_threads import torch_threads
+from backend.vad import detect_speech_regions, extract_speech, remap_segments, group_regions, SpeechTimeline
 
 # Настройка предупреждений и совместимости
 warnings.filterwarnings("ignore", category=UserWarning, module="pytorch_lightning")
@@ -54,6 +62,7 @@ LOCAL_DIARIZATION_AVAILABLE = True
 # Импортируем пути к локальным моделям
 try:
     from .config.config import WHISPERX_MODELS_DIR, DIARIZE_MODELS_DIR, WHISPERX_BASE_MODEL, DIARIZE_MODEL
+    from .config.config import DECODED_AUDIO_CACHE_DIR, DECODED_AUDIO_CACHE_MAX_MB
     LOCAL_MODELS_AVAILABLE = True
 except ImportError:
     # Если файл с путями не найден, используем дефолтные
@@ -61,9 +70,34 @@ except ImportError:
     DIARIZE_MODELS_DIR = "diarize_models"
     WHISPERX_BASE_MODEL = "medium"
     DIARIZE_MODEL = "pyannote/speaker-diarization-3.1"
+    DECODED_AUDIO_CACHE_DIR = None
+    DECODED_AUDIO_CACHE_MAX_MB = 2000
     LOCAL_MODELS_AVAILABLE = False
 
+# Профили производительности WhisperX на CPU (faster-whisper / CTranslate2):
+# compute_type - квантизация, cpu_threads - потоков декодирования,
+# num_workers - параллельных загрузчиков кусков аудио в пайплайне.
+# Самый быстрый профиль для машины подбирает calibrate_cpu_profiles
+_CPU_CORES = os.cpu_count() or 4
+CPU_COMPUTE_PROFILES = {
+    "int8": {"compute_type": "int8", "cpu_threads": _CPU_CORES, "num_workers": 1},
+    "int8_workers2": {"compute_type": "int8", "cpu_threads": max(1, _CPU_CORES // 2), "num_workers": 2},
+    "int8_float32": {"compute_type": "int8_float32", "cpu_threads": _CPU_CORES, "num_workers": 1},
+    "float32": {"compute_type": "float32", "cpu_threads": _CPU_CORES, "num_workers": 1},
+}
+DEFAULT_CPU_PROFILE = "int8"
+
+# Типы вычислений WhisperX на CPU (из профилей) и GPU
+CPU_COMPUTE_TYPES = tuple(dict.fromkeys(profile["compute_type"] for profile in CPU_COMPUTE_PROFILES.values()))
+GPU_COMPUTE_TYPES = ("float16", "int8_float16", "int8", "float32")
+
 class WhisperXTranscriber:
+    # Веса локального пайплайна диаризации в <diarize_models>/models
+    DIARIZATION_MODEL_FILES = (
+        "pyannote_model_segmentation-3.0.bin",
+        "pyannote_model_wespeaker-voxceleb-resnet34-LM.bin",
+    )
+    
     def __init__(self):
         # Настройка логирования
         self.logger = logging.getLogger(f"{__name__}.WhisperXTranscriber")
@@ -122,6 +156,31 @@ class WhisperXTranscriber:
         # Обратный вызов для обновления прогресса
         self.progress_callback = None
         
+        # Отсев тишины перед распознаванием (VAD); временные метки пересчитываются
+        self.use_vad = True
+        
+        # Выравнивание слов (whisperx.align) - точные временные метки слов для диаризации
+        self.use_alignment = False
+        
+        # Папка кэша декодированного аудио (None - без кэша, массив только в памяти)
+        self.audio_cache_dir = DECODED_AUDIO_CACHE_DIR
+        self.audio_cache_max_bytes = DECODED_AUDIO_CACHE_MAX_MB * 1024 * 1024
+        
+        # Пакетная транскрибация нескольких файлов: куски речи разных файлов
+        # собираются в общие батчи модели
+        self.batch_size = 8
+        self.batch_chunk_duration = 20  # Желаемая длительность куска (сек), не больше 30
+        
+        # Диаризация параллельно с ASR (на CPU с отдельным бюджетом потоков torch)
+        self.concurrent_diarization = True
+        self._diarize_lock = threading.Lock()
+        self.diarization_threads = max(1, (os.cpu_count() or 4) // 3)
+        
+        # Профиль квантизации и потоков для CPU (см. CPU_COMPUTE_PROFILES)
+        self.cpu_profile = DEFAULT_CPU_PROFILE
+        self.cpu_threads = _CPU_CORES
+        self.num_workers = 1
+        
         # Настройки WhisperX
         self.model_size = WHISPERX_BASE_MODEL
         self.logger.debug(f"Размер модели WhisperX: {self.model_size}")
@@ -145,8 +204,7 @@ class WhisperXTranscriber:
                         self.logger.warning("Переключаемся на CPU из-за проблем с cudnn")
                         del test_tensor
                         torch.cuda.empty_cache()
-                        self.device = "cpu"
-                        self.compute_type = "float32"
+                        self._use_cpu()
                         self.logger.info("Используем CPU из-за проблем с cudnn")
                         return
                     else:
@@ -160,12 +218,10 @@ class WhisperXTranscriber:
                 self.logger.info("CUDA доступна, используем GPU")
             except Exception as cuda_error:
                 self.logger.warning(f"CUDA недоступна из-за ошибки: {cuda_error}")
-                self.device = "cpu"
-                self.compute_type = "float32"
+                self._use_cpu()
                 self.logger.info("Переключились на CPU из-за проблем с CUDA")
         else:
-            self.device = "cpu"
-            self.compute_type = "float32"
+            self._use_cpu()
             self.logger.info("CUDA недоступна, используем CPU")
         
         # Кэш для модели диаризации
@@ -189,10 +245,7 @@ class WhisperXTranscriber:
             
             # Проверяем наличие .bin файлов
             models_dir = os.path.join(self.diarize_model_path, "models")
-            required_files = [
-                "pyannote_model_segmentation-3.0.bin",
-                "pyannote_model_wespeaker-voxceleb-resnet34-LM.bin"
-            ]
+            required_files = self.DIARIZATION_MODEL_FILES
             
             print(f"   🔍 Проверяем наличие .bin файлов в {models_dir}...")
             
@@ -216,6 +269,126 @@ class WhisperXTranscriber:
             print(f"Ошибка загрузки пайплайна: {e}")
             return None
 
+    def diarization_enabled(self) -> bool:
+        """Будет ли диаризация выполняться на самом деле
+        
+        Кроме флага LOCAL_DIARIZATION_AVAILABLE нужны локальный конфиг и
+        веса пайплайна - без них транскрибация идет без спикеров.
+        """
+        if not LOCAL_DIARIZATION_AVAILABLE:
+            return False
+        if getattr(self, '_cached_diarize_model', None):
+            return True
+        models_dir = os.path.join(self.diarize_model_path, "models")
+        return os.path.exists(self._diarization_key()) and all(
+            os.path.exists(os.path.join(models_dir, name)) for name in self.DIARIZATION_MODEL_FILES
+        )
+
+    def _diarization_key(self) -> str:
+        """Ключ пайплайна диаризации в реестре моделей процесса"""
+        return os.path.join(self.diarize_model_path, "pyannote_diarization_config.yaml")
+
+    def _acquire_diarization_pipeline(self):
+        """Берет пайплайн диаризации из реестра процесса (загружает при первом обращении)
+        
+        Экземпляр держит одну ссылку на пайплайн до
+        release_diarization_pipeline(), поэтому пересоздание транскрайбера при
+        переключении движка не приводит к повторной загрузке.
+        """
+        with self._diarize_lock:
+            if getattr(self, '_cached_diarize_model', None):
+                return self._cached_diarize_model
+            
+            key = self._diarization_key()
+            pipeline = diarization_models.acquire(key, self._load_local_diarization_pipeline)
+            if pipeline is None:
+                return None
+            
+            self._cached_diarize_model = pipeline
+            return pipeline
+
+    def release_diarization_pipeline(self):
+        """Отдает ссылку экземпляра на пайплайн диаризации в реестре процесса"""
+        with self._diarize_lock:
+            if not getattr(self, '_cached_diarize_model', None):
+                return
+            key = self._diarization_key()
+            diarization_models.release(key)
+            self._cached_diarize_model = None
+
+    def _start_concurrent_diarization(self, audio: DecodedAudio):
+        """Запускает диаризацию в отдельном потоке параллельно с ASR
+        
+        На CPU ядра делятся между стадиями: pyannote получает
+        diarization_threads потоков torch, ASR - оставшиеся потоки CTranslate2.
+        
+        Returns:
+            (future с результатом диаризации, число потоков для ASR или None)
+        """
+        asr_threads = None
+        diarization_threads = None
+        if self.device == "cpu":
+            diarization_threads = min(self.diarization_threads, max(1, self.cpu_threads - 1))
+            asr_threads = max(1, self.cpu_threads - diarization_threads)
+            print(f"Параллельная диаризация: {diarization_threads} потоков, ASR: {asr_threads} потоков")
+        
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diarization")
+        future = executor.submit(self._run_diarization, audio, diarization_threads)
+        # Поток завершится сам после выполнения задачи
+        executor.shutdown(wait=False)
+        return future, asr_threads
+
+    def _run_diarization(self, audio: DecodedAudio, threads: Optional[int] = None):
+        """Выполняет диаризацию уже декодированного аудио; возвращает сегменты или None
+        
+        threads - бюджет потоков torch на время диаризации (None - без ограничения),
+        после нее действует прежнее значение.
+        """
+        try:
+            print("Загрузка модели диаризации...")
+            diarize_model = self._acquire_diarization_pipeline()
+            if not diarize_model:
+                return None
+            
+            # Волна передается в pyannote напрямую - видео не нужно отдельно извлекать в WAV
+            print("Выполняю диаризацию...")
+            with torch_threads(threads):
+                return diarize_model(audio.as_pyannote())
+        except Exception as diarize_error:
+            print(f"Ошибка диаризации: {diarize_error}")
+            return None
+    
+    def _abandon_diarization(self, future):
+        """Отменяет параллельную диаризацию после ошибки ASR, а уже начатую - дожидается"""
+        if future is None or future.cancel():
+            return
+        print("Ожидаем завершения параллельной диаризации после ошибки...")
+        try:
+            future.result()
+        except Exception:
+            pass
+
+    def warmup_diarization(self) -> bool:
+        """Загружает пайплайн диаризации заранее и прогоняет его на короткой тишине
+        
+        Вызывается при старте сервера, чтобы первый запрос с диаризацией
+        не платил за построение пайплайна и первую инициализацию весов.
+        """
+        pipeline = self._acquire_diarization_pipeline()
+        if pipeline is None:
+            self.logger.warning("Прогрев диаризации пропущен: пайплайн не загружен")
+            return False
+        
+        try:
+            waveform = torch.zeros(1, self.sample_rate * 2)
+            pipeline({"waveform": waveform, "sample_rate": self.sample_rate})
+        except Exception as warmup_error:
+            # Пайплайн загружен, ошибка прогона на тишине не критична
+            self.logger.debug(f"Пробный прогон диаризации: {warmup_error}")
+        
+        self.logger.info("Пайплайн диаризации прогрет")
+        return True
+
     def _check_ffmpeg_availability(self) -> bool:
         """Проверяет доступность FFmpeg"""
         try:
@@ -235,8 +408,25 @@ class WhisperXTranscriber:
 
     def transcribe_audio_file(self, audio_path: str) -> Tuple[bool, str]:
         """Транскрибирует аудио файл с диаризацией"""
+        success, transcript, _ = self.transcribe_audio_file_detailed(audio_path)
+        return success, transcript
+
+    def transcribe_audio_file_detailed(self, audio_path: str) -> Tuple[bool, str, Dict]:
+        """
+        Транскрибирует аудио файл с диаризацией
+
+        Сегменты и слова возвращаются вместе с текстом, а не хранятся в
+        экземпляре: один транскрайбер обслуживает параллельные запросы.
+
+        Returns:
+            (успех, текст или ошибка, {"segments": [...], "words": [...],
+             "diarization": удалось ли разметить спикеров})
+        """
+        final_result = None
+        diarized = False
         try:
             print(f"=== Начало транскрипции аудио файла: {audio_path} ===")
+            diarize_future = None
             print(f"LOCAL_DIARIZATION_AVAILABLE: {LOCAL_DIARIZATION_AVAILABLE}")
             
             # Проверяем существование файла
@@ -245,7 +435,7 @@ class WhisperXTranscriber:
                 print(f"Текущая директория: {os.getcwd()}")
                 print(f"Абсолютный путь: {os.path.abspath(audio_path)}")
                 print(f"Содержимое директории: {os.listdir(os.path.dirname(audio_path) if os.path.dirname(audio_path) else '.')}")
-                return False, f"Аудио файл не найден: {audio_path}"
+                return False, f"Аудио файл не найден: {audio_path}", self._result_details(None)
             
             # Проверяем размер файла
             file_size = os.path.getsize(audio_path)
@@ -253,7 +443,11 @@ class WhisperXTranscriber:
             
             if file_size == 0:
                 print(f"Файл пустой: {audio_path}")
-                return False, f"Аудио файл пустой: {audio_path}"
+                return False, f"Аудио файл пустой: {audio_path}", self._result_details(None)
+            
+            # Декодируем файл один раз: массив используется и ASR, и диаризацией
+            audio = self._decode_audio(audio_path)
+            print(f"Аудио декодировано: {audio.duration:.1f} сек")
             
             self._update_progress(10)
             
@@ -274,15 +468,14 @@ class WhisperXTranscriber:
             except Exception as compat_error:
                 print(f"Предупреждение при настройке совместимости: {compat_error}")
             
+            # Диаризация не зависит от результата ASR - запускаем ее сразу в отдельном потоке
+            asr_threads = None
+            if LOCAL_DIARIZATION_AVAILABLE and self.concurrent_diarization:
+                diarize_future, asr_threads = self._start_concurrent_diarization(audio)
+            
             # Загружаем модель WhisperX
             print("Загрузка модели WhisperX...")
-            model = whisperx.load_model(
-                self.model_size, 
-                self.device, 
-                compute_type=self.compute_type,
-                language=self.language,
-                download_root=self.whisper_model_path  # Используем локальную папку
-            )
+            model = self._load_asr_model(threads=asr_threads)
             
             self._update_progress(50)
             
@@ -290,7 +483,7 @@ class WhisperXTranscriber:
             print("Выполняю транскрипцию...")
             try:
                 print("Пробуем стандартный способ транскрибации...")
-                result = model.transcribe(audio_path)
+                result = self._transcribe_speech_only(model, audio)
                 print("Стандартная транскрибация успешна")
                 
             except Exception as transcribe_error:
@@ -300,22 +493,15 @@ class WhisperXTranscriber:
                 if "cudnn_ops_infer64_8.dll" in str(transcribe_error):
                     print("Обнаружена ошибка cudnn, переключаемся на CPU...")
                     # Переключаемся на CPU
-                    self.device = "cpu"
-                    self.compute_type = "float32"
+                    self._use_cpu()
                     
                     # Перезагружаем модель на CPU
                     print("Перезагружаем модель на CPU...")
-                    model = whisperx.load_model(
-                        self.model_size, 
-                        "cpu", 
-                        compute_type="float32",
-                        language=self.language,
-                        download_root=self.whisper_model_path
-                    )
+                    model = self._load_asr_model(threads=asr_threads)
                     
                     # Пробуем транскрибацию на CPU
                     try:
-                        result = model.transcribe(audio_path)
+                        result = self._transcribe_speech_only(model, audio)
                         print("Транскрибация на CPU успешна")
                     except Exception as cpu_error:
                         print(f"Транскрибация на CPU не удалась: {cpu_error}")
@@ -323,11 +509,11 @@ class WhisperXTranscriber:
                 else:
                     # Пробуем через torchaudio как fallback
                     try:
-                        print("Пробуем через torchaudio...")
-                        import torchaudio
+                        print("Пробуем через тензор...")
                         
-                        # Загружаем аудио как тензор
-                        waveform, sample_rate = torchaudio.load(audio_path)
+                        # Берем уже декодированное аудио как тензор
+                        waveform = torch.from_numpy(audio.as_array()).unsqueeze(0)
+                        sample_rate = audio.sample_rate
                         print(f"Аудио загружено: форма {waveform.shape}, частота {sample_rate}")
                         
                         # Конвертируем в моно если нужно
@@ -360,83 +546,34 @@ class WhisperXTranscriber:
                         print("Транскрибация через тензор успешна")
                         
                     except Exception as tensor_error:
-                        print(f"Транскрибация через torchaudio не удалась: {tensor_error}")
+                        print(f"Транскрибация через тензор не удалась: {tensor_error}")
                         raise Exception(f"Не удалось транскрибировать аудио: {transcribe_error}")
             
+            if self.use_alignment:
+                result = self._align_result(result, audio)
+            final_result = result
+            
             self._update_progress(70)
             
             # Диаризация с использованием локального пайплайна
             try:
-                print("Загрузка модели диаризации...")
                 print(f"LOCAL_DIARIZATION_AVAILABLE: {LOCAL_DIARIZATION_AVAILABLE}")
                 
                 # Пробуем использовать локальный пайплайн диаризации
                 if LOCAL_DIARIZATION_AVAILABLE:
-                    print("   Пытаемся загрузить локальный пайплайн диаризации...")
-                    
-                    # Сначала пробуем использовать предзагруженную модель
-                    if hasattr(self, '_cached_diarize_model') and self._cached_diarize_model:
-                        print("Используем предзагруженную модель диаризации")
-                        diarize_model = self._cached_diarize_model
+                    if diarize_future:
+                        # Диаризация шла параллельно с ASR - дожидаемся ее результата
+                        print("Ожидаем завершения параллельной диаризации...")
+                        diarize_segments = diarize_future.result()
                     else:
-                        # Загружаем локальный пайплайн
-                        print("Загружаем локальный пайплайн диаризации...")
-                        try:
-                            diarize_model = self._load_local_diarization_pipeline()
-                            
-                            if diarize_model:
-                                print("Локальный пайплайн диаризации загружен")
-                                # Кэшируем модель для следующего использования
-                                self._cached_diarize_model = diarize_model
-                            else:
-                                print("Не удалось загрузить локальный пайплайн диаризации")
-                                print("Используем простую транскрипцию без диаризации")
-                                transcript = self._format_simple_transcript(result)
-                                return True, transcript
-                        except Exception as diarize_load_error:
-                            print(f"Ошибка загрузки диаризации: {diarize_load_error}")
-                            print("Используем простую транскрипцию без диаризации")
-                            transcript = self._format_simple_transcript(result)
-                            return True, transcript
+                        self._update_progress(80)
+                        diarize_segments = self._run_diarization(audio)
                     
-                    self._update_progress(80)
-                    
-                    # Выполняем диаризацию
-                    print("Выполняю диаризацию...")
-                    
-                    # Проверяем, является ли файл видео - если да, извлекаем аудио
-                    if audio_path.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.webm')):
-                        print("Обнаружен видео файл, извлекаем аудио для диаризации...")
-                        try:
-                            import tempfile
-                            temp_dir = tempfile.gettempdir()
-                            audio_for_diarization = os.path.join(temp_dir, f"audio_for_diarization_{os.path.basename(audio_path)}.wav")
-                            
-                            # Используем ffmpeg для извлечения аудио
-                            if self._check_ffmpeg_availability():
-                                command = [
-                                    "ffmpeg", "-y", "-i", audio_path,
-                                    "-ar", "16000", "-ac", "1", "-f", "wav",
-                                    audio_for_diarization
-                                ]
-                                subprocess.run(command, check=True, capture_output=True)
-                                print(f"Аудио извлечено: {audio_for_diarization}")
-                                
-                                # Выполняем диаризацию на извлеченном аудио
-                                diarize_segments = diarize_model(audio_for_diarization)
-                                
-                                # Удаляем временный аудио файл
-                                if os.path.exists(audio_for_diarization):
-                                    os.remove(audio_for_diarization)
-                            else:
-                                print("FFmpeg недоступен, пропускаем диаризацию")
-                                diarize_segments = None
-                        except Exception as extract_error:
-                            print(f"Ошибка извлечения аудио: {extract_error}")
-                            diarize_segments = None
-                    else:
-                        # Для аудио файлов выполняем диаризацию напрямую
-                        diarize_segments = diarize_model(audio_path)
+                    if diarize_segments is None and not getattr(self, '_cached_diarize_model', None):
+                        print("Не удалось загрузить локальный пайплайн диаризации")
+                        print("Используем простую транскрипцию без диаризации")
+                        transcript = self._format_simple_transcript(result)
+                        return True, transcript, self._result_details(final_result, diarized)
                     
                     # Диагностика результатов диаризации
                     print(f"Результат диаризации: {type(diarize_segments)}")
@@ -490,8 +627,10 @@ class WhisperXTranscriber:
                                 
                                 if has_speakers:
                                     result = result_with_speakers
+                                    final_result = result
                                     # Форматируем результат с диаризацией
                                     transcript = self._format_transcript_with_speakers(result)
+                                    diarized = True
                                     print("Диаризация завершена успешно")
                                 else:
                                     print("Диаризация не добавила информацию о спикерах")
@@ -500,9 +639,11 @@ class WhisperXTranscriber:
                                     # Пробуем альтернативный способ - ручное объединение
                                     manual_result = self._manual_assign_speakers(diarize_segments, result)
                                     if manual_result:
+                                        final_result = manual_result
                                         print("Альтернативная диаризация успешна")
                                         # Форматируем результат в строку
                                         transcript = self._format_transcript_with_speakers(manual_result)
+                                        diarized = True
                                     else:
                                         print("Альтернативная диаризация не удалась, используем простую транскрипцию")
                                         transcript = self._format_simple_transcript(result)
@@ -517,8 +658,10 @@ class WhisperXTranscriber:
                             print("Пробуем альтернативный способ диаризации...")
                             manual_result = self._manual_assign_speakers(diarize_segments, result)
                             if manual_result:
+                                final_result = manual_result
                                 # Форматируем результат в строку
                                 transcript = self._format_transcript_with_speakers(manual_result)
+                                diarized = True
                             else:
                                 transcript = self._format_simple_transcript(result)
                     else:
@@ -534,42 +677,303 @@ class WhisperXTranscriber:
                 print(f"Ошибка диаризации: {diarize_error}")
                 print("Используем простую транскрипцию без диаризации")
                 transcript = self._format_simple_transcript(result)
+                diarized = False
             
             self._update_progress(100)
             
             # Очищаем память
             del model
-            if 'diarize_model' in locals():
-                del diarize_model
             gc.collect()
             if self.device == "cuda":
                 torch.cuda.empty_cache()
             
             print("Транскрипция завершена успешно")
-            return True, transcript
+            return True, transcript, self._result_details(final_result, diarized)
             
         except Exception as e:
             print(f"Ошибка транскрипции: {e}")
-            return False, f"Ошибка: {str(e)}"
+            # Результат диаризации больше никому не нужен
+            self._abandon_diarization(diarize_future)
+            return False, f"Ошибка: {str(e)}", self._result_details(None)
+
+    def _use_cpu(self, profile: Optional[str] = None):
+        """Переключает вычисления на CPU с параметрами профиля (по умолчанию - текущего)"""
+        profile = profile or self.cpu_profile
+        settings = CPU_COMPUTE_PROFILES[profile]
+        self.device = "cpu"
+        self.cpu_profile = profile
+        self.compute_type = settings["compute_type"]
+        self.cpu_threads = settings["cpu_threads"]
+        self.num_workers = settings["num_workers"]
+        self.logger.info(f"Профиль CPU: {profile} (compute_type={self.compute_type}, "
+                         f"потоков={self.cpu_threads}, workers={self.num_workers})")
+    
+    def _load_asr_model(self, threads: Optional[int] = None, compute_type: Optional[str] = None):
+        """Загружает модель WhisperX с текущими настройками устройства и языка
+        
+        threads переопределяет число потоков декодирования на CPU (например,
+        когда часть ядер отдана параллельной диаризации), compute_type - тип
+        вычислений (при калибровке).
+        """
+        kwargs = {
+            "compute_type": compute_type or self.compute_type,
+            "language": self.language,
+            "download_root": self.whisper_model_path  # Используем локальную папку
+        }
+        if self.device == "cpu":
+            kwargs["threads"] = threads or self.cpu_threads
+        
+        try:
+            return whisperx.load_model(self.model_size, self.device, **kwargs)
+        except TypeError:
+            # Старые версии WhisperX не принимают число потоков
+            kwargs.pop("threads", None)
+            return whisperx.load_model(self.model_size, self.device, **kwargs)
+    
+    def calibrate_cpu_profiles(self, reference_audio: str, max_duration: float = 30.0) -> Dict:
+        """Подбирает самый быстрый профиль CPU для этой машины
+        
+        Каждый профиль транскрибирует один и тот же отрывок reference_audio
+        (не длиннее max_duration секунд), измеряется коэффициент реального
+        времени (RTF = время обработки / длительность аудио). Настройки
+        экземпляра во время замеров не меняются; самый быстрый профиль
+        применяется в конце и возвращается вместе с замерами.
+        """
+        if self.device != "cpu":
+            raise RuntimeError("Калибровка доступна только на CPU")
+        
+        audio = DecodedAudio.from_file(reference_audio).as_array()[:int(max_duration * self.sample_rate)]
+        duration = len(audio) / self.sample_rate
+        if duration == 0:
+            raise ValueError(f"Эталонный файл пустой: {reference_audio}")
+        
+        measurements = {}
+        for profile, settings in CPU_COMPUTE_PROFILES.items():
+            try:
+                model = self._load_asr_model(threads=settings["cpu_threads"],
+                                             compute_type=settings["compute_type"])
+                
+                started = time.perf_counter()
+                model.transcribe(audio, batch_size=self.batch_size, num_workers=settings["num_workers"])
+                elapsed = time.perf_counter() - started
+                
+                measurements[profile] = round(elapsed / duration, 3)
+                self.logger.info(f"Калибровка {profile}: RTF={measurements[profile]}")
+                del model
+                gc.collect()
+            except Exception as profile_error:
+                self.logger.warning(f"Профиль {profile} не поддерживается: {profile_error}")
+        
+        if not measurements:
+            raise RuntimeError("Ни один профиль CPU не удалось проверить")
+        
+        best = min(measurements, key=measurements.get)
+        self._use_cpu(best)
+        return {
+            "best_profile": best,
+            "profile": dict(CPU_COMPUTE_PROFILES[best]),
+            "rtf": measurements,
+            "reference_duration": round(duration, 2)
+        }
+    
+    def transcribe_batch(self, audio_paths: List[str], batch_size: Optional[int] = None) -> List[Tuple[bool, str]]:
+        """Транскрибирует несколько файлов за одну загрузку модели
+        
+        Все файлы делятся VAD на куски речи до 30 секунд, куски разных файлов
+        идут в общие батчи модели по batch_size штук, а результаты
+        раскладываются обратно по файлам. Диаризация здесь не выполняется.
+        
+        Returns:
+            Список (успех, транскрипция или ошибка) в порядке audio_paths
+        """
+        batch_size = batch_size or self.batch_size
+        results: List[Tuple[bool, str]] = [(False, "Файл не обработан")] * len(audio_paths)
+        
+        try:
+            self._update_progress(5)
+            chunks = []
+            prepared = []
+            for file_index, audio_path in enumerate(audio_paths):
+                if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+                    results[file_index] = (False, f"Аудио файл не найден или пустой: {audio_path}")
+                    continue
+                try:
+                    chunks.extend(self._prepare_batch_chunks(file_index, audio_path))
+                    prepared.append(file_index)
+                except Exception as load_error:
+                    self.logger.error(f"Ошибка подготовки {audio_path}: {load_error}")
+                    results[file_index] = (False, f"Ошибка: {load_error}")
+            
+            self.logger.info(f"Пакетная транскрибация: {len(audio_paths)} файлов, "
+                             f"{len(chunks)} кусков речи, batch_size={batch_size}")
+            self._update_progress(30)
+            
+            model = self._load_asr_model()
+            self._update_progress(40)
+            
+            if model.tokenizer is None:
+                # Без заданного языка модель определяет его по каждому файлу отдельно
+                self.logger.warning("Язык не задан, файлы транскрибируются по отдельности")
+                segments_by_file = {}
+                for file_index in prepared:
+                    audio = self._decode_audio(audio_paths[file_index])
+                    result = self._transcribe_speech_only(model, audio)
+                    segments_by_file[file_index] = result.get("segments", [])
+            else:
+                segments_by_file = self._run_batched_chunks(model, chunks, batch_size)
+            
+            for file_index in prepared:
+                segments = segments_by_file.get(file_index, [])
+                if segments:
+                    transcript = self._format_simple_transcript({"segments": segments})
+                    results[file_index] = (True, transcript)
+                else:
+                    results[file_index] = (False, "Не удалось распознать речь в файле")
+            
+            del model
+            gc.collect()
+            if self.device == "cuda":
+                torch.cuda.empty_cache()
+            
+            self._update_progress(100)
+            return results
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка пакетной транскрибации: {e}")
+            self.logger.error(f"Traceback: {traceback.format_exc()}")
+            return [result if result[0] else (False, f"Ошибка: {str(e)}") for result in results]
+    
+    def _prepare_batch_chunks(self, file_index: int, audio_path: str) -> List[Dict]:
+        """Делит файл на куски речи для пакетной транскрибации"""
+        audio = self._decode_audio(audio_path).as_array()
+        if self.use_vad:
+            regions = detect_speech_regions(audio, self.sample_rate)
+        else:
+            regions = [(0, len(audio))] if len(audio) else []
+        
+        chunks = []
+        for group in group_regions(audio, regions, self.sample_rate, target_sec=self.batch_chunk_duration):
+            chunks.append({
+                "file": file_index,
+                "audio": np.concatenate([audio[start:end] for start, end in group]),
+                "timeline": SpeechTimeline.from_regions(group, self.sample_rate)
+            })
+        return chunks
+    
+    def _run_batched_chunks(self, model, chunks: List[Dict], batch_size: int) -> Dict[int, List[Dict]]:
+        """Прогоняет куски всех файлов через модель общими батчами
+        
+        Возвращает сегменты в формате WhisperX, сгруппированные по индексу файла.
+        """
+        def inputs():
+            for chunk in chunks:
+                yield {"inputs": chunk["audio"]}
+        
+        segments_by_file: Dict[int, List[Dict]] = {}
+        for index, output in enumerate(model(inputs(), batch_size=batch_size, num_workers=self.num_workers)):
+            text = output["text"]
+            if batch_size in (0, 1, None):
+                text = text[0]
+            
+            chunk = chunks[index]
+            timeline = chunk["timeline"]
+            segments_by_file.setdefault(chunk["file"], []).append({
+                "text": text,
+                "start": round(timeline.to_original(0.0), 3),
+                "end": round(timeline.to_original(timeline.compact_duration, is_end=True), 3)
+            })
+            self._update_progress(40 + int((index + 1) * 55 / len(chunks)))
+        return segments_by_file
+    
+    def _decode_audio(self, audio_path: str) -> DecodedAudio:
+        """Декодирует файл через кэш декодированного аудио (если он включен)"""
+        return DecodedAudio.from_file(audio_path, cache_dir=self.audio_cache_dir,
+                                      max_cache_bytes=self.audio_cache_max_bytes)
 
+    def _align_result(self, result: Dict, audio: DecodedAudio) -> Dict:
+        """Уточняет временные метки слов через whisperx.align
+        
+        Модель wav2vec2 для языка берется из LRU-кэша процесса, поэтому
+        загружается один раз на язык. При ошибке возвращается исходный результат.
+        """
+        language = result.get("language") or self.language
+        try:
+            align_model, metadata = alignment_models.get_or_load(
+                (language, self.device),
+                lambda: whisperx.load_align_model(language_code=language, device=self.device,
+                                                  model_dir=self.whisper_model_path)
+            )
+            print("Выравнивание слов...")
+            aligned = whisperx.align(result.get("segments", []), align_model, metadata,
+                                     audio.as_array(), self.device, return_char_alignments=False)
+            aligned["language"] = language
+            print(f"Выравнивание завершено: {len(aligned.get('word_segments', []))} слов")
+            return aligned
+        except Exception as align_error:
+            print(f"Выравнивание не удалось, используем сегменты без слов: {align_error}")
+            return result
+    
+    @staticmethod
+    def _result_details(result: Optional[Dict], diarized: bool = False) -> Dict:
+        """Сегменты (start, end, speaker, text, words), слова (word, start, end, score, speaker) и флаг диаризации"""
+        words = []
+        for segment in (result or {}).get("segments", []):
+            for word in segment.get("words", []) or []:
+                words.append({
+                    "word": word.get("word", ""),
+                    "start": word.get("start"),
+                    "end": word.get("end"),
+                    "score": word.get("score"),
+                    "speaker": word.get("speaker", segment.get("speaker"))
+                })
+        return {"segments": segments_from_result(result), "words": words, "diarization": diarized}
+    
+    def _transcribe_speech_only(self, model, decoded: DecodedAudio) -> Dict:
+        """Транскрибирует только участки речи, найденные VAD
+        
+        Тишина вырезается до подачи в модель, а время сегментов и слов
+        пересчитывается на шкалу исходного файла, чтобы диаризация
+        по исходному аудио совпадала с транскрипцией.
+        """
+        audio = decoded.as_array()
+        if not self.use_vad:
+            return model.transcribe(audio, num_workers=self.num_workers)
+        
+        regions = detect_speech_regions(audio, self.sample_rate)
+        if not regions:
+            print("VAD не нашел речь, транскрибируем файл целиком")
+            return model.transcribe(audio, num_workers=self.num_workers)
+        
+        compact, timeline = extract_speech(audio, regions, self.sample_rate)
+        print(f"VAD: речь {len(compact) / self.sample_rate:.1f} из {len(audio) / self.sample_rate:.1f} сек")
+        
+        result = model.transcribe(compact, num_workers=self.num_workers)
+        remap_segments(result.get("segments", []), timeline)
+        return result
+    
     def transcribe_youtube(self, url: str) -> Tuple[bool, str]:
         """Транскрибирует аудио с YouTube"""
+        success, transcript, _ = self.transcribe_youtube_detailed(url)
+        return success, transcript
+
+    def transcribe_youtube_detailed(self, url: str) -> Tuple[bool, str, Dict]:
+        """Транскрибирует аудио с YouTube; возвращает также сегменты и слова"""
         try:
             print(f"Начинаю транскрипцию YouTube: {url}")
             
             # Загружаем аудио
             audio_path = self._download_youtube_audio(url)
             if not audio_path:
-                return False, "Не удалось загрузить аудио с YouTube"
+                return False, "Не удалось загрузить аудио с YouTube", self._result_details(None)
             
             print(f"Аудио загружено: {audio_path}")
             
             # Транскрибируем
-            return self.transcribe_audio_file(audio_path)
+            return self.transcribe_audio_file_detailed(audio_path)
             
         except Exception as e:
             print(f"Ошибка транскрипции YouTube: {e}")
-            return False, f"Ошибка: {str(e)}"
+            return False, f"Ошибка: {str(e)}", self._result_details(None)
 
     def _format_transcript_with_speakers(self, result: Dict) -> str:
         """Форматирует транскрипт с информацией о спикерах в простом формате времени"""
@@ -795,8 +1199,61 @@ class WhisperXTranscriber:
         self.language = language
         self.logger.info(f"Язык транскрибации изменен на: {language}")
 
+    def supported_compute_types(self) -> Tuple[str, ...]:
+        """Типы вычислений, допустимые на текущем устройстве"""
+        return CPU_COMPUTE_TYPES if self.device == "cpu" else GPU_COMPUTE_TYPES
+
+    def set_compute_type(self, compute_type: str) -> bool:
+        """Устанавливает тип вычислений для текущего устройства"""
+        if compute_type not in self.supported_compute_types():
+            self.logger.error(f"Тип вычислений {compute_type} не поддерживается на {self.device}. "
+                              f"Доступны: {', '.join(self.supported_compute_types())}")
+            return False
+        
+        if self.device == "cpu":
+            # На CPU тип вычислений задается профилем: берем первый профиль с этим типом
+            self._use_cpu(next(name for name, profile in CPU_COMPUTE_PROFILES.items()
+                               if profile["compute_type"] == compute_type))
+            return True
+        self.compute_type = compute_type
+        self.logger.info(f"Тип вычислений: {compute_type}")
+        return True
+
+    def set_cpu_profile(self, profile: str) -> bool:
+        """Устанавливает профиль CPU (тип вычислений, потоки, загрузчики)"""
+        if self.device != "cpu":
+            self.logger.error("Профили CPU не применимы: вычисления идут на GPU")
+            return False
+        if profile not in CPU_COMPUTE_PROFILES:
+            self.logger.error(f"Неизвестный профиль CPU {profile}. "
+                              f"Доступны: {', '.join(CPU_COMPUTE_PROFILES)}")
+            return False
+        self._use_cpu(profile)
+        return True
+
+    def set_cpu_threads(self, threads: int):
+        """Переопределяет число потоков декодирования на CPU (0 - по числу ядер)"""
+        self.cpu_threads = int(threads) or os.cpu_count() or 4
+        self.logger.info(f"Потоков декодирования на CPU: {self.cpu_threads}")
+
+    def set_alignment_enabled(self, enabled: bool):
+        """Включает или отключает выравнивание слов"""
+        self.use_alignment = bool(enabled)
+        self.logger.info(f"Выравнивание слов: {'включено' if self.use_alignment else 'отключено'}")
+
+    def set_batch_size(self, batch_size: int):
+        """Устанавливает размер батча пакетной транскрибации"""
+        self.batch_size = max(1, int(batch_size))
+        self.logger.info(f"Размер батча WhisperX: {self.batch_size}")
+
+    def set_vad_enabled(self, enabled: bool):
+        """Включает или отключает отсев тишины перед распознаванием"""
+        self.use_vad = bool(enabled)
+        self.logger.info(f"Отсев тишины (VAD): {'включен' if self.use_vad else 'отключен'}")
+
     def cleanup(self):
-        """Очищает временные файлы"""
+        """Очищает временные файлы и отдает ссылку на пайплайн диаризации"""
+        self.release_diarization_pipeline()
         try:
             if os.path.exists(self.temp_dir):
                 shutil.rmtree(self.temp_dir)
@@ -809,7 +1266,12 @@ class WhisperXTranscriber:
         self.cleanup()
 
     def _manual_assign_speakers(self, diarize_segments, whisper_result):
-        """Альтернативный способ объединения диаризации с транскрипцией"""
+        """Альтернативный способ объединения диаризации с транскрипцией
+        
+        Реплики диаризации один раз сортируются в SpeakerIntervals, и спикеры
+        назначаются всем сегментам (а при наличии временных меток - словам)
+        одним проходом.
+        """
         try:
             print("Используем ручное объединение диаризации...")
             
@@ -819,63 +1281,49 @@ class WhisperXTranscriber:
                 print("Нет сегментов транскрипции")
                 return None
             
-            # Получаем timeline диаризации
             try:
-                if hasattr(diarize_segments, 'get_timeline'):
-                    diarize_timeline = diarize_segments.get_timeline()
-                    print(f"Timeline диаризации: {len(diarize_timeline)} сегментов")
-                else:
-                    print("Не удается получить timeline диаризации")
-                    return None
+                intervals = SpeakerIntervals.from_diarization(diarize_segments)
             except Exception as e:
-                print(f"Ошибка получения timeline: {e}")
+                print(f"Ошибка получения реплик диаризации: {e}")
                 return None
             
-            if not diarize_timeline:
-                print("Timeline диаризации пустой")
+            if not len(intervals):
+                print("Реплики диаризации отсутствуют")
                 return None
             
+            print(f"Реплик диаризации: {len(intervals)}, уникальных спикеров: {len(intervals.labels)}")
+            
             # Создаем новый результат с информацией о спикерах
             result_with_speakers = whisper_result.copy()
-            result_with_speakers['segments'] = []
-            
-            # Анализируем все сегменты диаризации для получения уникальных спикеров
-            unique_speakers = self._analyze_diarization_speakers(diarize_timeline)
-            print(f"Найдено уникальных спикеров: {len(unique_speakers)}")
-            for i, speaker in enumerate(unique_speakers):
-                print(f"      Спикер {i+1}: {speaker}")
-            
-            # Разбиваем длинные сегменты транскрипции на более мелкие
-            refined_segments = self._refine_segments_for_diarization(segments, diarize_timeline)
-            print(f"Разбито на {len(refined_segments)} сегментов для диаризации")
-            
-            # Для каждого сегмента транскрипции находим соответствующий спикер
-            for i, segment in enumerate(refined_segments):
-                segment_start = segment.get('start', 0)
-                segment_end = segment.get('end', 0)
-                segment_text = segment.get('text', '').strip()
-                
-                if not segment_text:
+            refined_segments = self._refine_segments_for_diarization(segments, intervals)
+            new_segments = []
+            for segment in refined_segments:
+                if not segment.get('text', '').strip():
                     continue
-                
-                # Находим спикера для этого временного интервала
-                speaker = self._find_speaker_for_time(diarize_timeline, segment_start, segment_end)
-                
-                # Создаем новый сегмент с информацией о спикере
                 new_segment = segment.copy()
-                new_segment['speaker'] = speaker
-                result_with_speakers['segments'].append(new_segment)
-                
-                print(f"Сегмент {i+1}: {segment_text[:30]}... -> Speaker {speaker}")
-            
-            print(f"Ручное объединение завершено: {len(result_with_speakers['segments'])} сегментов")
+                if new_segment.get('words'):
+                    new_segment['words'] = [word.copy() for word in new_segment['words']]
+                new_segments.append(new_segment)
+            
+            assign_speakers(new_segments, intervals)
+            
+            # Нормализуем имена спикеров; сегменты без перекрытия получают Speaker_A
+            for segment in new_segments:
+                raw_speaker = segment.get('speaker')
+                segment['speaker'] = self._normalize_speaker_name(raw_speaker) if raw_speaker else "Speaker_A"
+                for word in segment.get('words', []) or []:
+                    if 'speaker' in word:
+                        word['speaker'] = self._normalize_speaker_name(word['speaker'])
+            
+            result_with_speakers['segments'] = new_segments
+            print(f"Ручное объединение завершено: {len(new_segments)} сегментов")
             return result_with_speakers
             
         except Exception as e:
             print(f"Ошибка ручного объединения: {e}")
             return None
     
-    def _refine_segments_for_diarization(self, segments, diarize_timeline):
+    def _refine_segments_for_diarization(self, segments, intervals):
         """Оставляет сегменты как есть - без искусственного разбиения"""
         try:
             # НЕ разбиваем сегменты - оставляем естественное разбиение по диалогу
@@ -934,90 +1382,6 @@ class WhisperXTranscriber:
             print(f"Ошибка разбиения текста: {e}")
             return [(text, 0, total_duration)]
     
-    def _find_speaker_for_time(self, diarize_timeline, start_time, end_time):
-        """Находит спикера для заданного временного интервала"""
-        try:
-            best_match = None
-            best_overlap = 0
-            
-            # Ищем сегмент диаризации с наибольшим перекрытием
-            for segment in diarize_timeline:
-                try:
-                    # Получаем время начала и конца сегмента диаризации
-                    if hasattr(segment, 'start') and hasattr(segment, 'end'):
-                        diarize_start = segment.start
-                        diarize_end = segment.end
-                    elif hasattr(segment, '__getitem__'):
-                        # Альтернативный способ доступа к времени
-                        diarize_start = segment[0] if len(segment) > 0 else 0
-                        diarize_end = segment[1] if len(segment) > 1 else 0
-                    else:
-                        continue
-                    
-                    # Вычисляем перекрытие временных интервалов
-                    overlap_start = max(diarize_start, start_time)
-                    overlap_end = min(diarize_end, end_time)
-                    overlap_duration = max(0, overlap_end - overlap_start)
-                    
-                    if overlap_duration > best_overlap:
-                        best_overlap = overlap_duration
-                        best_match = segment
-                        
-                except Exception as segment_error:
-                    print(f"Ошибка обработки сегмента диаризации: {segment_error}")
-                    continue
-            
-            # Если нашли подходящий сегмент, извлекаем метку спикера
-            if best_match and best_overlap > 0:
-                try:
-                    # Получаем уникальный идентификатор спикера из pyannote
-                    speaker_id = None
-                    
-                    # Пробуем разные способы получения идентификатора спикера
-                    if hasattr(best_match, 'track'):
-                        speaker_id = str(best_match.track)
-                        print(f"Идентификатор спикера из track: {speaker_id}")
-                    elif hasattr(best_match, 'label'):
-                        speaker_id = str(best_match.label) 
-                        print(f"Идентификатор спикера из label: {speaker_id}")
-                    else:
-                        # Пытаемся извлечь информацию о спикере из diarize_segments напрямую
-                        try:
-                            # Ищем сегмент в исходном результате диаризации
-                            for track, label in self._extract_speaker_tracks(best_match, start_time, end_time):
-                                speaker_id = f"TRACK_{track}"
-                                print(f"Извлечен track: {track} -> {speaker_id}")
-                                break
-                            
-                            if not speaker_id:
-                                # Если track не найден, используем хеш координат сегмента для постоянства
-                                coord_hash = hash(f"{best_match.start:.3f}_{best_match.end:.3f}") % 100
-                                speaker_id = f"SPEAKER_{coord_hash:02d}"
-                                print(f"Сгенерирован стабильный идентификатор: {speaker_id}")
-                                
-                        except Exception as track_error:
-                            print(f"Ошибка извлечения track: {track_error}")
-                            # Резервный вариант - используем стабильный хеш
-                            coord_hash = hash(f"{best_match.start:.3f}_{best_match.end:.3f}") % 100
-                            speaker_id = f"SPEAKER_{coord_hash:02d}"
-                            print(f"Резервный идентификатор: {speaker_id}")
-                    
-                    # Нормализуем имя спикера
-                    normalized_speaker = self._normalize_speaker_name(speaker_id)
-                    print(f"Финальное имя спикера: {normalized_speaker} (перекрытие: {best_overlap:.2f}с)")
-                    return normalized_speaker
-                        
-                except Exception as label_error:
-                    print(f"Ошибка извлечения метки спикера: {label_error}")
-            
-            # Если не нашли подходящий сегмент, используем дефолтную метку
-            print(f"Спикер не найден для времени [{start_time:.2f} - {end_time:.2f}], используем Speaker_A")
-            return "Speaker_A"
-            
-        except Exception as e:
-            print(f"Ошибка поиска спикера: {e}")
-            return "Speaker_A"
-    
     def _normalize_speaker_name(self, speaker_id):
         """Нормализует имя спикера к читаемому формату"""
         try:
@@ -1043,87 +1407,15 @@ class WhisperXTranscriber:
         except Exception as e:
             print(f"Ошибка нормализации имени спикера: {e}")
             return "Speaker_A"
+
+if __name__ == "__main__":
+    import argparse
     
-    def _extract_speaker_tracks(self, segment, start_time, end_time):
-        """Извлекает информацию о треках спикеров из сегмента диаризации"""
-        try:
-            # Пытаемся получить доступ к внутренней структуре pyannote Annotation
-            if hasattr(segment, '_tracks') and hasattr(segment, '_labels'):
-                tracks = segment._tracks
-                labels = segment._labels
-                
-                for track_id, label in zip(tracks, labels):
-                    yield track_id, label
-                    
-            elif hasattr(segment, 'get_tracks'):
-                # Альтернативный способ получения треков
-                for track in segment.get_tracks():
-                    yield track, f"speaker_{track}"
-                    
-            else:
-                # Если нет доступа к tracks, используем альтернативный подход
-                segment_str = str(segment)
-                print(f"Анализируем строку сегмента: {segment_str}")
-                
-                # Попытка извлечь track из строкового представления
-                import re
-                track_match = re.search(r'track_(\d+)', segment_str.lower())
-                if track_match:
-                    track_id = track_match.group(1)
-                    yield track_id, f"speaker_{track_id}"
-                    
-        except Exception as e:
-            print(f"Ошибка извлечения треков: {e}")
-            return
+    parser = argparse.ArgumentParser(description="Калибровка профиля WhisperX на CPU")
+    parser.add_argument("reference", help="Эталонный аудиофайл с речью")
+    parser.add_argument("--duration", type=float, default=30.0, help="Максимальная длительность отрывка (сек)")
+    args = parser.parse_args()
     
-    def _analyze_diarization_speakers(self, diarize_timeline):
-        """Анализирует диаризацию для получения списка уникальных спикеров"""
-        try:
-            unique_speakers = set()
-            
-            for segment in diarize_timeline:
-                try:
-                    # Пытаемся получить реальную информацию о спикере
-                    speaker_info = None
-                    
-                    if hasattr(segment, 'track'):
-                        speaker_info = f"TRACK_{segment.track}"
-                    elif hasattr(segment, 'label'):
-                        speaker_info = str(segment.label)
-                    else:
-                        # Анализируем строковое представление
-                        segment_str = str(segment)
-                        
-                        # Ищем стандартные паттерны pyannote
-                        import re
-                        patterns = [
-                            r'(\w+_\d+)',  # SPEAKER_01, track_1, etc.
-                            r'<Segment\((.+?)\)>',  # <Segment(track_1)>
-                            r'track[_\s]*(\d+)',  # track_1, track 1
-                        ]
-                        
-                        for pattern in patterns:
-                            match = re.search(pattern, segment_str, re.IGNORECASE)
-                            if match:
-                                speaker_info = match.group(1)
-                                break
-                        
-                        if not speaker_info:
-                            # Если ничего не найдено, используем координаты
-                            start_coord = getattr(segment, 'start', 0)
-                            end_coord = getattr(segment, 'end', 0)
-                            coord_hash = hash(f"{start_coord:.3f}_{end_coord:.3f}") % 10
-                            speaker_info = f"SPEAKER_{coord_hash}"
-                    
-                    if speaker_info:
-                        unique_speakers.add(speaker_info)
-                        
-                except Exception as segment_error:
-                    print(f"Ошибка анализа сегмента: {segment_error}")
-                    continue
-            
-            return sorted(list(unique_speakers))
-            
-        except Exception as e:
-            print(f"Ошибка анализа уникальных спикеров: {e}")
-            return []
+    transcriber = WhisperXTranscriber()
+    report = transcriber.calibrate_cpu_profiles(args.reference, args.duration)
+    print(json.dumps(report, ensure_ascii=False, indent=2))